@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Must only be imported on the code path that uses them, never at CLI startup
+HEAVY_MODULES = ('moviepy', 'numpy', 'imageio', 'PIL', 'playwright', 'tenacity')
+
+# `main` is all that --help and argument errors load, `uploader_runner` is loaded for an actual run
+IMPORT_TARGETS = ('main', 'uploader_runner')
+
+CLI_COMMANDS = {
+    'interpreter': ['-c', 'pass'],
+    'help': ['main.py', '--help'],
+    'argument_error': ['main.py'],
+}
+
+
+def clean_env() -> dict:
+    # Empty env file and no uploader credentials: startup must not depend on them
+    env_file = os.path.join(tempfile.mkdtemp(prefix='import_benchmark_'), '.env')
+    Path(env_file).touch()
+    env = {name: value for name, value in os.environ.items() if not name.startswith('TIKTOK_UPLOADER_')}
+    env['ENV_FILE'] = env_file
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    # {module: (cumulative us, depth)} from the `-X importtime` report
+    modules = {}
+
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(cumulative), depth)
+
+    return modules
+
+
+def measure_imports(env: dict, module: str = 'main') -> dict:
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"'import {module}' failed:\n{completed.stderr[-2000:]}")
+
+    return parse_importtime(completed.stderr)
+
+
+def measure_cli(env: dict, runs: int) -> dict[str, float]:
+    results = {}
+
+    for name, command in CLI_COMMANDS.items():
+        samples = []
+
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            subprocess.run([sys.executable, *command], cwd=PROJECT_ROOT, env=env, capture_output=True)
+            samples.append(time.perf_counter() - started_at)
+
+        results[name] = statistics.median(samples)
+
+    return results
+
+
+def top_level_seconds(modules: dict[str, tuple[int, int]]) -> float:
+    return sum(cumulative for cumulative, depth in modules.values() if depth == 0) / 1_000_000
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    env = clean_env()
+    import_seconds = {}
+    heavy_modules = {}
+    project_modules = {}
+
+    for target in IMPORT_TARGETS:
+        # The first run compiles bytecode; only warm runs are measured
+        measure_imports(env, target)
+        samples = [measure_imports(env, target) for _ in range(args.runs)]
+        import_seconds[target] = statistics.median(top_level_seconds(sample) for sample in samples)
+        heavy_modules[target] = sorted({
+            name.split('.')[0] for name in samples[-1] if name.split('.')[0] in HEAVY_MODULES
+        })
+
+        for name, (cumulative, _) in samples[-1].items():
+            if name.split('.')[0] in ('main', 'uploader_runner', 'common', 'config', 'uploaders'):
+                project_modules[name] = max(project_modules.get(name, 0), cumulative)
+
+    return {
+        'import_seconds': import_seconds,
+        'cli_seconds': measure_cli(env, args.runs),
+        'heavy_modules': heavy_modules,
+        'slowest_project_modules': dict(
+            sorted(project_modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        ),
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'project module':<48}{'cumulative ms':>14}")
+
+    for name, cumulative in result['slowest_project_modules'].items():
+        print(f"{name:<48}{cumulative / 1000:>14.1f}")
+
+    print()
+
+    for target, seconds in result['import_seconds'].items():
+        heavy_modules = ', '.join(result['heavy_modules'][target]) or 'no heavy modules'
+        print(f"import {target}: {seconds * 1000:.0f} ms ({heavy_modules})")
+
+    for name, seconds in result['cli_seconds'].items():
+        print(f"{' '.join(CLI_COMMANDS[name])}: {seconds * 1000:.0f} ms")
+
+
+def find_regressions(result: dict, baseline: dict, tolerance: float, budget: float) -> list[str]:
+    regressions = [
+        f"{module} is imported by '{target}'"
+        for target, modules in result['heavy_modules'].items() for module in modules
+    ]
+
+    if budget and result['cli_seconds']['help'] > budget:
+        regressions.append(f"--help took {result['cli_seconds']['help'] * 1000:.0f} ms > budget {budget * 1000:.0f} ms")
+
+    for target, seconds in result['import_seconds'].items():
+        baseline_seconds = (baseline or {}).get('import_seconds', {}).get(target)
+
+        if baseline_seconds and seconds > baseline_seconds * (1 + tolerance):
+            regressions.append(
+                f"import {target} {seconds * 1000:.0f} ms > baseline {baseline_seconds * 1000:.0f} ms"
+            )
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import-time benchmark of the CLI startup path")
+    parser.add_argument("--runs", type=int, default=5, help="Measured runs (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest project modules to list")
+    parser.add_argument("--budget", type=float, default=0.5, help="Max seconds for `main.py --help` (0 = no budget)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    result = run_benchmark(args)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    baseline = None
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = find_regressions(result, baseline, args.tolerance, args.budget)
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from urllib.parse import (
+    parse_qs,
+    urlparse,
+)
+
+SESSION_COOKIE = 'sessionid'
+SESSION_VALUE = 'benchmark-session'
+CHUNKED_UPLOAD_PATH = '/upload/chunked'
+
+_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>"""
+
+_HOME_BODY = """
+<button aria-label="Profile" onclick="document.getElementById('login-modal').style.display='block'">Profile</button>
+<div id="login-modal" style="display:none">
+  <div data-e2e="channel-item"><p>Use phone / email / username</p></div>
+  <div id="login-options" style="display:none">
+    <a href="/login/phone-or-email/email">Log in with email or username</a>
+  </div>
+</div>
+<script>
+  document.querySelector('[data-e2e="channel-item"]').addEventListener('click', () => {
+    document.getElementById('login-options').style.display = 'block';
+  });
+</script>
+"""
+
+_LOGIN_BODY = """
+<form id="login-form">
+  <input name="username" type="text">
+  <input type="password">
+  <button type="submit" data-e2e="login-button">Log in</button>
+</form>
+<script>
+  document.getElementById('login-form').addEventListener('submit', async (event) => {
+    event.preventDefault();
+    await fetch('/passport/web/user/login/', {
+      method: 'POST',
+      body: JSON.stringify({username: document.querySelector('input[name=username]').value}),
+    });
+    location.href = '/profile';
+  });
+</script>
+"""
+
+_PROFILE_BODY = """<button data-e2e="edit-profile-entrance">Edit profile</button>"""
+
+_UPLOAD_BODY = """
+<input type="file" accept="video/*">
+<button data-e2e="post_video_button" style="display:none">Post</button>
+<script>
+  let upload = null;
+  const input = document.querySelector('input[type=file]');
+  const post = document.querySelector('[data-e2e="post_video_button"]');
+  input.addEventListener('change', () => {
+    if (upload || !input.files.length) return;
+    const file = input.files[0];
+    upload = fetch('/upload/' + encodeURIComponent(file.name), {method: 'POST', body: file});
+    post.style.display = 'block';
+  });
+  post.addEventListener('click', async () => {
+    await upload;
+    await fetch('/tiktok/web/project/post/', {method: 'POST', body: '{}'});
+    document.body.insertAdjacentHTML('beforeend', '<p id="posted">Your video has been uploaded</p>');
+  });
+</script>
+"""
+
+# Post step for media sent through the chunked endpoint: no file input, the page already knows the media id
+_POST_MEDIA_BODY = """
+<button data-e2e="post_video_button">Post</button>
+<script>
+  document.querySelector('[data-e2e="post_video_button"]').addEventListener('click', async () => {
+    await fetch('/tiktok/web/project/post/', {method: 'POST', body: JSON.stringify({media_id: '{media_id}'})});
+    document.body.insertAdjacentHTML('beforeend', '<p id="posted">Your video has been uploaded</p>');
+  });
+</script>
+"""
+
+
+class MockTikTokHandler(BaseHTTPRequestHandler):
+    server: "MockTikTokServer"
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._simulate_latency()
+        url = urlparse(self.path)
+        path = url.path
+
+        if path.startswith(f'{CHUNKED_UPLOAD_PATH}/'):
+            self._chunked_status(path.removeprefix(f'{CHUNKED_UPLOAD_PATH}/'))
+        elif path == '/':
+            self._send_page('TikTok', _HOME_BODY)
+        elif path.startswith('/login'):
+            self._send_page('Log in', _LOGIN_BODY)
+        elif path == '/profile':
+            self._send_page('Profile', _PROFILE_BODY if self._is_logged_in() else '<p>Guest</p>')
+        elif path == '/tiktokstudio/upload':
+            media_id = parse_qs(url.query).get('media_id', [None])[0]
+
+            if self._is_logged_in() and media_id:
+                self._send_page('Upload', _POST_MEDIA_BODY.replace('{media_id}', media_id))
+            elif self._is_logged_in():
+                self._send_page('Upload', _UPLOAD_BODY)
+            else:
+                self._redirect('/login?redirect_url=/tiktokstudio/upload')
+        elif path.startswith('/warmup'):
+            self._send_page('Warm-up', '<p>ok</p>')
+        else:
+            self._send(404, b'not found', 'text/plain')
+
+    def do_POST(self) -> None:
+        self._simulate_latency()
+        path = urlparse(self.path).path
+
+        if path.startswith(f'{CHUNKED_UPLOAD_PATH}/'):
+            self._chunked_post(path.removeprefix(f'{CHUNKED_UPLOAD_PATH}/'))
+        elif path == '/passport/web/user/login/':
+            self._drain_body()
+            self._send(
+                200, b'{"message":"success"}', 'application/json',
+                headers={'Set-Cookie': f'{SESSION_COOKIE}={SESSION_VALUE}; Path=/; Max-Age=86400'},
+            )
+        elif path.startswith('/upload/'):
+            received = self._drain_body(throttle=True)
+            self.server.record_upload(received)
+            self._send(200, json.dumps({'received': received}).encode(), 'application/json')
+        elif path == '/tiktok/web/project/post/':
+            self._drain_body()
+            self.server.record_post()
+            self._send(200, b'{"status_code":0}', 'application/json')
+        else:
+            self._drain_body()
+            self._send(404, b'not found', 'text/plain')
+
+    def do_PUT(self) -> None:
+        self._simulate_latency()
+        path = urlparse(self.path).path
+        parts = path.removeprefix(f'{CHUNKED_UPLOAD_PATH}/').split('/')
+
+        if not path.startswith(f'{CHUNKED_UPLOAD_PATH}/') or len(parts) != 2 or not parts[1].isdigit():
+            self._drain_body()
+            self._send(404, b'not found', 'text/plain')
+        elif not self._is_logged_in():
+            self._drain_body()
+            self._send(401, b'{"error":"unauthorized"}', 'application/json')
+        elif parts[0] not in self.server.chunked_uploads:
+            self._drain_body()
+            self._send(404, b'{"error":"unknown upload"}', 'application/json')
+        else:
+            received = self._drain_body(throttle=True)
+            self.server.record_chunk(parts[0], int(parts[1]), received)
+            self._send_json(200, {'received': received})
+
+    def _chunked_status(self, upload_id: str) -> None:
+        upload = self.server.chunked_uploads.get(upload_id)
+
+        if not self._is_logged_in():
+            self._send_json(401, {'error': 'unauthorized'})
+        elif not upload:
+            self._send_json(404, {'error': 'unknown upload'})
+        else:
+            self._send_json(200, {'received': sorted(upload['chunks'])})
+
+    def _chunked_post(self, action: str) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if not self._is_logged_in():
+            self._send_json(401, {'error': 'unauthorized'})
+        elif action == 'init':
+            self._send_json(200, self.server.start_chunked_upload(json.loads(body or b'{}')))
+        elif action.endswith('/complete'):
+            media_id = self.server.complete_chunked_upload(action.removesuffix('/complete'))
+
+            if media_id:
+                self._send_json(200, {'media_id': media_id})
+            else:
+                self._send_json(409, {'error': 'missing chunks'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _is_logged_in(self) -> bool:
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return cookie.get(SESSION_COOKIE) is not None and cookie[SESSION_COOKIE].value == SESSION_VALUE
+
+    def _simulate_latency(self) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _drain_body(self, throttle: bool = False) -> int:
+        remaining = int(self.headers.get('Content-Length') or 0)
+        received = 0
+        chunk_size = 64 * 1024
+        started_at = time.monotonic()
+
+        while remaining > 0:
+            chunk = self.rfile.read(min(chunk_size, remaining))
+
+            if not chunk:
+                break
+
+            remaining -= len(chunk)
+            received += len(chunk)
+
+            if throttle and self.server.bandwidth:
+                # Sleep until the transfer is back on the simulated bandwidth curve
+                ahead = received / self.server.bandwidth - (time.monotonic() - started_at)
+
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        return received
+
+    def _send_page(self, title: str, body: str) -> None:
+        self._send(200, _PAGE.format(title=title, body=body).encode(), 'text/html; charset=utf-8')
+
+    def _redirect(self, location: str) -> None:
+        self._send(302, b'', 'text/plain', headers={'Location': location})
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockTikTokServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, bandwidth: float = 0, latency: float = 0):
+        super().__init__((host, port), MockTikTokHandler)
+        # bytes per second accepted on uploads (0 = unlimited) and delay added to every request
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.posts = 0
+        self.chunked_uploads: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def record_upload(self, size: int) -> None:
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += size
+
+    def start_chunked_upload(self, request: dict) -> dict:
+        upload_id = uuid.uuid4().hex
+        chunk_size = int(request.get('chunk_size') or 8 * 1024 * 1024)
+        size = int(request.get('size') or 0)
+
+        with self._lock:
+            self.chunked_uploads[upload_id] = {
+                'size': size,
+                'chunk_count': max(1, -(-size // chunk_size)),
+                'chunks': set(),
+            }
+
+        return {'upload_id': upload_id, 'chunk_size': chunk_size}
+
+    def record_chunk(self, upload_id: str, index: int, size: int) -> None:
+        with self._lock:
+            self.chunked_uploads[upload_id]['chunks'].add(index)
+            self.uploaded_bytes += size
+
+    def complete_chunked_upload(self, upload_id: str) -> str:
+        with self._lock:
+            upload = self.chunked_uploads.get(upload_id)
+
+            if not upload or len(upload['chunks']) < upload['chunk_count']:
+                return None
+
+            self.uploads += 1
+            return f'media-{upload_id}'
+
+    def record_post(self) -> None:
+        with self._lock:
+            self.posts += 1
+
+    def start(self) -> "MockTikTokServer":
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-tiktok', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def parse_size(value: str) -> int:
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().removesuffix('B')
+
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+
+    return int(value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the TikTok pages used by ContentUploader")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bandwidth", default='0', help="Upload bandwidth per connection, e.g. '20MB' (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to every request")
+    args = parser.parse_args()
+
+    server = MockTikTokServer(port=args.port, bandwidth=parse_size(args.bandwidth), latency=args.latency)
+    print(f"Mock TikTok server listening on {server.base_url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
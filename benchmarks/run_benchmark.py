@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Run against an empty env file so a developer's .env (proxies, daemon, accounts) does not leak into the numbers
+_BENCHMARK_DIR = tempfile.mkdtemp(prefix='uploader_benchmark_')
+_ENV_FILE = os.path.join(_BENCHMARK_DIR, '.env')
+Path(_ENV_FILE).touch()
+os.environ['ENV_FILE'] = _ENV_FILE
+os.environ['TIKTOK_UPLOADER_AUTH_USERNAME'] = 'benchmark'
+os.environ['TIKTOK_UPLOADER_AUTH_PASSWORD'] = 'benchmark'
+os.environ['BROWSER_DAEMON_ENABLED'] = 'False'
+os.environ['PROXY_POOL'] = ''
+os.environ['LEDGER_ENABLED'] = 'False'
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.mock_tiktok_server import (  # noqa: E402
+    CHUNKED_UPLOAD_PATH,
+    MockTikTokServer,
+    parse_size,
+)
+from common.logging_setup import setup_logging  # noqa: E402
+from common.process_memory import (  # noqa: E402
+    peak_rss,
+    process_tree_rss,
+)
+from config.uploader_config import UploaderConfig  # noqa: E402
+
+STAGES = {
+    '_launch_browser': 'launch',
+    '_open_context': 'context',
+    '_warm_up_browser': 'warm_up',
+    '_is_logged_in': 'is_logged_in',
+    '_login': 'login',
+    '_open_page': 'open_page',
+    '_prepare_post': 'upload',
+    '_publish': 'post',
+    '_upload_media': 'http_upload',
+}
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def wrap(self, uploader, method_name: str, stage: str) -> None:
+        original = getattr(uploader, method_name)
+
+        async def timed(*args, **kwargs):
+            started_at = time.perf_counter()
+
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started_at)
+
+        setattr(uploader, method_name, timed)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.samples[stage].append(seconds)
+
+
+class MemorySampler:
+    def __init__(self, interval: float = 0.25):
+        self._interval = interval
+        self.peak_bytes = 0
+        self._task: asyncio.Task = None
+
+    async def _run(self) -> None:
+        while True:
+            self.peak_bytes = max(self.peak_bytes, process_tree_rss())
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self.peak_bytes = max(self.peak_bytes, process_tree_rss(), peak_rss())
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_uploader_class(base_url: str):
+    from uploaders.tiktok_content_uploader.content_uploader import ContentUploader
+
+    class BenchmarkUploader(ContentUploader):
+        DOMAIN_URL = f'{base_url}/?lang=en'
+        PROFILE_URL = f'{base_url}/profile?lang=en'
+        UPLOAD_PAGE_URL = f'{base_url}/tiktokstudio/upload?from=webapp&lang=en'
+        MEDIA_POST_PAGE_URL = UPLOAD_PAGE_URL + '&media_id={media_id}'
+        WARMUP_URLS = [f'{base_url}/warmup/{index}' for index in range(3)]
+
+    return BenchmarkUploader
+
+
+def generate_files(folder: str, count: int, sizes: list[int]) -> list[str]:
+    files = []
+
+    for size in sizes:
+        for index in range(count):
+            path = os.path.join(folder, f'video_{size}_{index}.mp4')
+
+            with open(path, 'wb') as f:
+                remaining = size
+
+                while remaining > 0:
+                    chunk = min(remaining, 1024 * 1024)
+                    f.write(os.urandom(chunk))
+                    remaining -= chunk
+
+            files.append(path)
+
+    return files
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    server = MockTikTokServer(bandwidth=parse_size(args.bandwidth), latency=args.latency).start()
+    media_folder = os.path.join(_BENCHMARK_DIR, 'media')
+    os.makedirs(media_folder, exist_ok=True)
+    files = generate_files(media_folder, args.files, [parse_size(size) for size in args.sizes.split(',')])
+    uploader_class = make_uploader_class(server.base_url)
+    timer = StageTimer()
+    memory = MemorySampler()
+    memory.start()
+    started_at = time.perf_counter()
+
+    try:
+        for _ in range(args.runs):
+            uploader = uploader_class(uploader_config=UploaderConfig(
+                storage_state=os.path.join(_BENCHMARK_DIR, 'storage_state.json'),
+                proxy_settings=None,
+                headless=not args.headed,
+                auth_username='benchmark',
+                auth_password='benchmark',
+                upload_tabs=args.tabs,
+                upload_transport=args.transport,
+                upload_endpoint=f'{server.base_url}{CHUNKED_UPLOAD_PATH}',
+            ))
+
+            for method_name, stage in STAGES.items():
+                timer.wrap(uploader, method_name, stage)
+
+            run_started_at = time.perf_counter()
+
+            async with uploader:
+                await uploader.upload_video(files)
+
+            timer.add('run', time.perf_counter() - run_started_at)
+    finally:
+        elapsed = time.perf_counter() - started_at
+        await memory.stop()
+        server.stop()
+
+    uploaded_files = len(files) * args.runs
+
+    return {
+        'files': uploaded_files,
+        'posts': server.posts,
+        'uploaded_bytes': server.uploaded_bytes,
+        'elapsed_seconds': elapsed,
+        'files_per_minute': uploaded_files / elapsed * 60 if elapsed else 0,
+        'peak_rss_bytes': memory.peak_bytes,
+        'stages': {
+            stage: {
+                'count': len(samples),
+                'p50': percentile(samples, 50),
+                'p90': percentile(samples, 90),
+                'p99': percentile(samples, 99),
+                'max': max(samples),
+            }
+            for stage, samples in timer.samples.items()
+        },
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'stage':<14}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+    for stage, stats in result['stages'].items():
+        print(
+            f"{stage:<14}{stats['count']:>7}"
+            f"{stats['p50'] * 1000:>10.0f}{stats['p90'] * 1000:>10.0f}"
+            f"{stats['p99'] * 1000:>10.0f}{stats['max'] * 1000:>10.0f}"
+        )
+
+    print(
+        f"\nfiles: {result['files']} (posted {result['posts']}), "
+        f"elapsed: {result['elapsed_seconds']:.1f} s, "
+        f"throughput: {result['files_per_minute']:.1f} files/min, "
+        f"peak RSS: {result['peak_rss_bytes'] / 1024 / 1024:.0f} MB"
+    )
+
+
+def find_regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+
+    if result['files_per_minute'] < baseline['files_per_minute'] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['files_per_minute']:.1f} < baseline {baseline['files_per_minute']:.1f} files/min"
+        )
+
+    for stage, stats in result['stages'].items():
+        baseline_stats = baseline.get('stages', {}).get(stage)
+
+        if baseline_stats and stats['p50'] > baseline_stats['p50'] * (1 + tolerance):
+            regressions.append(
+                f"{stage} p50 {stats['p50'] * 1000:.0f} ms > baseline {baseline_stats['p50'] * 1000:.0f} ms"
+            )
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark of ContentUploader against a local TikTok stand-in")
+    parser.add_argument("--files", type=int, default=5, help="Files per size")
+    parser.add_argument("--sizes", default='1MB,10MB', help="Comma-separated file sizes, e.g. '1MB,50MB'")
+    parser.add_argument("--runs", type=int, default=3, help="Full launch/login/upload cycles")
+    parser.add_argument("--tabs", type=int, default=1, help="Upload tabs per context")
+    parser.add_argument(
+        "--transport",
+        choices=['browser', 'http'],
+        default='browser',
+        help="Send media through the page's file input or the chunked HTTP endpoint",
+    )
+    parser.add_argument("--bandwidth", default='20MB', help="Simulated upload bandwidth per connection (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated latency per request in seconds")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    setup_logging(level='WARNING')
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(result, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+
+from common.browser_daemon import run_daemon
+from common.logging_setup import (
+    setup_logging,
+    get_named_logger,
+)
+from config import mainconfig
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Long-lived Chromium that upload runs attach to over CDP")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=mainconfig.BROWSER_DAEMON_PORT,
+        help=f"Remote debugging port (default: {mainconfig.BROWSER_DAEMON_PORT})"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the shared browser headless"
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    setup_logging(**mainconfig.LOGGING_SETTINGS)
+    logger = get_named_logger('browser_daemon')
+
+    try:
+        await run_daemon(port=args.port, headless=args.headless)
+    except Exception as e:
+        logger.exception(f"Browser daemon failed: {e}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
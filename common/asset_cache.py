@@ -0,0 +1,112 @@
+import hashlib
+import json
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from common.file_cache import FileCache
+
+# Hashed bundle names such as main.3f2a9c1d.js or chunk-8d1e0b7a4c.css
+_HASHED_URL = re.compile(r'[.\-_][0-9a-f]{8,}\.(?:js|mjs|css|woff2?|ttf)(?:\?|$)', re.IGNORECASE)
+_HASHED_URL_TTL = 7 * 24 * 60 * 60
+_IMMUTABLE_TTL = 365 * 24 * 60 * 60
+# Headers that describe the transfer rather than the (already decoded) body we store
+_HOP_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'})
+
+
+def _parse_cache_control(value: str) -> dict:
+    directives = {}
+
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+
+        if name:
+            directives[name.lower()] = argument.strip('"')
+
+    return directives
+
+
+def cache_ttl(url: str, status: int, headers: dict) -> int:
+    if status != 200:
+        return 0
+
+    vary = headers.get('vary', '').strip().lower()
+
+    if vary and vary not in ('accept-encoding', 'origin'):
+        return 0
+
+    directives = _parse_cache_control(headers.get('cache-control', ''))
+
+    if {'no-store', 'no-cache', 'private'} & directives.keys():
+        return 0
+
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name, '').isdigit():
+            max_age = int(directives[name])
+            return max(max_age, _IMMUTABLE_TTL) if 'immutable' in directives else max_age
+
+    if 'immutable' in directives:
+        return _IMMUTABLE_TTL
+
+    if 'expires' in headers:
+        try:
+            return max(0, int(parsedate_to_datetime(headers['expires']).timestamp() - time.time()))
+        except (TypeError, ValueError):
+            return 0
+
+    return _HASHED_URL_TTL if _HASHED_URL.search(url) else 0
+
+
+class AssetCache:
+    # One file per URL: a JSON header line (status, headers, expiry) followed by the body
+
+    def __init__(self, folder: str, max_bytes: int):
+        self._files = FileCache(folder, max_bytes)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def get(self, url: str) -> Optional[tuple[int, dict, bytes]]:
+        path = self._files.get(self._key(url), '.asset')
+
+        if not path:
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if meta.get('expires_at', 0) < time.time():
+            return None
+
+        return meta['status'], meta['headers'], body
+
+    def put(self, url: str, status: int, headers: dict, body: bytes) -> bool:
+        ttl = cache_ttl(url, status, headers)
+
+        if ttl <= 0:
+            return False
+
+        key = self._key(url)
+        meta = {
+            'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() not in _HOP_HEADERS},
+            'expires_at': time.time() + ttl,
+        }
+        tmp_path = self._files.tmp_path(key, '.asset')
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(meta).encode() + b'\n')
+                f.write(body)
+        except OSError:
+            self._files.discard(tmp_path)
+            return False
+
+        self._files.commit(tmp_path, key, '.asset')
+        return True
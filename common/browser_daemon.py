@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+from typing import Optional
+
+from common.logging_setup import get_named_logger
+from config import mainconfig
+
+_logger = get_named_logger('browser_daemon')
+
+
+def read_daemon_endpoint() -> Optional[str]:
+    state = _read_daemon_state()
+    return state.get('endpoint') if state else None
+
+
+def read_daemon_pid() -> Optional[int]:
+    # The daemon launches Chromium as its own child, so its memory is measured from this pid
+    state = _read_daemon_state()
+    return state.get('pid') if state else None
+
+
+def daemon_uses_context_proxies() -> bool:
+    # With the per-context proxy placeholder the daemon's default context has no usable proxy
+    state = _read_daemon_state()
+    return bool(state and state.get('proxy_per_context', True))
+
+
+def _needs_context_proxies() -> bool:
+    # The placeholder is only launched when some account brings its own proxy; contexts without one are direct then
+    if mainconfig.PROXY_POOL or mainconfig.PROXY_POOL_FILE:
+        return True
+
+    for uploader_name in mainconfig.UPLOADER_CONFIG_FACTORIES:
+        try:
+            accounts = mainconfig.get_uploader_accounts(uploader_name)
+        except Exception as e:
+            _logger.debug(f"Skipping the proxies of '{uploader_name}', its accounts are not configured: {e}")
+            continue
+
+        if any(account.proxy_settings for account in accounts):
+            return True
+
+    return False
+
+
+def _read_daemon_state() -> Optional[dict]:
+    state_file = mainconfig.BROWSER_DAEMON_STATE_FILE
+
+    if not mainconfig.BROWSER_DAEMON_ENABLED or not os.path.exists(state_file):
+        return None
+
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        _logger.warning(f"Cannot read browser daemon state file '{state_file}': {e}")
+        return None
+
+    if not _is_process_alive(state.get('pid')):
+        return None
+
+    return state
+
+
+def _is_process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+
+    if sys.platform.startswith('win'):
+        # os.kill(pid, 0) would terminate the process on Windows, so let the CDP connect decide
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def _write_daemon_state(endpoint: str, proxy_per_context: bool) -> None:
+    state_file = mainconfig.BROWSER_DAEMON_STATE_FILE
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    tmp_file = f'{state_file}.tmp'
+
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'pid': os.getpid(), 'endpoint': endpoint, 'proxy_per_context': proxy_per_context}, f)
+
+    os.replace(tmp_file, state_file)
+
+
+def _remove_daemon_state() -> None:
+    try:
+        os.remove(mainconfig.BROWSER_DAEMON_STATE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+async def run_daemon(port: int, headless: bool) -> None:
+    from playwright.async_api import async_playwright
+
+    from common.chromium_provisioner import ensure_chromium
+    from uploaders.base.base_uploader import get_launch_args
+
+    executable_path = await ensure_chromium()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop_event.set))
+
+    proxy_per_context = _needs_context_proxies()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            executable_path=executable_path,
+            headless=headless,
+            args=[
+                *get_launch_args(headless, mainconfig.BROWSER_DAEMON_LAUNCH_PROFILE),
+                f'--remote-debugging-port={port}',
+                '--remote-debugging-address=127.0.0.1',
+            ],
+            proxy={'server': 'http://per-context'} if proxy_per_context else None,
+        )
+        endpoint = f'http://127.0.0.1:{port}'
+        _write_daemon_state(endpoint, proxy_per_context)
+        _logger.info(f"Browser daemon is listening on {endpoint} (pid {os.getpid()})")
+
+        try:
+            disconnected = asyncio.Event()
+            browser.on('disconnected', lambda *_: disconnected.set())
+            await asyncio.wait(
+                [asyncio.create_task(stop_event.wait()), asyncio.create_task(disconnected.wait())],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            _remove_daemon_state()
+
+            if browser.is_connected():
+                await browser.close()
+
+            _logger.info("Browser daemon stopped")
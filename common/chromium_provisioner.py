@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from typing import Optional
+from urllib.parse import (
+    unquote,
+    urlparse,
+)
+
+from common.file_lock import file_lock
+from common.hashing import hash_file
+from common.logging_setup import get_named_logger
+from config import mainconfig
+
+_logger = get_named_logger('chromium')
+
+_MANIFEST_NAME = 'manifest.json'
+_COPY_CHUNK_SIZE = 1024 * 1024
+_EXECUTABLE_NAME = 'chrome.exe' if sys.platform.startswith('win') else 'chrome'
+
+# Last validated manifest of this process: (executable, size, mtime_ns)
+_resolved: Optional[tuple[str, int, int]] = None
+_provisioning_task: Optional[asyncio.Task] = None
+
+
+def resolve_chromium(folder: str = None) -> Optional[str]:
+    # O(1) lookup through the manifest, validated with a single stat; installs without a manifest are found
+    # once by walking the folder and recorded
+    global _resolved
+    folder = folder or mainconfig.CHROMIUM_FOLDER
+
+    if _resolved and _is_unchanged(*_resolved):
+        return _resolved[0]
+
+    manifest = _read_manifest(folder)
+
+    if manifest:
+        executable = os.path.join(folder, manifest['executable'])
+
+        if _is_unchanged(executable, manifest['size'], manifest['mtime_ns']):
+            _resolved = (executable, manifest['size'], manifest['mtime_ns'])
+            return executable
+
+        _logger.info("Chromium manifest is stale, looking for the executable again")
+
+    executable = _find_executable(folder)
+
+    if not executable:
+        return None
+
+    _write_manifest(folder, executable, version=manifest.get('version') if manifest else None)
+    return executable
+
+
+async def ensure_chromium() -> str:
+    executable = resolve_chromium()
+
+    if executable:
+        return executable
+
+    return await start_chromium_provisioning()
+
+
+def start_chromium_provisioning() -> asyncio.Task:
+    # Starts the download in the background right away; every caller awaits the same task
+    global _provisioning_task
+
+    if _provisioning_task is None or _provisioning_task.cancelled() \
+            or (_provisioning_task.done() and _provisioning_task.exception()):
+        _provisioning_task = asyncio.create_task(asyncio.to_thread(provision_chromium))
+        _provisioning_task.add_done_callback(_log_provisioning_failure)
+
+    return _provisioning_task
+
+
+def _log_provisioning_failure(task: asyncio.Task) -> None:
+    # Also marks the exception as retrieved when the run ends before anything awaited the task
+    if not task.cancelled() and task.exception():
+        _logger.error(f"Chromium provisioning failed: {task.exception()}")
+
+
+def provision_chromium(folder: str = None, url: str = None, sha256: str = None, version: str = None) -> str:
+    folder = folder or mainconfig.CHROMIUM_FOLDER
+    url = url or mainconfig.CHROMIUM_DOWNLOAD_URL
+    sha256 = (sha256 or mainconfig.CHROMIUM_SHA256 or '').lower()
+    version = version or mainconfig.CHROMIUM_VERSION or 'custom'
+
+    if not url:
+        raise RuntimeError(f"No Chromium download is configured for {sys.platform}, set CHROMIUM_DOWNLOAD_URL")
+
+    if not sha256 and mainconfig.CHROMIUM_REQUIRE_SHA256:
+        raise RuntimeError(
+            f"No checksum is configured for the Chromium download {url}: verify the archive and set CHROMIUM_SHA256 "
+            "to its sha256, or set CHROMIUM_REQUIRE_SHA256=False to install it unverified"
+        )
+
+    os.makedirs(folder, exist_ok=True)
+
+    # Parallel processes wait here and then find the executable the first one installed
+    with file_lock(os.path.join(folder, '.provision.lock')):
+        executable = resolve_chromium(folder)
+
+        if executable:
+            return executable
+
+        archive_name = os.path.basename(unquote(urlparse(url).path)) or 'chromium'
+        url_hash = hashlib.sha256(url.encode()).hexdigest()[:12]
+        archive = os.path.join(folder, f'.download-{url_hash}-{archive_name}')
+        started_at = time.monotonic()
+        _logger.info(f"Provisioning Chromium {version} from {url}")
+
+        _download(url, f'{archive}.part')
+        actual_sha256 = hash_file(f'{archive}.part')
+
+        if sha256 and actual_sha256 != sha256:
+            os.remove(f'{archive}.part')
+            raise RuntimeError(f"Chromium archive checksum mismatch: expected {sha256}, got {actual_sha256}")
+
+        if not sha256:
+            _logger.warning(
+                f"!!! Installing an UNVERIFIED Chromium archive from {url} (sha256 {actual_sha256}) because "
+                "CHROMIUM_REQUIRE_SHA256=False. Check it and pin it with CHROMIUM_SHA256 !!!"
+            )
+
+        os.replace(f'{archive}.part', archive)
+        install_dir = os.path.join(folder, version)
+        staging_dir = f'{install_dir}.staging'
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        _extract(archive, staging_dir)
+        shutil.rmtree(install_dir, ignore_errors=True)
+        os.replace(staging_dir, install_dir)
+        os.remove(archive)
+
+        executable = _find_executable(install_dir)
+
+        if not executable:
+            raise FileNotFoundError(f"No '{_EXECUTABLE_NAME}' in the Chromium archive from {url}")
+
+        if not sys.platform.startswith('win'):
+            os.chmod(executable, os.stat(executable).st_mode | 0o111)
+
+        _write_manifest(folder, executable, version=version, url=url, sha256=actual_sha256)
+        _logger.info(f"Chromium {version} installed in {time.monotonic() - started_at:.0f} s: {executable}")
+        return executable
+
+
+def _download(url: str, part_path: str) -> None:
+    # Resumes a previous partial download: an HTTP Range request, or a seek for local mirrors
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    parsed = urlparse(url)
+
+    if parsed.scheme in ('', 'file') or os.path.exists(url):
+        source_path = unquote(parsed.path) if parsed.scheme == 'file' else url
+
+        with open(source_path, 'rb') as source, open(part_path, 'ab') as target:
+            total = os.fstat(source.fileno()).st_size
+            source.seek(offset)
+            _copy(source, target, offset, total)
+        return
+
+    request = urllib.request.Request(url, headers={'Range': f'bytes={offset}-'} if offset else {})
+
+    try:
+        response = urllib.request.urlopen(request, timeout=60)
+    except urllib.error.HTTPError as e:
+        # The previous run got every byte but stopped before verifying
+        if offset and e.code == 416:
+            return
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            _logger.info("Chromium mirror does not support resuming, downloading from the start")
+            offset = 0
+
+        if offset:
+            _logger.info(f"Resuming Chromium download at {offset / 1024 ** 2:.0f} MB")
+
+        length = int(response.headers.get('Content-Length') or 0)
+
+        with open(part_path, 'ab' if offset else 'wb') as target:
+            _copy(response, target, offset, offset + length if length else 0)
+
+
+def _copy(source, target, done: int, total: int) -> None:
+    next_report = 0.1
+
+    while chunk := source.read(_COPY_CHUNK_SIZE):
+        target.write(chunk)
+        done += len(chunk)
+
+        if total and done / total >= next_report:
+            _logger.info(f"Chromium download: {done / 1024 ** 2:.0f}/{total / 1024 ** 2:.0f} MB")
+            next_report += 0.1
+
+
+def _extract(archive: str, target_dir: str) -> None:
+    os.makedirs(target_dir, exist_ok=True)
+
+    if tarfile.is_tarfile(archive):
+        with tarfile.open(archive) as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(target_dir, filter='data')
+            else:
+                tar.extractall(target_dir)
+    elif zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zip_file:
+            zip_file.extractall(target_dir)
+    else:
+        # .7z builds for Windows: the bundled WinRAR, else a 7-Zip on PATH
+        winrar = os.path.join(mainconfig.PROJECT_ROOT_FOLDER, 'WinRARPortable', 'WinRARPortable.exe')
+        seven_zip = shutil.which('7z')
+
+        if sys.platform.startswith('win') and os.path.exists(winrar):
+            command = [winrar, 'x', archive, target_dir + os.sep]
+        elif seven_zip:
+            command = [seven_zip, 'x', archive, f'-o{target_dir}', '-y']
+        else:
+            raise RuntimeError(f"Cannot extract '{archive}': unknown archive type and no 7z available")
+
+        subprocess.run(command, check=True, capture_output=True, timeout=1200)
+
+
+def _find_executable(folder: str) -> Optional[str]:
+    for root, _, files in os.walk(folder):
+        if _EXECUTABLE_NAME in files:
+            return os.path.abspath(os.path.join(root, _EXECUTABLE_NAME))
+
+    return None
+
+
+def _is_unchanged(executable: str, size: int, mtime_ns: int) -> bool:
+    try:
+        stat = os.stat(executable)
+    except OSError:
+        return False
+
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+
+def _read_manifest(folder: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(folder, _MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        _logger.warning(f"Ignoring unreadable Chromium manifest: {e}")
+        return None
+
+
+def _write_manifest(folder: str, executable: str, version: str = None, url: str = None, sha256: str = None) -> None:
+    global _resolved
+    stat = os.stat(executable)
+    _resolved = (executable, stat.st_size, stat.st_mtime_ns)
+    manifest_path = os.path.join(folder, _MANIFEST_NAME)
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'executable': os.path.relpath(executable, folder),
+                'version': version,
+                'url': url,
+                'sha256': sha256,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+            }, f, indent=2)
+
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        _logger.warning(f"Cannot write Chromium manifest '{manifest_path}': {e}")
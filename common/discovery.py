@@ -0,0 +1,300 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+from common.logging_setup import get_named_logger
+
+_logger = get_named_logger('discovery')
+
+ORDER_BY_MTIME = 'mtime'
+ORDER_BY_NAME = 'name'
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _scan(folder: str, recursive: bool) -> list[os.DirEntry]:
+    entries = []
+    pending = [folder]
+
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.is_file():
+                        entries.append(entry)
+        except OSError as e:
+            _logger.warning(f"Cannot scan folder: {e}")
+
+    return entries
+
+
+def _is_candidate(name: str, extensions: tuple[str, ...]) -> bool:
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def _is_ready(path: str, mtime: float, stable_seconds: float, marker_suffix: Optional[str], now: float) -> bool:
+    if marker_suffix and not os.path.exists(f'{path}{marker_suffix}'):
+        return False
+
+    return now - mtime >= stable_seconds
+
+
+def discover_files(
+    folder: str,
+    extensions: tuple[str, ...],
+    recursive: bool = False,
+    order: str = ORDER_BY_MTIME,
+    stable_seconds: float = 0,
+    marker_suffix: Optional[str] = None,
+) -> list[str]:
+    folder = os.path.abspath(folder)
+
+    if not os.path.isdir(folder):
+        return []
+
+    now = time.time()
+    found = []
+
+    for entry in _scan(folder, recursive):
+        if not _is_candidate(entry.name, extensions):
+            continue
+
+        stat = entry.stat()
+
+        if _is_ready(entry.path, stat.st_mtime, stable_seconds, marker_suffix, now):
+            found.append((stat.st_mtime, entry.path))
+
+    if order == ORDER_BY_NAME:
+        found.sort(key=lambda item: item[1])
+    else:
+        found.sort()
+
+    return [path for _, path in found]
+
+
+class FolderWatcher:
+    # Yields batches of newly arrived files; inotify on Linux, scandir polling elsewhere
+
+    def __init__(
+        self,
+        folder: str,
+        extensions: tuple[str, ...],
+        recursive: bool = False,
+        order: str = ORDER_BY_MTIME,
+        stable_seconds: float = 0,
+        marker_suffix: Optional[str] = None,
+        poll_interval: float = 2.0,
+    ):
+        self._folder = os.path.abspath(folder)
+        self._extensions = extensions
+        self._recursive = recursive
+        self._order = order
+        self._stable_seconds = stable_seconds
+        self._marker_suffix = marker_suffix
+        self._poll_interval = poll_interval
+        self._seen: set[str] = set()
+        # Candidates that are not ready yet: wall-clock time at which they become stable, or None while only the
+        # marker file is missing
+        self._pending: dict[str, Optional[float]] = {}
+
+    async def batches(self) -> AsyncIterator[list[str]]:
+        inotify = _Inotify.create()
+
+        try:
+            if inotify:
+                _logger.info(f"Watching '{self._folder}' with inotify")
+                inotify.watch_tree(self._folder, self._recursive)
+            else:
+                _logger.info(f"Watching '{self._folder}' by polling every {self._poll_interval} s")
+
+            # Files present at start-up are checked once; those not ready yet become pending
+            batch = self._check(self._list_new())
+
+            while True:
+                if batch:
+                    yield batch
+
+                if inotify:
+                    # Wakes on events or when the earliest pending file becomes stable, whichever comes first
+                    changed = await inotify.wait_for_changes(timeout=self._seconds_until_next_deadline())
+                    candidates = self._list_new() if changed is None else changed
+                    candidates |= self._due_pending(include_marker_waits=False)
+                else:
+                    # Listing a folder costs no stat per entry; only new and pending files are stat'ed
+                    await asyncio.sleep(self._poll_interval)
+                    candidates = self._list_new() | self._due_pending(include_marker_waits=True)
+
+                batch = self._check(candidates)
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _list_new(self) -> set[str]:
+        if not os.path.isdir(self._folder):
+            return set()
+
+        return {
+            entry.path for entry in _scan(self._folder, self._recursive)
+            if _is_candidate(entry.name, self._extensions)
+            and entry.path not in self._seen and entry.path not in self._pending
+        }
+
+    def _due_pending(self, include_marker_waits: bool) -> set[str]:
+        now = time.time()
+        return {
+            path for path, deadline in self._pending.items()
+            if (deadline is None and include_marker_waits) or (deadline is not None and deadline <= now)
+        }
+
+    def _seconds_until_next_deadline(self) -> Optional[float]:
+        deadlines = [deadline for deadline in self._pending.values() if deadline is not None]
+        return max(0.0, min(deadlines) - time.time()) if deadlines else None
+
+    def _check(self, candidates: set[str]) -> list[str]:
+        now = time.time()
+        ready = []
+
+        if self._marker_suffix:
+            candidates = {
+                path[:-len(self._marker_suffix)] if path.endswith(self._marker_suffix) else path
+                for path in candidates
+            }
+
+        for path in candidates:
+            if path in self._seen or not _is_candidate(path, self._extensions):
+                continue
+
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                self._pending.pop(path, None)
+                continue
+
+            if _is_ready(path, mtime, self._stable_seconds, self._marker_suffix, now):
+                self._pending.pop(path, None)
+                ready.append((mtime, path))
+            else:
+                self._pending[path] = mtime + self._stable_seconds if now - mtime < self._stable_seconds else None
+
+        ready.sort(key=lambda item: item[1] if self._order == ORDER_BY_NAME else item)
+        batch = [path for _, path in ready]
+        self._seen.update(batch)
+        return batch
+
+
+class _Inotify:
+    def __init__(self, libc, fd: int):
+        self._libc = libc
+        self._fd = fd
+        self._watches: dict[int, str] = {}
+        self._changed: set[str] = set()
+        self._overflowed = False
+        self._event = asyncio.Event()
+        self._recursive = False
+        asyncio.get_running_loop().add_reader(fd, self._on_readable)
+
+    @classmethod
+    def create(cls) -> Optional["_Inotify"]:
+        if not sys.platform.startswith('linux'):
+            return None
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            _logger.debug(f"inotify is not available: {e}")
+            return None
+
+        if fd < 0:
+            return None
+
+        return cls(libc, fd)
+
+    def watch_tree(self, folder: str, recursive: bool) -> None:
+        self._recursive = recursive
+        self._add_watch(folder)
+
+        if recursive:
+            for root, dirs, _ in os.walk(folder):
+                for name in dirs:
+                    self._add_watch(os.path.join(root, name))
+
+    def _add_watch(self, folder: str) -> None:
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), mask)
+
+        if wd < 0:
+            _logger.warning(f"Cannot watch '{folder}': {os.strerror(ctypes.get_errno())}")
+            return
+
+        self._watches[wd] = folder
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, name_length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+
+            if mask & _IN_Q_OVERFLOW:
+                self._overflowed = True
+                continue
+
+            folder = self._watches.get(wd)
+
+            if not folder or not name:
+                continue
+
+            path = os.path.join(folder, name)
+
+            if mask & _IN_ISDIR:
+                if self._recursive and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add_watch(path)
+                    self._overflowed = True
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                self._changed.add(path)
+
+        self._event.set()
+
+    async def wait_for_changes(self, timeout: Optional[float]) -> Optional[set[str]]:
+        # None means "rescan everything" (queue overflow or a new sub-folder); a timeout returns no changes
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return set()
+
+        self._event.clear()
+        changed, self._changed = self._changed, set()
+
+        if self._overflowed:
+            self._overflowed = False
+            return None
+
+        return changed
+
+    def close(self) -> None:
+        asyncio.get_running_loop().remove_reader(self._fd)
+        os.close(self._fd)
@@ -1,2 +1,35 @@
 class AuthException(Exception):
     pass
+
+
+class UploadBatchException(Exception):
+    def __init__(self, failures: dict):
+        self.failures = failures
+        super().__init__(f"{len(failures)} upload(s) failed: {', '.join(map(str, failures))}")
+
+
+class UploadTransportException(Exception):
+    pass
+
+
+class PostNotConfirmedException(Exception):
+    pass
+
+
+class PageLoadException(Exception):
+    def __init__(self, url: str, status: int = None):
+        self.url = url
+        self.status = status
+        super().__init__(f"Failed to load page or bad response: {status or 'No response'} ({url})")
+
+
+class SelectorNotFoundException(Exception):
+    pass
+
+
+class CircuitOpenException(Exception):
+    pass
+
+
+class RetryBudgetExceededException(Exception):
+    pass
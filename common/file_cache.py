@@ -0,0 +1,80 @@
+import os
+import uuid
+from typing import Optional
+
+from common.logging_setup import get_named_logger
+
+_logger = get_named_logger('file_cache')
+_TMP_MARKER = '.tmp'
+
+
+class FileCache:
+    # Content-addressed files in one folder, evicted least-recently-used first once max_bytes is exceeded
+
+    def __init__(self, folder: str, max_bytes: int):
+        self._folder = folder
+        self._max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, key: str, suffix: str = '') -> str:
+        return os.path.join(self._folder, f'{key}{suffix}')
+
+    def get(self, key: str, suffix: str = '') -> Optional[str]:
+        path = self.path_for(key, suffix)
+
+        try:
+            # mtime doubles as the LRU timestamp
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def tmp_path(self, key: str, suffix: str = '') -> str:
+        # Keep the real suffix last so tools that sniff the extension (ffmpeg) still work
+        return os.path.join(self._folder, f'{key}.{uuid.uuid4().hex}{_TMP_MARKER}{suffix}')
+
+    def commit(self, tmp_path: str, key: str, suffix: str = '') -> str:
+        path = self.path_for(key, suffix)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def discard(self, tmp_path: str) -> None:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: str = None) -> int:
+        entries = []
+        total_bytes = 0
+
+        with os.scandir(self._folder) as it:
+            for entry in it:
+                if not entry.is_file() or _TMP_MARKER in entry.name:
+                    continue
+
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        evicted = 0
+
+        for _, size, path in sorted(entries):
+            if total_bytes <= self._max_bytes:
+                break
+            if keep and os.path.samefile(path, keep):
+                continue
+
+            try:
+                os.remove(path)
+                total_bytes -= size
+                evicted += 1
+            except OSError as e:
+                _logger.warning(f"Cannot evict cached file '{path}': {e}")
+
+        if evicted:
+            _logger.debug(f"Evicted {evicted} file(s) from '{self._folder}'")
+
+        return evicted
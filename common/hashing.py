@@ -0,0 +1,23 @@
+import hashlib
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str, chunk_size: int = _CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def hash_files(paths: list, extra: str = '') -> str:
+    digest = hashlib.sha256()
+
+    for path in paths:
+        digest.update(hash_file(path).encode())
+
+    digest.update(extra.encode())
+    return digest.hexdigest()
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from common.hashing import hash_file
+from common.logging_setup import get_named_logger
+
+_logger = get_named_logger('ledger')
+
+STATUS_PENDING = 'pending'
+STATUS_UPLOADING = 'uploading'
+STATUS_POSTED = 'posted'
+STATUS_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    content_hash TEXT NOT NULL,
+    uploader TEXT NOT NULL,
+    account TEXT NOT NULL,
+    status TEXT NOT NULL,
+    path TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, uploader, account)
+);
+"""
+
+
+class UploadLedger:
+    def __init__(self, db_path: str, hash_workers: int = 4):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        self._hash_semaphore = asyncio.Semaphore(hash_workers)
+        # path -> content hash for this run, including aliases of converted files
+        self._path_hashes: dict[str, str] = {}
+
+    def close(self) -> None:
+        self._connection.close()
+
+    async def resolve_hashes(self, files: list) -> dict[str, str]:
+        await asyncio.gather(*(self._resolve_hash(file) for file in files))
+        return {file: self._path_hashes[file] for file in files}
+
+    def add_alias(self, path: str, original_path: str) -> None:
+        if path != original_path and original_path in self._path_hashes:
+            self._path_hashes[path] = self._path_hashes[original_path]
+
+    async def filter_unposted(self, files: list, uploader: str, account: str = None) -> list:
+        hashes = await self.resolve_hashes(files)
+        unposted = [file for file in files if not self.is_posted(hashes[file], uploader, account)]
+        skipped = len(files) - len(unposted)
+
+        if skipped:
+            _logger.info(f"Skipping {skipped} already posted file(s)")
+
+        resumed = sum(
+            1 for file in unposted
+            if self._get_status(hashes[file], uploader, account) in (STATUS_PENDING, STATUS_UPLOADING)
+        )
+
+        if resumed:
+            _logger.info(f"Resuming {resumed} interrupted file(s)")
+
+        return unposted
+
+    def is_posted(self, content_hash: str, uploader: str, account: str = None) -> bool:
+        return self._get_status(content_hash, uploader, account) == STATUS_POSTED
+
+    def set_status(self, path: str, uploader: str, account: str, status: str, error: str = None) -> None:
+        content_hash = self._path_hashes.get(path)
+
+        if not content_hash:
+            _logger.debug(f"No content hash known for '{path}', status '{status}' is not recorded")
+            return
+
+        self._connection.execute(
+            """
+            INSERT INTO uploads (content_hash, uploader, account, status, path, attempts, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (content_hash, uploader, account) DO UPDATE SET
+                status = excluded.status,
+                path = excluded.path,
+                attempts = uploads.attempts + excluded.attempts,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            (content_hash, uploader, account, status, path, int(status == STATUS_UPLOADING), error, time.time()),
+        )
+
+    def _get_status(self, content_hash: str, uploader: str, account: str = None) -> Optional[str]:
+        query = 'SELECT status FROM uploads WHERE content_hash = ? AND uploader = ?'
+        params = [content_hash, uploader]
+
+        if account:
+            query += ' AND account = ?'
+            params.append(account)
+
+        # A posted row wins when the account is not filtered
+        row = self._connection.execute(f'{query} ORDER BY status = ? DESC LIMIT 1', (*params, STATUS_POSTED)).fetchone()
+        return row[0] if row else None
+
+    async def _resolve_hash(self, path: str) -> str:
+        if path in self._path_hashes:
+            return self._path_hashes[path]
+
+        stat = os.stat(path)
+        row = self._connection.execute(
+            'SELECT content_hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?',
+            (path, stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+
+        if row:
+            content_hash = row[0]
+        else:
+            async with self._hash_semaphore:
+                content_hash = await asyncio.to_thread(hash_file, path)
+
+            self._connection.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime_ns, content_hash),
+            )
+
+        self._path_hashes[path] = content_hash
+        return content_hash
@@ -1,5 +1,25 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import (
+    datetime,
+    timezone,
+)
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 from typing import Literal, Optional
 
 try:
@@ -11,11 +31,17 @@ except ImportError:
 
 LOG_LEVEL = Literal['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
 
+# Fields carried from log_context() onto every record and into JSON output
+CONTEXT_FIELDS = ('uploader', 'account', 'file')
+
 _formatter = logging.Formatter(
     '[%(asctime)s] %(levelname)-8s | %(name)s | %(message)s',
     datefmt='%H:%M:%S'
 )
 
+_log_context: ContextVar[dict] = ContextVar('log_context', default={})
+_listener: Optional[QueueListener] = None
+
 
 class ColorFormatter(logging.Formatter):
     COLORS = {
@@ -35,18 +61,157 @@ class ColorFormatter(logging.Formatter):
         return msg
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+
+            if value is not None:
+                payload[field] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    # Copies the current log_context() onto the record; explicit `extra=` values win
+    def filter(self, record):
+        for field, value in _log_context.get().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class DebugRateLimitFilter(logging.Filter):
+    # Samples DEBUG records and caps them per call site with a token bucket; other levels always pass
+
+    def __init__(self, rate: float = 0, sample: float = 1.0):
+        super().__init__()
+        self._rate = rate
+        self._sample = sample
+        self._buckets: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+
+        # Several handlers share one decision per record
+        decision = getattr(record, '_debug_allowed', None)
+
+        if decision is None:
+            decision = self._decide(record)
+            record._debug_allowed = decision
+
+        return decision
+
+    def _decide(self, record) -> bool:
+        if self._sample < 1.0 and random.random() >= self._sample:
+            return False
+
+        if self._rate <= 0:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        burst = max(1.0, self._rate)
+
+        with self._lock:
+            # [tokens, last refill, suppressed since the last emitted record]
+            bucket = self._buckets.setdefault(key, [burst, now, 0])
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * self._rate)
+            bucket[1] = now
+
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+
+        return True
+
+
+class _ContextQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Render the message on the caller's side; formatting, colors and tracebacks are left to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+@contextmanager
+def log_context(**fields):
+    token = _log_context.set({**_log_context.get(), **fields})
+
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def stop_logging_listener() -> None:
+    global _listener
+
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def _create_file_handler(log_file: str, max_bytes: int, backup_count: int,
+                         rotate_when: Optional[str]) -> logging.Handler:
+    os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+
+    if rotate_when:
+        return TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8')
+
+    if max_bytes:
+        return RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+    return logging.FileHandler(log_file, encoding='utf-8')
+
+
 def setup_logging(
     level: LOG_LEVEL = 'INFO',
     log_file: Optional[str] = None,
-    use_colors: bool = True
+    use_colors: bool = True,
+    use_queue: bool = False,
+    json_format: bool = False,
+    max_bytes: int = 0,
+    backup_count: int = 5,
+    rotate_when: Optional[str] = None,
+    debug_rate: float = 0,
+    debug_sample: float = 1.0,
 ):
+    global _listener
+
+    stop_logging_listener()
+
     if logging.getLogger().hasHandlers():
         logging.getLogger().handlers.clear()
 
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
 
-    if use_colors and COLORAMA_ENABLED:
+    if json_format:
+        console_handler.setFormatter(JsonFormatter())
+    elif use_colors and COLORAMA_ENABLED:
         console_handler.setFormatter(ColorFormatter(_formatter._fmt, _formatter.datefmt))
     else:
         console_handler.setFormatter(_formatter)
@@ -54,13 +219,32 @@ def setup_logging(
     handlers = [console_handler]
 
     if log_file:
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler = _create_file_handler(log_file, max_bytes, backup_count, rotate_when)
         file_handler.setLevel('DEBUG')
-        file_handler.setFormatter(_formatter)
+        file_handler.setFormatter(JsonFormatter() if json_format else _formatter)
         handlers.append(file_handler)
 
+    filters = [ContextFilter()]
+
+    if debug_rate > 0 or debug_sample < 1.0:
+        filters.append(DebugRateLimitFilter(rate=debug_rate, sample=debug_sample))
+
+    if use_queue:
+        # Handlers run on a background thread so console and disk I/O never block the event loop
+        _listener = QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+        _listener.start()
+        handlers = [_ContextQueueHandler(_listener.queue)]
+
+    for handler in handlers:
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+
     logging.basicConfig(level=level, handlers=handlers, force=True)
 
 
 def get_named_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
+
+
+# Runs before logging's own shutdown hook, so queued records are flushed first
+atexit.register(stop_logging_listener)
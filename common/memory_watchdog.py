@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+from typing import Optional
+
+from common.logging_setup import get_named_logger
+from common.process_memory import chromium_rss
+
+_logger = get_named_logger('memory_watchdog')
+
+# Accounts sharing a browser all see its whole RSS; after one of them recycles, the others wait this long so the
+# freed memory shows up before anyone else decides to recycle
+_SHARED_RECYCLE_COOLDOWN = 60
+# Browser pid -> monotonic time of its last RSS-triggered recycle
+_shared_recycles: dict[int, float] = {}
+
+
+class MemoryWatchdog:
+    # Decides when a long-lived page or context should be recycled: after N uploads or above a Chromium RSS limit
+
+    def __init__(self, recycle_after_uploads: int = 0, max_rss_bytes: int = 0):
+        self._recycle_after_uploads = recycle_after_uploads
+        self._max_rss_bytes = max_rss_bytes
+        self._uploads = 0
+        self._browser_pid: Optional[int] = None
+        self._shared = False
+        self._warned_no_chromium = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._recycle_after_uploads > 0 or self._max_rss_bytes > 0
+
+    @property
+    def browser_pid(self) -> Optional[int]:
+        return self._browser_pid
+
+    def watch(self, browser_pid: Optional[int], shared: bool = False) -> None:
+        # browser_pid is the process Chromium descends from (the browser daemon); None means this process
+        self._browser_pid = browser_pid
+        self._shared = shared
+
+    def record_upload(self) -> Optional[str]:
+        # Returns why the page or context should be recycled now, if it should
+        self._uploads += 1
+
+        if self._recycle_after_uploads and self._uploads >= self._recycle_after_uploads:
+            return f'{self._uploads} upload(s) since the last recycle'
+
+        if not self._max_rss_bytes:
+            return None
+
+        pid = self._browser_pid or os.getpid()
+
+        if self._shared and time.monotonic() - _shared_recycles.get(pid, float('-inf')) < _SHARED_RECYCLE_COOLDOWN:
+            return None
+
+        total, renderers = chromium_rss(pid)
+        _logger.debug(f"Chromium RSS {total / 1024 ** 2:.0f} MB (renderers {renderers / 1024 ** 2:.0f} MB)")
+
+        if not total and not self._warned_no_chromium:
+            self._warned_no_chromium = True
+            _logger.warning(
+                "A memory limit is set but no Chromium process was found under pid "
+                f"{pid}{'' if sys.platform.startswith('linux') else ' (only measured on Linux)'}; "
+                "the limit will not trigger"
+            )
+
+        if total > self._max_rss_bytes:
+            if self._shared:
+                _shared_recycles[pid] = time.monotonic()
+
+            return f'Chromium RSS {total / 1024 ** 2:.0f} MB above {self._max_rss_bytes / 1024 ** 2:.0f} MB'
+
+        return None
+
+    def reset(self) -> None:
+        self._uploads = 0
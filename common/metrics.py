@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from logging import Logger
+from typing import Optional
+
+from common.logging_setup import get_named_logger
+from config import mainconfig
+
+_logger = get_named_logger('metrics')
+
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+OUTCOME_CANCELLED = 'cancelled'
+
+# Spans are buffered and appended to the JSON-lines file in batches
+_JSONL_FLUSH_EVERY = 50
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return False
+
+    async def __aenter__(self) -> "_NoopSpan":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('_recorder', 'name', 'labels', '_started_at', '_started_perf')
+
+    def __init__(self, recorder: "MetricsRecorder", name: str, labels: dict):
+        self._recorder = recorder
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "Span":
+        self._started_at = time.time()
+        self._started_perf = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        duration = time.perf_counter() - self._started_perf
+
+        if exc_type is None:
+            outcome = OUTCOME_OK
+        elif issubclass(exc_type, asyncio.CancelledError):
+            outcome = OUTCOME_CANCELLED
+        else:
+            outcome = OUTCOME_ERROR
+
+        self._recorder.record(
+            self.name, self._started_at, duration, outcome,
+            exc_type.__name__ if exc_type else None, self.labels,
+        )
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+
+class MetricsRecorder:
+    def __init__(self, enabled: bool, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 labels: dict = None):
+        self.enabled = enabled
+        self._jsonl_path = jsonl_path
+        self._prometheus_path = prometheus_path
+        # Constant labels of this process, e.g. the worker number of a --workers run
+        self._labels = labels or {}
+        self._pending_lines: list[str] = []
+        self._durations: dict[tuple[str, str], list[float]] = defaultdict(list)
+
+    def span(self, name: str, **labels):
+        if not self.enabled:
+            return _NOOP_SPAN
+
+        return Span(self, name, labels)
+
+    def record(self, name: str, started_at: float, duration: float, outcome: str, error: Optional[str],
+               labels: dict) -> None:
+        self._durations[(name, outcome)].append(duration)
+
+        if self._jsonl_path:
+            self._pending_lines.append(json.dumps({
+                'span': name,
+                'started_at': round(started_at, 6),
+                'duration': round(duration, 6),
+                'outcome': outcome,
+                'error': error,
+                **self._labels,
+                **labels,
+            }))
+
+            if len(self._pending_lines) >= _JSONL_FLUSH_EVERY:
+                self._flush_jsonl()
+
+    def finalize(self, logger: Logger = None) -> None:
+        if not self.enabled or not self._durations:
+            return
+
+        self._flush_jsonl()
+        self._write_prometheus()
+        self.log_summary(logger or _logger)
+
+    def log_summary(self, logger: Logger) -> None:
+        logger.info(f"{'stage':<20}{'outcome':<10}{'count':>7}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+
+        for (name, outcome), durations in sorted(self._durations.items()):
+            ordered = sorted(durations)
+            p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+            logger.info(
+                f"{name:<20}{outcome:<10}{len(ordered):>7}{sum(ordered):>10.2f}"
+                f"{sum(ordered) / len(ordered) * 1000:>10.0f}{p95 * 1000:>10.0f}{ordered[-1] * 1000:>10.0f}"
+            )
+
+    def _flush_jsonl(self) -> None:
+        if not self._jsonl_path or not self._pending_lines:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._jsonl_path)), exist_ok=True)
+
+            with open(self._jsonl_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(self._pending_lines) + '\n')
+        except OSError as e:
+            _logger.warning(f"Cannot write metrics to '{self._jsonl_path}': {e}")
+
+        self._pending_lines.clear()
+
+    def _write_prometheus(self) -> None:
+        if not self._prometheus_path:
+            return
+
+        lines = [
+            '# HELP uploader_stage_duration_seconds Time spent in an uploader stage.',
+            '# TYPE uploader_stage_duration_seconds summary',
+        ]
+        max_lines = [
+            '# HELP uploader_stage_duration_seconds_max Longest single run of an uploader stage.',
+            '# TYPE uploader_stage_duration_seconds_max gauge',
+        ]
+
+        constant_labels = ''.join(f',{key}="{value}"' for key, value in sorted(self._labels.items()))
+
+        for (name, outcome), durations in sorted(self._durations.items()):
+            labels = f'stage="{name}",outcome="{outcome}"{constant_labels}'
+            lines.append(f'uploader_stage_duration_seconds_sum{{{labels}}} {sum(durations):.6f}')
+            lines.append(f'uploader_stage_duration_seconds_count{{{labels}}} {len(durations)}')
+            max_lines.append(f'uploader_stage_duration_seconds_max{{{labels}}} {max(durations):.6f}')
+
+        # Write-then-rename so the node_exporter textfile collector never reads a partial file
+        tmp_path = f'{self._prometheus_path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._prometheus_path)), exist_ok=True)
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines + max_lines) + '\n')
+
+            os.replace(tmp_path, self._prometheus_path)
+        except OSError as e:
+            _logger.warning(f"Cannot write metrics to '{self._prometheus_path}': {e}")
+
+
+_recorder: Optional[MetricsRecorder] = None
+
+
+def get_metrics() -> MetricsRecorder:
+    global _recorder
+
+    if _recorder is None:
+        _recorder = MetricsRecorder(
+            enabled=mainconfig.METRICS_ENABLED,
+            jsonl_path=mainconfig.METRICS_JSONL_PATH,
+            prometheus_path=mainconfig.METRICS_PROMETHEUS_PATH,
+        )
+
+    return _recorder
+
+
+def configure_metrics(jsonl_path: Optional[str], prometheus_path: Optional[str], **labels) -> MetricsRecorder:
+    # Worker processes write their own files so concurrent appends and renames never collide
+    global _recorder
+
+    _recorder = MetricsRecorder(
+        enabled=mainconfig.METRICS_ENABLED,
+        jsonl_path=jsonl_path,
+        prometheus_path=prometheus_path,
+        labels=labels,
+    )
+    return _recorder
+
+
+def span(name: str, **labels):
+    return get_metrics().span(name, **labels)
+
+
+def timed_stage(name: str):
+    # Wraps an async uploader method in a span labelled with the uploader's metric_labels
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            recorder = get_metrics()
+
+            if not recorder.enabled:
+                return await func(self, *args, **kwargs)
+
+            with recorder.span(name, **getattr(self, 'metric_labels', {})):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
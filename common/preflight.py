@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Optional
+
+from common.file_cache import FileCache
+from common.hashing import hash_file
+from common.logging_setup import get_named_logger
+from common.metrics import span
+from common.slideshow import (
+    communicate_or_kill,
+    get_ffmpeg_executable,
+)
+from config import mainconfig
+
+_logger = get_named_logger('preflight')
+
+UPLOAD_READY_EXTENSIONS = ('.mp4', '.mov')
+UPLOAD_READY_VIDEO_CODECS = ('h264',)
+UPLOAD_READY_AUDIO_CODECS = ('aac',)
+UPLOAD_READY_PIXEL_FORMATS = ('yuv420p', 'yuvj420p')
+
+
+@dataclass
+class VideoProbe:
+    path: str
+    container: str
+    video_codec: Optional[str]
+    audio_codec: Optional[str]
+    pixel_format: Optional[str]
+    width: int
+    height: int
+    duration: float
+    size: int
+
+    @property
+    def video_ready(self) -> bool:
+        return self.video_codec in UPLOAD_READY_VIDEO_CODECS \
+            and self.pixel_format in UPLOAD_READY_PIXEL_FORMATS \
+            and max(self.width, self.height) <= mainconfig.PREFLIGHT_MAX_RESOLUTION
+
+    @property
+    def audio_ready(self) -> bool:
+        return self.audio_codec is None or self.audio_codec in UPLOAD_READY_AUDIO_CODECS
+
+    @property
+    def container_ready(self) -> bool:
+        return os.path.splitext(self.path)[1].lower() in UPLOAD_READY_EXTENSIONS and 'mp4' in self.container
+
+    @property
+    def upload_ready(self) -> bool:
+        return self.video_ready and self.audio_ready and self.container_ready
+
+
+async def probe_video(ffprobe_executable: str, path: str) -> VideoProbe:
+    process = await asyncio.create_subprocess_exec(
+        ffprobe_executable,
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await communicate_or_kill(process)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for '{path}': {stderr.decode(errors='replace').strip()}")
+
+    info = json.loads(stdout)
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+
+    if not video:
+        raise RuntimeError(f"No video stream found in '{path}'")
+
+    return VideoProbe(
+        path=path,
+        container=info.get('format', {}).get('format_name', ''),
+        video_codec=video.get('codec_name'),
+        audio_codec=audio.get('codec_name') if audio else None,
+        pixel_format=video.get('pix_fmt'),
+        width=int(video.get('width') or 0),
+        height=int(video.get('height') or 0),
+        duration=float(info.get('format', {}).get('duration') or 0),
+        size=os.path.getsize(path),
+    )
+
+
+class VideoPreflight:
+    def __init__(self, workers: int = None):
+        self._ffprobe_executable = shutil.which('ffprobe')
+        self._ffmpeg_executable = get_ffmpeg_executable()
+        self._semaphore = asyncio.Semaphore(workers or mainconfig.PREFLIGHT_WORKERS or os.cpu_count() or 1)
+        self._cache = FileCache(mainconfig.PREFLIGHT_CACHE_FOLDER, mainconfig.PREFLIGHT_CACHE_MAX_BYTES)
+
+    async def run(self, files: list) -> list:
+        if not self._ffprobe_executable or not self._ffmpeg_executable:
+            _logger.warning("ffprobe/ffmpeg not found, uploading files as they are")
+            return files
+
+        return list(await asyncio.gather(*(self._prepare(file) for file in files)))
+
+    async def _prepare(self, file: str) -> str:
+        async with self._semaphore:
+            try:
+                probe = await probe_video(self._ffprobe_executable, file)
+            except (OSError, RuntimeError, ValueError) as e:
+                _logger.warning(f"Cannot probe '{file}', uploading it as is: {e}")
+                return file
+
+            if probe.size > mainconfig.PREFLIGHT_MAX_BYTES or probe.duration > mainconfig.PREFLIGHT_MAX_DURATION:
+                _logger.warning(
+                    f"'{file}' exceeds the upload limits ({probe.size} bytes, {probe.duration:.0f} s), "
+                    f"uploading it as is"
+                )
+                return file
+
+            if probe.upload_ready:
+                return file
+
+            try:
+                return await self._convert(probe)
+            except (OSError, RuntimeError) as e:
+                _logger.warning(f"Cannot convert '{file}', uploading it as is: {e}")
+                return file
+
+    async def _convert(self, probe: VideoProbe) -> str:
+        video_args = ['-c:v', 'copy'] if probe.video_ready else [
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p',
+            # Only downscales: smaller videos keep their size (rounded to even dimensions for yuv420p)
+            '-vf', (
+                f"scale='min(iw,{mainconfig.PREFLIGHT_MAX_RESOLUTION})':'min(ih,{mainconfig.PREFLIGHT_MAX_RESOLUTION})'"
+                f":force_original_aspect_ratio=decrease:force_divisible_by=2"
+            ),
+        ]
+        audio_args = ['-c:a', 'copy'] if probe.audio_ready else ['-c:a', 'aac', '-b:a', '128k']
+        action = 'remux' if probe.video_ready and probe.audio_ready else 'transcode'
+
+        cache_key = await asyncio.to_thread(hash_file, probe.path)
+        cache_key = f'{cache_key}_{action}_{mainconfig.PREFLIGHT_MAX_RESOLUTION}'
+        cached_file = self._cache.get(cache_key, '.mp4')
+
+        if cached_file:
+            _logger.info(f"Reusing prepared video for '{probe.path}': {cached_file}")
+            return cached_file
+
+        _logger.info(
+            f"Preparing '{probe.path}' ({action}: {probe.container}, {probe.video_codec}/{probe.audio_codec}, "
+            f"{probe.width}x{probe.height})"
+        )
+        tmp_file = self._cache.tmp_path(cache_key, '.mp4')
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self._ffmpeg_executable,
+                '-y', '-hide_banner', '-loglevel', 'error',
+                '-i', probe.path,
+                '-map', '0:v:0', '-map', '0:a:0?',
+                *video_args,
+                *audio_args,
+                '-movflags', '+faststart',
+                tmp_file,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await communicate_or_kill(process)
+
+            if process.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg exited with code {process.returncode}: {stderr.decode(errors='replace').strip()}"
+                )
+        except BaseException:
+            self._cache.discard(tmp_file)
+            raise
+
+        return self._cache.commit(tmp_file, cache_key, '.mp4')
+
+
+async def preflight_videos(files: list) -> list:
+    if not mainconfig.PREFLIGHT_ENABLED:
+        return files
+
+    async with span('preflight', files=len(files)):
+        return await VideoPreflight().run(files)
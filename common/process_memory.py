@@ -0,0 +1,91 @@
+import os
+import sys
+from typing import Optional
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _children_of(pid: int) -> list[int]:
+    children = []
+
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children', 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+
+    return children
+
+
+def process_tree(pid: int = None) -> list[int]:
+    pids = [pid or os.getpid()]
+    index = 0
+
+    while index < len(pids):
+        pids.extend(_children_of(pids[index]))
+        index += 1
+
+    return pids
+
+
+def process_rss(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_cmdline(pid: int) -> str:
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return ''
+
+
+def process_tree_rss(pid: int = None, cmdline_filter: Optional[str] = None) -> int:
+    # Sum of RSS over a process and all of its descendants, read from /proc (Linux only)
+    if not sys.platform.startswith('linux'):
+        return peak_rss()
+
+    return sum(
+        process_rss(child) for child in process_tree(pid)
+        if not cmdline_filter or cmdline_filter in process_cmdline(child)
+    )
+
+
+def peak_rss() -> int:
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return 0
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage * scale
+
+
+def chromium_rss(pid: int = None) -> tuple[int, int]:
+    # (all Chromium processes, renderers only) among the descendants of this process; (0, 0) off Linux
+    if not sys.platform.startswith('linux'):
+        return 0, 0
+
+    total = renderers = 0
+
+    for child in process_tree(pid):
+        cmdline = process_cmdline(child)
+
+        if 'chrom' not in cmdline.split(' ', 1)[0].lower():
+            continue
+
+        rss = process_rss(child)
+        total += rss
+
+        if '--type=renderer' in cmdline:
+            renderers += rss
+
+    return total, renderers
@@ -1,5 +1,8 @@
 from typing import TypedDict, Optional
-from urllib.parse import urlparse
+from urllib.parse import (
+    quote,
+    urlparse,
+)
 
 from decouple import Config
 
@@ -47,3 +50,17 @@ def proxies_to_proxy_settings(proxies: Proxies) -> Optional[dict]:
         proxy_dict['password'] = password
 
     return proxy_dict
+
+
+def proxy_settings_to_url(proxy_settings: Optional[dict]) -> Optional[str]:
+    if not proxy_settings or not proxy_settings.get('server'):
+        return None
+
+    server = proxy_settings['server']
+    parsed = urlparse(server if '://' in server else f'http://{server}')
+    credentials = ''
+
+    if proxy_settings.get('username'):
+        credentials = f"{quote(proxy_settings['username'], safe='')}:{quote(proxy_settings.get('password', ''), safe='')}@"
+
+    return parsed._replace(netloc=f'{credentials}{parsed.netloc}').geturl()
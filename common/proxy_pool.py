@@ -0,0 +1,210 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from dataclasses import (
+    dataclass,
+    field,
+)
+from logging import Logger
+from typing import Optional
+from urllib.parse import (
+    unquote,
+    urlparse,
+)
+
+from common.logging_setup import get_named_logger
+from common.proxy import proxies_to_proxy_settings
+
+_logger = get_named_logger('proxy_pool')
+
+
+@dataclass
+class ProxyState:
+    url: str
+    settings: dict
+    ewma_latency: Optional[float] = None
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    accounts: set = field(default_factory=set)
+
+    @property
+    def label(self) -> str:
+        return self.settings['server']
+
+
+class ProxyPool:
+    def __init__(
+        self,
+        proxy_urls: list[str],
+        affinity_path: str,
+        probe_target: str = 'www.tiktok.com:443',
+        latency_budget: float = 15.0,
+        ewma_alpha: float = 0.3,
+        max_consecutive_failures: int = 3,
+        probe_timeout: float = 10.0,
+    ):
+        self._proxies = {
+            url: ProxyState(url=url, settings=proxies_to_proxy_settings({'http': url}))
+            for url in dict.fromkeys(proxy_urls)
+        }
+        self._affinity_path = affinity_path
+        self._affinity: dict[str, str] = self._load_affinity()
+        self._probe_target = probe_target
+        self._latency_budget = latency_budget
+        self._ewma_alpha = ewma_alpha
+        self._max_consecutive_failures = max_consecutive_failures
+        self._probe_timeout = probe_timeout
+        self._probe_lock = asyncio.Lock()
+        self._probed = False
+
+    def __len__(self) -> int:
+        return len(self._proxies)
+
+    @property
+    def latency_budget(self) -> float:
+        return self._latency_budget
+
+    async def ensure_probed(self) -> None:
+        async with self._probe_lock:
+            if not self._probed:
+                await self.probe_all()
+                self._probed = True
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(proxy) for proxy in self._proxies.values()))
+        self.log_stats(_logger)
+
+    def is_alive(self, proxy: ProxyState) -> bool:
+        return proxy.consecutive_failures < self._max_consecutive_failures
+
+    def is_slow(self, proxy: ProxyState) -> bool:
+        return proxy.ewma_latency is not None and proxy.ewma_latency > self._latency_budget
+
+    def select(self, account: str, exclude: ProxyState = None) -> ProxyState:
+        sticky = self._proxies.get(self._affinity.get(account))
+
+        if sticky and sticky is not exclude and self.is_alive(sticky) and not self.is_slow(sticky):
+            return self._assign(account, sticky)
+
+        candidates = [proxy for proxy in self._proxies.values() if proxy is not exclude] or list(self._proxies.values())
+        best = min(candidates, key=self._score)
+
+        if sticky is not best:
+            _logger.info(f"[{account}] Using proxy {best.label}")
+
+        return self._assign(account, best)
+
+    def record_success(self, proxy: ProxyState, latency: float) -> None:
+        proxy.successes += 1
+        proxy.consecutive_failures = 0
+        self._update_latency(proxy, latency)
+
+    def record_failure(self, proxy: ProxyState) -> None:
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        # A failure counts as a full budget of latency so the proxy sinks in the ranking
+        self._update_latency(proxy, self._latency_budget * 2)
+
+    def log_stats(self, logger: Logger) -> None:
+        for proxy in sorted(self._proxies.values(), key=self._score):
+            latency = f'{proxy.ewma_latency:.2f}s' if proxy.ewma_latency is not None else 'n/a'
+            logger.info(
+                f"Proxy {proxy.label}: {'alive' if self.is_alive(proxy) else 'dead'}, ewma={latency}, "
+                f"ok={proxy.successes}, failed={proxy.failures}, accounts={len(proxy.accounts)}"
+            )
+
+    def _score(self, proxy: ProxyState) -> tuple:
+        latency = proxy.ewma_latency if proxy.ewma_latency is not None else self._latency_budget
+        # Dead proxies last, then by latency, then spread accounts evenly
+        return not self.is_alive(proxy), latency, len(proxy.accounts)
+
+    def _assign(self, account: str, proxy: ProxyState) -> ProxyState:
+        for other in self._proxies.values():
+            other.accounts.discard(account)
+
+        proxy.accounts.add(account)
+
+        if self._affinity.get(account) != proxy.url:
+            self._affinity[account] = proxy.url
+            self._save_affinity()
+
+        return proxy
+
+    def _update_latency(self, proxy: ProxyState, latency: float) -> None:
+        if proxy.ewma_latency is None:
+            proxy.ewma_latency = latency
+        else:
+            proxy.ewma_latency = self._ewma_alpha * latency + (1 - self._ewma_alpha) * proxy.ewma_latency
+
+    async def _probe(self, proxy: ProxyState) -> None:
+        started_at = time.monotonic()
+
+        try:
+            await asyncio.wait_for(self._connect_through(proxy), timeout=self._probe_timeout)
+        except (OSError, asyncio.TimeoutError, ConnectionError, ValueError) as e:
+            _logger.warning(f"Proxy {proxy.label} failed the health check: {e or type(e).__name__}")
+            self.record_failure(proxy)
+            return
+
+        self.record_success(proxy, time.monotonic() - started_at)
+
+    async def _connect_through(self, proxy: ProxyState) -> None:
+        parsed = urlparse(proxy.url)
+        reader, writer = await asyncio.open_connection(
+            parsed.hostname,
+            parsed.port or (443 if parsed.scheme == 'https' else 80),
+            ssl=parsed.scheme == 'https' or None,
+        )
+
+        try:
+            if not parsed.scheme.startswith('http'):
+                # SOCKS and friends: a TCP connect is the best cheap signal
+                return
+
+            headers = [f'CONNECT {self._probe_target} HTTP/1.1', f'Host: {self._probe_target}']
+
+            if parsed.username:
+                credentials = f'{unquote(parsed.username)}:{unquote(parsed.password or "")}'
+                headers.append(f'Proxy-Authorization: Basic {base64.b64encode(credentials.encode()).decode()}')
+
+            writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+            await writer.drain()
+            status_line = (await reader.readline()).decode(errors='replace').split()
+
+            if len(status_line) < 2 or status_line[1] != '200':
+                raise ConnectionError(f"CONNECT answered {' '.join(status_line[1:]) or 'nothing'}")
+        finally:
+            writer.close()
+
+    def _load_affinity(self) -> dict:
+        try:
+            with open(self._affinity_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_affinity(self) -> None:
+        tmp_path = f'{self._affinity_path}.tmp'
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._affinity_path)), exist_ok=True)
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._affinity, f, indent=2)
+
+            os.replace(tmp_path, self._affinity_path)
+        except OSError as e:
+            _logger.warning(f"Cannot save proxy affinity: {e}")
+
+
+def load_proxy_urls(proxy_list: list[str], proxy_file: Optional[str]) -> list[str]:
+    urls = [url.strip() for url in proxy_list if url.strip()]
+
+    if proxy_file:
+        with open(proxy_file, 'r', encoding='utf-8') as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+    return urls
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+    TypeVar,
+)
+
+from common.exceptions import (
+    AuthException,
+    CircuitOpenException,
+    PageLoadException,
+    PostNotConfirmedException,
+    RetryBudgetExceededException,
+    SelectorNotFoundException,
+    UploadBatchException,
+)
+from common.logging_setup import get_named_logger
+from config import mainconfig
+
+_logger = get_named_logger('retry_policy')
+
+T = TypeVar('T')
+
+# Errors that another attempt cannot fix; CancelledError and KeyboardInterrupt are BaseException and never retried
+FATAL_EXCEPTIONS = (
+    AuthException,
+    SelectorNotFoundException,
+    CircuitOpenException,
+    RetryBudgetExceededException,
+    # The post may have gone through; retrying could publish it twice
+    PostNotConfirmedException,
+    FileNotFoundError,
+    PermissionError,
+    ValueError,
+)
+RETRYABLE_STATUSES = (408, 425, 429)
+
+# Monotonic deadline of the current file's retry budget, set by retry_budget()
+_deadline: ContextVar[Optional[float]] = ContextVar('retry_deadline', default=None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    if not isinstance(error, Exception) or isinstance(error, FATAL_EXCEPTIONS):
+        return False
+
+    # PageLoadException, or an HTTP client error carrying its response
+    status = error.status if isinstance(error, PageLoadException) else getattr(
+        getattr(error, 'response', None), 'status_code', None,
+    )
+
+    if isinstance(status, int):
+        return status >= 500 or status in RETRYABLE_STATUSES
+
+    return True
+
+
+def is_post_unconfirmed(error: BaseException) -> bool:
+    # The post click happened for this error (or for one of a batch's files): queueing it again could publish twice
+    if isinstance(error, UploadBatchException):
+        return any(is_post_unconfirmed(failure) for failure in error.failures.values())
+
+    return isinstance(error, PostNotConfirmedException)
+
+
+@contextmanager
+def retry_budget(seconds: float):
+    # Nested budgets never extend an outer one
+    deadline = time.monotonic() + seconds if seconds else None
+    outer_deadline = _deadline.get()
+
+    if outer_deadline is not None and (deadline is None or outer_deadline < deadline):
+        deadline = outer_deadline
+
+    token = _deadline.set(deadline)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def step_timeout(timeout_ms: float) -> float:
+    # Caps a Playwright timeout by what is left of the budget (Playwright treats 0 as "no timeout", so never return it)
+    remaining = remaining_budget()
+
+    if remaining is None:
+        return timeout_ms
+
+    if remaining <= 0:
+        raise RetryBudgetExceededException("The time budget for this file is exhausted")
+
+    return max(1, min(timeout_ms, remaining * 1000))
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive retryable failures and lets a single trial call through
+    # once `reset_timeout` seconds have passed
+
+    def __init__(self, key: str, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.key = key
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def check(self) -> None:
+        if self._opened_at is None:
+            return
+
+        retry_in = self._opened_at + self._reset_timeout - time.monotonic()
+
+        if retry_in > 0 or self._trial_in_flight:
+            raise CircuitOpenException(f"Circuit for {self.key} is open, failing fast (retry in {max(0, retry_in):.0f}s)")
+
+        self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            _logger.info(f"Circuit for {self.key} closed")
+
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        # The call ended with an error that says nothing about the endpoint's health
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self._trial_in_flight = False
+
+        if self._opened_at is not None or self._consecutive_failures >= self._failure_threshold:
+            if self._opened_at is None:
+                _logger.warning(
+                    f"Circuit for {self.key} opened after {self._consecutive_failures} consecutive failure(s)"
+                )
+
+            self._opened_at = time.monotonic()
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(key: str) -> CircuitBreaker:
+    if key not in _circuit_breakers:
+        _circuit_breakers[key] = CircuitBreaker(
+            key,
+            failure_threshold=mainconfig.CIRCUIT_BREAKER_THRESHOLD,
+            reset_timeout=mainconfig.CIRCUIT_BREAKER_RESET_SECONDS,
+        )
+
+    return _circuit_breakers[key]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 15.0
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: anywhere between 0 and the exponential cap, so parallel tabs and accounts do not retry in step
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def run(self, operation: Callable[[], Awaitable[T]], description: str,
+                  get_breaker: Callable[[], Optional[CircuitBreaker]] = None) -> T:
+        for attempt in range(1, max(1, self.attempts) + 1):
+            remaining = remaining_budget()
+
+            if remaining is not None and remaining <= 0:
+                raise RetryBudgetExceededException(f"No time budget left to {description}")
+
+            # Resolved per attempt: a proxy failover changes which breaker applies
+            breaker = get_breaker() if get_breaker else None
+
+            if breaker:
+                breaker.check()
+
+            try:
+                result = await operation()
+            except Exception as e:
+                retryable = is_retryable(e)
+
+                if breaker and retryable:
+                    breaker.record_failure()
+                elif breaker:
+                    breaker.release()
+
+                if not retryable or attempt >= self.attempts:
+                    raise
+
+                delay = self.backoff(attempt)
+                remaining = remaining_budget()
+
+                if remaining is not None and delay >= remaining:
+                    raise RetryBudgetExceededException(
+                        f"No time budget left to retry {description} after: {e}"
+                    ) from e
+
+                _logger.warning(
+                    f"Failed to {description} (attempt {attempt}/{self.attempts}): {e}; retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled mid-call: a half-open breaker must not keep its trial slot forever
+                if breaker:
+                    breaker.release()
+                raise
+            else:
+                if breaker:
+                    breaker.record_success()
+
+                return result
@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import Optional
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL,
+    files TEXT NOT NULL,
+    method TEXT NOT NULL,
+    uploader TEXT NOT NULL,
+    account TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (job_key, method, uploader)
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (uploader, method, account, status, priority DESC, not_before, id);
+CREATE TABLE IF NOT EXISTS buckets (
+    uploader TEXT NOT NULL,
+    account TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (uploader, account)
+);
+"""
+
+
+@dataclass
+class ScheduledJob:
+    id: int
+    files: list[str]
+    method: str
+    account: str
+    attempts: int
+
+
+class TokenBucket:
+    # Posts per hour with a burst allowance; the level is persisted so restarts do not refill it
+    def __init__(self, posts_per_hour: float, burst: int, tokens: float = None, updated_at: float = None):
+        self.capacity = max(1, burst)
+        self.refill_per_second = posts_per_hour / 3600
+        self.tokens = self.capacity if tokens is None else min(tokens, self.capacity)
+        self.updated_at = updated_at or time.time()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.refill_per_second <= 0
+
+    def seconds_until_token(self, now: float) -> float:
+        if self.unlimited:
+            return 0
+
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.refill_per_second
+
+    def take(self, now: float) -> None:
+        if self.unlimited:
+            return
+
+        self._refill(now)
+        self.tokens -= 1
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+
+class QuietHours:
+    # Local-time windows such as '23:00-07:00' in which nothing is posted
+    def __init__(self, ranges: list[str]):
+        self._windows = [self._parse(value) for value in ranges if value.strip()]
+
+    def __bool__(self) -> bool:
+        return bool(self._windows)
+
+    def seconds_until_open(self, now: float) -> float:
+        moment = datetime.fromtimestamp(now)
+
+        # Adjacent windows are crossed one after another
+        for _ in range(len(self._windows) + 1):
+            window_end = self._window_end(moment)
+
+            if not window_end:
+                break
+
+            moment = window_end
+
+        return max(0.0, moment.timestamp() - now)
+
+    def _window_end(self, moment: datetime) -> Optional[datetime]:
+        minute = moment.hour * 60 + moment.minute + moment.second / 60
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        for start, end in self._windows:
+            if start <= end and start <= minute < end:
+                return midnight + timedelta(minutes=end)
+            if start > end and minute >= start:
+                return midnight + timedelta(days=1, minutes=end)
+            if start > end and minute < end:
+                return midnight + timedelta(minutes=end)
+
+        return None
+
+    @staticmethod
+    def _parse(value: str) -> tuple[int, int]:
+        try:
+            start, end = (part.strip() for part in value.split('-'))
+            return tuple(int(hours) * 60 + int(minutes) for hours, minutes in (start.split(':'), end.split(':')))
+        except ValueError:
+            raise ValueError(f"Invalid quiet hours '{value}', expected 'HH:MM-HH:MM'")
+
+
+class UploadQueue:
+    # Persistent priority queue of (files, account, not-before time) jobs plus the accounts' token buckets
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Not thread-safe by itself: the scheduler serialises every call on its single queue thread
+        self._connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def enqueue(self, files: list[str], method: str, uploader: str, account: str, not_before: float = None,
+                priority: int = 0) -> bool:
+        # Returns False when the same files are already scheduled or done; failed jobs get a fresh set of attempts
+        cursor = self._connection.execute(
+            """
+            INSERT INTO jobs (job_key, files, method, uploader, account, priority, not_before, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (job_key, method, uploader) DO UPDATE SET
+                account = excluded.account,
+                priority = excluded.priority,
+                not_before = excluded.not_before,
+                status = excluded.status,
+                attempts = 0,
+                error = NULL,
+                updated_at = excluded.updated_at
+            WHERE jobs.status = ?
+            """,
+            (
+                '\n'.join(sorted(files)), json.dumps(files), method, uploader, account, priority,
+                not_before or time.time(), JOB_QUEUED, time.time(), JOB_FAILED,
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def recover_interrupted(self, uploader: str, method: str) -> int:
+        # Jobs left running by a crashed or killed service are due again
+        cursor = self._connection.execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE uploader = ? AND method = ? AND status = ?',
+            (JOB_QUEUED, time.time(), uploader, method, JOB_RUNNING),
+        )
+        return cursor.rowcount
+
+    def queued_counts(self, uploader: str, method: str) -> dict[str, int]:
+        rows = self._connection.execute(
+            'SELECT account, COUNT(*) FROM jobs WHERE uploader = ? AND method = ? AND status = ? GROUP BY account',
+            (uploader, method, JOB_QUEUED),
+        ).fetchall()
+        return dict(rows)
+
+    def next_due_at(self, uploader: str, method: str, account: str) -> Optional[float]:
+        row = self._connection.execute(
+            'SELECT MIN(not_before) FROM jobs WHERE uploader = ? AND method = ? AND account = ? AND status = ?',
+            (uploader, method, account, JOB_QUEUED),
+        ).fetchone()
+        return row[0]
+
+    def claim_due(self, uploader: str, method: str, account: str, now: float) -> Optional[ScheduledJob]:
+        row = self._connection.execute(
+            """
+            SELECT id, files, method, account, attempts FROM jobs
+            WHERE uploader = ? AND method = ? AND account = ? AND status = ? AND not_before <= ?
+            ORDER BY priority DESC, not_before, id
+            LIMIT 1
+            """,
+            (uploader, method, account, JOB_QUEUED, now),
+        ).fetchone()
+
+        if not row:
+            return None
+
+        self._connection.execute(
+            'UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+            (JOB_RUNNING, time.time(), row[0]),
+        )
+        return ScheduledJob(id=row[0], files=json.loads(row[1]), method=row[2], account=row[3], attempts=row[4] + 1)
+
+    def complete(self, job: ScheduledJob) -> None:
+        self._set_status(job, JOB_DONE)
+
+    def fail(self, job: ScheduledJob, error: str) -> None:
+        self._set_status(job, JOB_FAILED, error)
+
+    def retry_later(self, job: ScheduledJob, not_before: float, error: str) -> None:
+        self._connection.execute(
+            'UPDATE jobs SET status = ?, not_before = ?, error = ?, updated_at = ? WHERE id = ?',
+            (JOB_QUEUED, not_before, error, time.time(), job.id),
+        )
+
+    def load_bucket(self, uploader: str, account: str, posts_per_hour: float, burst: int) -> TokenBucket:
+        row = self._connection.execute(
+            'SELECT tokens, updated_at FROM buckets WHERE uploader = ? AND account = ?',
+            (uploader, account),
+        ).fetchone()
+        return TokenBucket(posts_per_hour, burst, *(row or ()))
+
+    def save_bucket(self, uploader: str, account: str, bucket: TokenBucket) -> None:
+        self._connection.execute(
+            'INSERT OR REPLACE INTO buckets (uploader, account, tokens, updated_at) VALUES (?, ?, ?, ?)',
+            (uploader, account, bucket.tokens, bucket.updated_at),
+        )
+
+    def _set_status(self, job: ScheduledJob, status: str, error: str = None) -> None:
+        self._connection.execute(
+            'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+            (status, error, time.time(), job.id),
+        )
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from typing import Optional
+
+from common.logging_setup import get_named_logger
+from common.session_store import get_session_store
+
+_logger = get_named_logger('session_cache')
+
+# Session cookies expiring sooner than this are treated as already expired
+_EXPIRY_MARGIN_SECONDS = 300
+
+
+class SessionCache:
+    def __init__(self, storage_state: Optional[str], session_cookie_names: tuple[str, ...], ttl: int):
+        self._storage_state = storage_state
+        self._session_cookie_names = session_cookie_names
+        self._ttl = ttl
+
+    @property
+    def _meta_path(self) -> str:
+        return f'{self._storage_state}.meta.json'
+
+    def is_fresh(self) -> bool:
+        if not self._storage_state or not self._session_cookie_names or self._ttl <= 0:
+            return False
+
+        if not os.path.exists(self._storage_state):
+            return False
+
+        verified_at = self._read_meta().get('verified_at')
+
+        if not verified_at or time.time() - verified_at > self._ttl:
+            return False
+
+        return self._has_valid_session_cookie()
+
+    def mark_verified(self) -> None:
+        if not self._storage_state:
+            return
+
+        self._write_meta({'verified_at': time.time()})
+
+    def invalidate(self) -> None:
+        try:
+            os.remove(self._meta_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            _logger.warning(f"Cannot invalidate session cache '{self._meta_path}': {e}")
+
+    def _has_valid_session_cookie(self) -> bool:
+        storage_state = get_session_store().load(self._storage_state)
+
+        if not storage_state:
+            return False
+
+        cookies = storage_state['cookies']
+        expires_after = time.time() + _EXPIRY_MARGIN_SECONDS
+
+        for cookie in cookies:
+            if cookie.get('name') not in self._session_cookie_names or not cookie.get('value'):
+                continue
+
+            expires = cookie.get('expires', -1)
+
+            if expires == -1 or expires > expires_after:
+                return True
+
+        return False
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = f'{self._meta_path}.tmp'
+
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self._meta_path)
+        except OSError as e:
+            _logger.warning(f"Cannot write session cache '{self._meta_path}': {e}")
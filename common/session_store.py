@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from common.file_lock import file_lock
+from common.logging_setup import get_named_logger
+
+_logger = get_named_logger('session_store')
+
+
+@dataclass
+class _CachedState:
+    state: dict
+    digest: str
+    mtime_ns: int
+    size: int
+
+
+def _normalize(state: dict) -> dict:
+    # Playwright does not guarantee the order of cookies and origins, so they are sorted before diffing
+    return {
+        'cookies': sorted(
+            state.get('cookies', []),
+            key=lambda cookie: (cookie.get('domain', ''), cookie.get('path', ''), cookie.get('name', '')),
+        ),
+        'origins': sorted(
+            (
+                {**origin, 'localStorage': sorted(origin.get('localStorage', []), key=lambda item: item['name'])}
+                for origin in state.get('origins', [])
+            ),
+            key=lambda origin: origin.get('origin', ''),
+        ),
+    }
+
+
+def _digest(state: dict) -> str:
+    return hashlib.sha256(json.dumps(state, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+class SessionStore:
+    # Cookies and localStorage per account, one JSON file each (the account's storage state path).
+    # States are cached in memory per process and only rewritten, atomically and under a lock, when they changed.
+
+    def __init__(self):
+        self._cache: dict[str, _CachedState] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> Optional[dict]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._cache.pop(path, None)
+            return None
+
+        with self._lock:
+            cached = self._cache.get(path)
+
+        # Another worker may have rewritten the file since it was cached
+        if cached and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+            return cached.state
+
+        cached = self._read(path)
+
+        with self._lock:
+            if cached:
+                self._cache[path] = cached
+            else:
+                self._cache.pop(path, None)
+
+        return cached.state if cached else None
+
+    def save(self, path: str, state: dict) -> bool:
+        # Returns whether the file was written
+        state = _normalize(state)
+        digest = _digest(state)
+
+        with self._lock:
+            cached = self._cache.get(path)
+
+        # Unchanged since it was loaded or saved: never overwrite a newer state written by another worker with it
+        if cached and cached.digest == digest:
+            return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Readers never need the lock thanks to the atomic rename
+        with file_lock(f'{path}.lock'):
+            current = self._read(path) if os.path.exists(path) else None
+
+            if current and current.digest == digest:
+                with self._lock:
+                    self._cache[path] = current
+                return False
+
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+
+        with self._lock:
+            self._cache[path] = _CachedState(state, digest, stat.st_mtime_ns, stat.st_size)
+
+        return True
+
+    @staticmethod
+    def _read(path: str) -> Optional[_CachedState]:
+        try:
+            stat = os.stat(path)
+
+            with open(path, 'r', encoding='utf-8') as f:
+                state = _normalize(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, AttributeError) as e:
+            _logger.warning(f"Ignoring unreadable storage state '{path}': {e}")
+            return None
+
+        return _CachedState(state, _digest(state), stat.st_mtime_ns, stat.st_size)
+
+
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    # One store per process, shared by every uploader, pool account and recreated context
+    global _session_store
+
+    if _session_store is None:
+        _session_store = SessionStore()
+
+    return _session_store
@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+from common.file_cache import FileCache
+from common.hashing import hash_files
+from common.logging_setup import get_named_logger
+from common.metrics import span
+from config import mainconfig
+
+_logger = get_named_logger('slideshow')
+_process_pool: Optional[ProcessPoolExecutor] = None
+_render_cache: Optional[FileCache] = None
+
+
+def get_ffmpeg_executable() -> Optional[str]:
+    executable = shutil.which('ffmpeg')
+
+    if executable:
+        return executable
+
+    try:
+        # Shipped with moviepy
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+async def communicate_or_kill(process: asyncio.subprocess.Process) -> tuple[bytes, bytes]:
+    # Cancelling communicate() alone leaves the child running (and writing its output file), so it is killed and
+    # reaped before the cancellation goes on
+    try:
+        return await process.communicate()
+    except BaseException:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+            await process.wait()
+
+        raise
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=mainconfig.SLIDESHOW_WORKERS or None)
+
+    return _process_pool
+
+
+def _get_render_cache() -> FileCache:
+    global _render_cache
+
+    if _render_cache is None:
+        _render_cache = FileCache(mainconfig.SLIDESHOW_CACHE_FOLDER, mainconfig.SLIDESHOW_CACHE_MAX_BYTES)
+
+    return _render_cache
+
+
+def batch_images(image_files: list, batch_size: int, order: str = 'name', group_by_date: bool = False) -> list[list]:
+    if not image_files:
+        return []
+
+    if batch_size <= 0 and not group_by_date:
+        return [list(image_files)]
+
+    mtimes = {path: os.stat(path).st_mtime for path in image_files}
+
+    if order == 'date':
+        ordered = sorted(image_files, key=lambda path: (mtimes[path], path))
+    else:
+        ordered = sorted(image_files, key=lambda path: (os.path.basename(path).lower(), path))
+
+    if group_by_date:
+        day_of = {path: datetime.fromtimestamp(mtimes[path]).date() for path in ordered}
+        # Stable sort keeps the chosen order inside each day
+        ordered.sort(key=day_of.get)
+        groups = [list(group) for _, group in itertools.groupby(ordered, key=day_of.get)]
+    else:
+        groups = [ordered]
+
+    batches = []
+
+    for group in groups:
+        size = batch_size if batch_size > 0 else len(group)
+        batches.extend(group[start:start + size] for start in range(0, len(group), size))
+
+    return batches
+
+
+async def render_slideshow_batches(
+    batches: list[list],
+    concurrency: int = 2,
+    **render_kwargs,
+) -> AsyncIterator[tuple[list, Optional[str], Optional[Exception]]]:
+    # Renders batches concurrently and yields (batch, slideshow, error) as each one finishes
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def render(batch: list) -> tuple[list, Optional[str], Optional[Exception]]:
+        async with semaphore:
+            try:
+                return batch, await render_cached_slideshow(batch, **render_kwargs), None
+            except Exception as e:
+                _logger.error(f"Failed to render a slideshow of {len(batch)} image(s) from '{batch[0]}': {e}")
+                return batch, None, e
+
+    tasks = [asyncio.create_task(render(batch)) for batch in batches]
+
+    try:
+        for next_render in asyncio.as_completed(tasks):
+            yield await next_render
+    finally:
+        # Closed early (cancelled consumer): stop the remaining renders and wait until their ffmpeg children are gone
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def render_cached_slideshow(
+    image_files: list,
+    duration_per_image: int = 5,
+    fps: int = 24,
+    codec: str = 'libx264',
+) -> str:
+    if not image_files:
+        raise ValueError("No images provided.")
+
+    render_params = {
+        'duration_per_image': duration_per_image,
+        'fps': fps,
+        'codec': codec,
+        'engine': mainconfig.SLIDESHOW_ENGINE,
+    }
+    cache = _get_render_cache()
+    cache_key = await asyncio.to_thread(hash_files, image_files, json.dumps(render_params, sort_keys=True))
+    cached_file = cache.get(cache_key, '.mp4')
+
+    if cached_file:
+        _logger.info(f"Reusing cached slideshow: {cached_file}")
+        return cached_file
+
+    tmp_file = cache.tmp_path(cache_key, '.mp4')
+
+    try:
+        async with span('slideshow_render', images=len(image_files)):
+            await render_slideshow(
+                image_files=image_files,
+                output_file=tmp_file,
+                duration_per_image=duration_per_image,
+                fps=fps,
+                codec=codec,
+            )
+    except BaseException:
+        cache.discard(tmp_file)
+        raise
+
+    return cache.commit(tmp_file, cache_key, '.mp4')
+
+
+async def render_slideshow(
+    image_files: list,
+    output_file: str,
+    duration_per_image: int = 5,
+    fps: int = 24,
+    codec: str = 'libx264',
+) -> str:
+    if not image_files:
+        raise ValueError("No images provided.")
+
+    ffmpeg_executable = get_ffmpeg_executable() if mainconfig.SLIDESHOW_ENGINE == 'ffmpeg' else None
+
+    if ffmpeg_executable:
+        try:
+            return await _render_with_ffmpeg(
+                ffmpeg_executable, image_files, output_file, duration_per_image, fps, codec,
+            )
+        except (OSError, RuntimeError) as e:
+            _logger.warning(f"ffmpeg slideshow render failed, falling back to moviepy: {e}")
+
+    from common.utils import create_slideshow
+
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_process_pool(),
+        partial(
+            create_slideshow,
+            image_files=image_files,
+            output_file=output_file,
+            duration_per_image=duration_per_image,
+            fps=fps,
+            codec=codec,
+        ),
+    )
+
+
+async def _render_with_ffmpeg(
+    ffmpeg_executable: str,
+    image_files: list,
+    output_file: str,
+    duration_per_image: int,
+    fps: int,
+    codec: str,
+) -> str:
+    width, height = await asyncio.to_thread(_canvas_size, image_files)
+    concat_file = await asyncio.to_thread(_write_concat_file, image_files, duration_per_image)
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            ffmpeg_executable,
+            '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', concat_file,
+            '-vf', (
+                f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
+                f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,'
+                f'fps={fps},format=yuv420p'
+            ),
+            '-c:v', codec,
+            *(['-preset', 'veryfast', '-tune', 'stillimage'] if codec == 'libx264' else []),
+            '-an',
+            output_file,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await communicate_or_kill(process)
+    finally:
+        os.remove(concat_file)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {stderr.decode(errors='replace').strip()}")
+
+    return output_file
+
+
+def _canvas_size(image_files: list) -> tuple[int, int]:
+    from PIL import Image
+
+    width = height = 0
+
+    for path in image_files:
+        # Only the header is read here, pixels are never decoded
+        with Image.open(path) as image:
+            width = max(width, image.width)
+            height = max(height, image.height)
+
+    # yuv420p needs even dimensions
+    return width + width % 2, height + height % 2
+
+
+def _write_concat_file(image_files: list, duration_per_image: int) -> str:
+    lines = []
+
+    for path in image_files:
+        lines.append(f"file '{_escape_concat_path(path)}'")
+        lines.append(f"duration {duration_per_image}")
+
+    # The concat demuxer drops the duration of the last entry unless the file is repeated
+    lines.append(f"file '{_escape_concat_path(image_files[-1])}'")
+
+    fd, concat_file = tempfile.mkstemp(prefix='slideshow_', suffix='.txt')
+
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+    return concat_file
+
+
+def _escape_concat_path(path: str) -> str:
+    return os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+ITEM_QUEUED = 'queued'
+ITEM_LEASED = 'leased'
+ITEM_DONE = 'done'
+ITEM_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    files TEXT NOT NULL,
+    method TEXT NOT NULL,
+    account TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker INTEGER,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (item_key, method)
+);
+CREATE INDEX IF NOT EXISTS items_lease ON items (method, account, status, id);
+CREATE TABLE IF NOT EXISTS workers (
+    worker INTEGER PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class WorkItem:
+    id: int
+    files: list[str]
+    method: str
+    account: str
+    attempts: int
+
+
+class WorkQueue:
+    # Crash-safe queue shared by the worker processes of a --workers run: items are leased, the lease is kept alive
+    # by the worker's heartbeat and an item whose lease ran out (dead or hung worker) is queued again
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Not thread-safe by itself: a worker serialises every call on one thread per connection
+        self._connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def adopt_unfinished(self, run_id: str, method: str, accounts: list[str]) -> int:
+        # Items a crashed previous run left queued or leased belong to this run
+        cursor = self._connection.execute(
+            f"""
+            UPDATE items SET run_id = ?, status = ?, worker = NULL, lease_expires = NULL, updated_at = ?
+            WHERE method = ? AND status IN (?, ?) AND account IN ({', '.join('?' * len(accounts))})
+            """,
+            (run_id, ITEM_QUEUED, time.time(), method, ITEM_QUEUED, ITEM_LEASED, *accounts),
+        )
+        return cursor.rowcount
+
+    def add(self, run_id: str, files: list[str], method: str, account: str) -> bool:
+        # The ledger filters posted files beforehand, so items finished by an earlier run are simply reused; items
+        # still queued or leased were adopted by this run already
+        cursor = self._connection.execute(
+            """
+            INSERT INTO items (run_id, item_key, files, method, account, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (item_key, method) DO UPDATE SET
+                run_id = excluded.run_id,
+                account = excluded.account,
+                status = excluded.status,
+                worker = NULL,
+                lease_expires = NULL,
+                attempts = 0,
+                error = NULL,
+                updated_at = excluded.updated_at
+            WHERE items.status IN (?, ?)
+            """,
+            (
+                run_id, '\n'.join(sorted(files)), json.dumps(files), method, account, ITEM_QUEUED, time.time(),
+                ITEM_DONE, ITEM_FAILED,
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def lease(self, worker: int, method: str, account: str, lease_seconds: float) -> Optional[WorkItem]:
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never lease the same item
+        self._connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            row = self._connection.execute(
+                """
+                SELECT id, files, method, account, attempts FROM items
+                WHERE method = ? AND account = ? AND status = ?
+                ORDER BY id
+                LIMIT 1
+                """,
+                (method, account, ITEM_QUEUED),
+            ).fetchone()
+
+            if row:
+                self._connection.execute(
+                    """
+                    UPDATE items SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (ITEM_LEASED, worker, now + lease_seconds, now, row[0]),
+                )
+
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+
+        if not row:
+            return None
+
+        return WorkItem(id=row[0], files=json.loads(row[1]), method=row[2], account=row[3], attempts=row[4] + 1)
+
+    def heartbeat(self, worker: int, lease_seconds: float) -> None:
+        now = time.time()
+        self._connection.execute(
+            'INSERT OR REPLACE INTO workers (worker, pid, heartbeat_at) VALUES (?, ?, ?)',
+            (worker, os.getpid(), now),
+        )
+        self._connection.execute(
+            'UPDATE items SET lease_expires = ? WHERE worker = ? AND status = ?',
+            (now + lease_seconds, worker, ITEM_LEASED),
+        )
+
+    def last_heartbeat(self, worker: int) -> Optional[float]:
+        row = self._connection.execute('SELECT heartbeat_at FROM workers WHERE worker = ?', (worker,)).fetchone()
+        return row[0] if row else None
+
+    def complete(self, item: WorkItem) -> None:
+        self._connection.execute(
+            'UPDATE items SET status = ?, lease_expires = NULL, error = NULL, updated_at = ? WHERE id = ?',
+            (ITEM_DONE, time.time(), item.id),
+        )
+
+    def fail(self, item: WorkItem, error: str, max_attempts: int) -> bool:
+        # Returns whether the item was queued for another attempt
+        retry = item.attempts < max_attempts
+        self._connection.execute(
+            'UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated_at = ? WHERE id = ?',
+            (ITEM_QUEUED if retry else ITEM_FAILED, error, time.time(), item.id),
+        )
+        return retry
+
+    def reclaim_expired(self, exclude_workers: list[int] = ()) -> int:
+        # Leases of the excluded (live) workers are left alone, so their items are never handed out twice
+        cursor = self._connection.execute(
+            f"""
+            UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, updated_at = ?
+            WHERE status = ? AND lease_expires < ? AND worker NOT IN ({', '.join('?' * len(exclude_workers))})
+            """,
+            (ITEM_QUEUED, time.time(), ITEM_LEASED, time.time(), *exclude_workers),
+        )
+        return cursor.rowcount
+
+    def release_worker(self, worker: int) -> int:
+        # A worker process exited: whatever it still held is queued again right away
+        cursor = self._connection.execute(
+            'UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, updated_at = ? WHERE worker = ? '
+            'AND status = ?',
+            (ITEM_QUEUED, time.time(), worker, ITEM_LEASED),
+        )
+        self._connection.execute('DELETE FROM workers WHERE worker = ?', (worker,))
+        return cursor.rowcount
+
+    def has_queued(self, run_id: str, accounts: list[str]) -> bool:
+        row = self._connection.execute(
+            f"""
+            SELECT 1 FROM items
+            WHERE run_id = ? AND status = ? AND account IN ({', '.join('?' * len(accounts))})
+            LIMIT 1
+            """,
+            (run_id, ITEM_QUEUED, *accounts),
+        ).fetchone()
+        return row is not None
+
+    def progress(self, run_id: str) -> dict[str, int]:
+        rows = self._connection.execute(
+            'SELECT status, COUNT(*) FROM items WHERE run_id = ? GROUP BY status',
+            (run_id,),
+        ).fetchall()
+        return dict(rows)
+
+    def done_per_worker(self, run_id: str) -> dict[int, int]:
+        rows = self._connection.execute(
+            'SELECT worker, COUNT(*) FROM items WHERE run_id = ? AND status = ? GROUP BY worker',
+            (run_id, ITEM_DONE),
+        ).fetchall()
+        return dict(rows)
+
+    def fail_pending(self, run_id: str, error: str) -> int:
+        cursor = self._connection.execute(
+            'UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated_at = ? '
+            'WHERE run_id = ? AND status IN (?, ?)',
+            (ITEM_FAILED, error, time.time(), run_id, ITEM_QUEUED, ITEM_LEASED),
+        )
+        return cursor.rowcount
+
+    def failures(self, run_id: str) -> dict[str, str]:
+        rows = self._connection.execute(
+            'SELECT files, error FROM items WHERE run_id = ? AND status = ?',
+            (run_id, ITEM_FAILED),
+        ).fetchall()
+        return {json.loads(files)[0]: error for files, error in rows}
@@ -1,11 +1,14 @@
+import functools
 import logging
 import os
 import sys
 from pathlib import Path
 
 from decouple import (
+    RepositoryEmpty,
     RepositoryEnv,
     Config,
+    Csv,
 )
 
 from common.proxy import (
@@ -15,7 +18,8 @@ from common.proxy import (
 from config.uploader_config import UploaderConfig
 
 env_file = os.environ.get('ENV_FILE', ".env")
-config = Config(RepositoryEnv(env_file))
+# Settings can come from the environment alone, so a missing .env is not an error
+config = Config(RepositoryEnv(env_file) if os.path.isfile(env_file) else RepositoryEmpty())
 
 PROJECT_ROOT_FOLDER = Path(__file__).resolve().parent.parent
 
@@ -24,6 +28,41 @@ def get_storage_path(uploader_name: str) -> str:
     return str(PROJECT_ROOT_FOLDER / 'storage_states' / f'{uploader_name}_browser_storage.json')
 
 
+def get_account_configs(uploader_name: str, base_config: UploaderConfig) -> list[UploaderConfig]:
+    prefix = f'{uploader_name.upper()}_UPLOADER'
+    accounts = config(f'{prefix}_ACCOUNTS', default='', cast=Csv())
+
+    if not accounts:
+        return [base_config]
+
+    account_configs = []
+
+    for account in accounts:
+        account_prefix = f'{prefix}_{account.upper()}'
+        account_configs.append(UploaderConfig(
+            storage_state=config(
+                f'{account_prefix}_STORAGE_PATH',
+                default=get_storage_path(f'{uploader_name}_{account}'),
+            ),
+            proxy_settings=proxies_to_proxy_settings(
+                get_proxies(config, f'{account_prefix}_HTTP_PROXY', f'{account_prefix}_HTTPS_PROXY')
+            ) or base_config.proxy_settings,
+            headless=base_config.headless,
+            auth_username=config(f'{account_prefix}_AUTH_USERNAME'),
+            auth_password=config(f'{account_prefix}_AUTH_PASSWORD'),
+            account_name=account,
+            upload_tabs=base_config.upload_tabs,
+            block_resources=base_config.block_resources,
+            upload_transport=base_config.upload_transport,
+            upload_endpoint=base_config.upload_endpoint,
+            launch_profile=base_config.launch_profile,
+            recycle_after_uploads=base_config.recycle_after_uploads,
+            memory_limit_mb=base_config.memory_limit_mb,
+        ))
+
+    return account_configs
+
+
 # Check Python version
 if sys.version_info < (3, 11):
     logging.getLogger("APP").warning(
@@ -61,14 +100,220 @@ if HTTPS_PROXY:
 
 DEFAULT_HTTPX_PROXY = {'http://': HTTP_PROXY} if HTTP_PROXY else {}
 
-UPLOADER_PARAMETERS = {
-    'tiktok': UploaderConfig(
+
+def _tiktok_uploader_config() -> UploaderConfig:
+    return UploaderConfig(
         storage_state=config('TIKTOK_UPLOADER_STORAGE_PATH', default=str(get_storage_path('tiktok'))),
         proxy_settings=proxies_to_proxy_settings(
             get_proxies(config, "TIKTOK_UPLOADER_HTTP_PROXY", "TIKTOK_UPLOADER_HTTPS_PROXY")
         ) or DEFAULT_PROXIES,
         headless=False,
         auth_username=config('TIKTOK_UPLOADER_AUTH_USERNAME'),
-        auth_password=config('TIKTOK_UPLOADER_AUTH_PASSWORD')
+        auth_password=config('TIKTOK_UPLOADER_AUTH_PASSWORD'),
+        upload_tabs=config('TIKTOK_UPLOADER_UPLOAD_TABS', default=1, cast=int),
+        block_resources=config('TIKTOK_UPLOADER_BLOCK_RESOURCES', default=True, cast=bool),
+        upload_transport=config('TIKTOK_UPLOADER_UPLOAD_TRANSPORT', default='browser'),
+        upload_endpoint=config('TIKTOK_UPLOADER_UPLOAD_ENDPOINT', default=None),
+        launch_profile=config('TIKTOK_UPLOADER_LAUNCH_PROFILE', default='default'),
+        recycle_after_uploads=config('TIKTOK_UPLOADER_RECYCLE_AFTER_UPLOADS', default=0, cast=int),
+        memory_limit_mb=config('TIKTOK_UPLOADER_MEMORY_LIMIT_MB', default=0, cast=int),
+    )
+
+
+# Uploader settings are read only for the uploader that is selected, so other uploaders' credentials are optional
+UPLOADER_CONFIG_FACTORIES = {
+    'tiktok': _tiktok_uploader_config,
+}
+
+
+@functools.cache
+def get_uploader_config(uploader_name: str) -> UploaderConfig:
+    return UPLOADER_CONFIG_FACTORIES[uploader_name]()
+
+
+@functools.cache
+def get_uploader_accounts(uploader_name: str) -> list[UploaderConfig]:
+    return get_account_configs(uploader_name, get_uploader_config(uploader_name))
+
+
+# Chromium provisioning: a manifest in CHROMIUM_FOLDER makes lookups O(1); when Chromium is missing it is downloaded
+# (resumable, HTTP(S) URL, file:// URL or local path of a mirror), verified against CHROMIUM_SHA256 and unpacked
+# in the background as soon as a run starts
+# platform -> (version, url, sha256 of the release asset). The builds are third-party: a checksum is only pinned here
+# once the asset has been verified, until then CHROMIUM_SHA256 must be set (or CHROMIUM_REQUIRE_SHA256 turned off).
+_DEFAULT_CHROMIUM_DOWNLOADS = {
+    'win32': (
+        '137.0.7151.104',
+        'https://github.com/Hibbiki/chromium-win64/releases/download/v137.0.7151.104-r1453031/chrome.sync.7z',
+        '',
     ),
+    'linux': (
+        '136.0.7103.97',
+        'https://github.com/macchrome/linchrome/releases/download/v136.7103.97-M136.0.7103.97-r1440670-portable-'
+        'ungoogled-Lin64/ungoogled-chromium_136.0.7103.97_1.vaapi_linux.tar.gz',
+        '',
+    ),
+}
+# No default build for other platforms (macOS): provisioning needs an explicit CHROMIUM_DOWNLOAD_URL there
+_default_chromium_version, _default_chromium_url, _default_chromium_sha256 = _DEFAULT_CHROMIUM_DOWNLOADS.get(
+    'win32' if sys.platform.startswith('win') else 'linux' if sys.platform.startswith('linux') else None,
+    (None, None, ''),
+)
+CHROMIUM_FOLDER = config('CHROMIUM_FOLDER', default=str(PROJECT_ROOT_FOLDER / 'chromium'))
+CHROMIUM_VERSION = config('CHROMIUM_VERSION', default=_default_chromium_version)
+CHROMIUM_DOWNLOAD_URL = config('CHROMIUM_DOWNLOAD_URL', default=_default_chromium_url)
+CHROMIUM_SHA256 = config('CHROMIUM_SHA256', default=_default_chromium_sha256)
+# Refuse to install an archive without a checksum to verify it against
+CHROMIUM_REQUIRE_SHA256 = config('CHROMIUM_REQUIRE_SHA256', default=True, cast=bool)
+CHROMIUM_PROVISION_ON_START = config('CHROMIUM_PROVISION_ON_START', default=True, cast=bool)
+
+# How many browser contexts (accounts) may upload at the same time in pool mode
+MAX_CONCURRENT_CONTEXTS = config('MAX_CONCURRENT_CONTEXTS', default=4, cast=int)
+
+# Warm-browser daemon (see browser_daemon.py); uploaders attach to it over CDP when it is running
+BROWSER_DAEMON_ENABLED = config('BROWSER_DAEMON_ENABLED', default=True, cast=bool)
+BROWSER_DAEMON_PORT = config('BROWSER_DAEMON_PORT', default=9222, cast=int)
+BROWSER_DAEMON_STATE_FILE = config(
+    'BROWSER_DAEMON_STATE_FILE',
+    default=str(PROJECT_ROOT_FOLDER / 'temp' / 'browser_daemon.json'),
+)
+BROWSER_DAEMON_REUSE_CONTEXT = config('BROWSER_DAEMON_REUSE_CONTEXT', default=False, cast=bool)
+# 'default' or 'lean' (see LAUNCH_PROFILES in base_uploader.py)
+BROWSER_DAEMON_LAUNCH_PROFILE = config('BROWSER_DAEMON_LAUNCH_PROFILE', default='default')
+
+# How long (seconds) a verified login is trusted before warm-up and the profile check run again; 0 disables
+SESSION_FRESHNESS_TTL = config('SESSION_FRESHNESS_TTL', default=3600, cast=int)
+
+# Opt-in randomized pauses between browser actions; all flows wait on page events by default
+HUMANIZE_DELAYS = config('HUMANIZE_DELAYS', default=False, cast=bool)
+# Pause before the CLI exits, e.g. to keep a double-clicked console window readable
+EXIT_DELAY_SECONDS = config('EXIT_DELAY_SECONDS', default=0, cast=float)
+
+# 'ffmpeg' streams still images straight into ffmpeg; 'moviepy' composes frames in Python (also the fallback)
+SLIDESHOW_ENGINE = config('SLIDESHOW_ENGINE', default='ffmpeg')
+# Process pool size for the moviepy renderer; 0 means one worker per CPU
+SLIDESHOW_WORKERS = config('SLIDESHOW_WORKERS', default=0, cast=int)
+
+# Rendered slideshows are reused by content hash; least recently used entries are evicted above the size limit
+SLIDESHOW_CACHE_FOLDER = config('SLIDESHOW_CACHE_FOLDER', default=str(PROJECT_ROOT_FOLDER / 'temp' / 'slideshows'))
+SLIDESHOW_CACHE_MAX_BYTES = config('SLIDESHOW_CACHE_MAX_BYTES', default=2 * 1024 ** 3, cast=int)
+
+# upload_photo: photos per slideshow (0 = one slideshow of all photos), their order ('name' or 'date'),
+# whether photos taken on different days are kept apart, and how many slideshows render at the same time
+PHOTO_BATCH_SIZE = config('PHOTO_BATCH_SIZE', default=0, cast=int)
+PHOTO_BATCH_ORDER = config('PHOTO_BATCH_ORDER', default='name')
+PHOTO_BATCH_GROUP_BY_DATE = config('PHOTO_BATCH_GROUP_BY_DATE', default=False, cast=bool)
+PHOTO_BATCH_RENDER_CONCURRENCY = config('PHOTO_BATCH_RENDER_CONCURRENCY', default=2, cast=int)
+
+# Video preflight: probe every file and remux/transcode only the ones the platform would reject
+PREFLIGHT_ENABLED = config('PREFLIGHT_ENABLED', default=True, cast=bool)
+PREFLIGHT_WORKERS = config('PREFLIGHT_WORKERS', default=0, cast=int)
+PREFLIGHT_MAX_RESOLUTION = config('PREFLIGHT_MAX_RESOLUTION', default=4096, cast=int)
+PREFLIGHT_MAX_BYTES = config('PREFLIGHT_MAX_BYTES', default=4 * 1024 ** 3, cast=int)
+PREFLIGHT_MAX_DURATION = config('PREFLIGHT_MAX_DURATION', default=60 * 60, cast=int)
+PREFLIGHT_CACHE_FOLDER = config('PREFLIGHT_CACHE_FOLDER', default=str(PROJECT_ROOT_FOLDER / 'temp' / 'preflight'))
+PREFLIGHT_CACHE_MAX_BYTES = config('PREFLIGHT_CACHE_MAX_BYTES', default=10 * 1024 ** 3, cast=int)
+
+# Upload ledger: remembers what was posted per account so reruns skip done files and resume interrupted batches
+LEDGER_ENABLED = config('LEDGER_ENABLED', default=True, cast=bool)
+LEDGER_PATH = config('LEDGER_PATH', default=str(PROJECT_ROOT_FOLDER / 'storage_states' / 'upload_ledger.sqlite3'))
+
+# Scheduler service (--schedule): persistent queue, per-account token bucket (posts per hour, burst) and local-time
+# quiet hours like '23:00-07:00'; failed posts are retried with exponential backoff starting at SCHEDULER_RETRY_DELAY
+SCHEDULER_QUEUE_PATH = config(
+    'SCHEDULER_QUEUE_PATH',
+    default=str(PROJECT_ROOT_FOLDER / 'storage_states' / 'upload_queue.sqlite3'),
+)
+SCHEDULER_POSTS_PER_HOUR = config('SCHEDULER_POSTS_PER_HOUR', default=6, cast=float)
+SCHEDULER_BURST = config('SCHEDULER_BURST', default=1, cast=int)
+SCHEDULER_QUIET_HOURS = config('SCHEDULER_QUIET_HOURS', default='', cast=Csv())
+SCHEDULER_MAX_ATTEMPTS = config('SCHEDULER_MAX_ATTEMPTS', default=3, cast=int)
+SCHEDULER_RETRY_DELAY = config('SCHEDULER_RETRY_DELAY', default=600, cast=float)
+# An account's browser context is closed when its next post is further away than this
+SCHEDULER_IDLE_DETACH_SECONDS = config('SCHEDULER_IDLE_DETACH_SECONDS', default=120, cast=float)
+
+# Multi-process mode (--workers N): worker processes lease items from a shared on-disk queue and renew the leases with
+# heartbeats; items of a dead or hung worker are queued again and the worker restarted up to WORKER_MAX_RESTARTS times
+WORKER_QUEUE_PATH = config('WORKER_QUEUE_PATH', default=str(PROJECT_ROOT_FOLDER / 'temp' / 'work_queue.sqlite3'))
+WORKER_LEASE_SECONDS = config('WORKER_LEASE_SECONDS', default=120, cast=float)
+WORKER_HEARTBEAT_SECONDS = config('WORKER_HEARTBEAT_SECONDS', default=10, cast=float)
+WORKER_MAX_RESTARTS = config('WORKER_MAX_RESTARTS', default=2, cast=int)
+WORKER_MAX_ATTEMPTS = config('WORKER_MAX_ATTEMPTS', default=2, cast=int)
+WORKER_PROGRESS_INTERVAL = config('WORKER_PROGRESS_INTERVAL', default=10, cast=float)
+
+# File discovery: ordering ('mtime' or 'name'), recursion and "fully written" checks (quiet period / marker file)
+DISCOVERY_RECURSIVE = config('DISCOVERY_RECURSIVE', default=False, cast=bool)
+DISCOVERY_ORDER = config('DISCOVERY_ORDER', default='mtime')
+DISCOVERY_STABLE_SECONDS = config('DISCOVERY_STABLE_SECONDS', default=0, cast=float)
+DISCOVERY_MARKER_SUFFIX = config('DISCOVERY_MARKER_SUFFIX', default=None)
+# Poll interval for --watch when inotify is not available
+WATCH_POLL_INTERVAL = config('WATCH_POLL_INTERVAL', default=2.0, cast=float)
+
+# Opt-in on-disk cache for static assets (JS/CSS/fonts) shared by every browser context and run
+ASSET_CACHE_ENABLED = config('ASSET_CACHE_ENABLED', default=False, cast=bool)
+ASSET_CACHE_FOLDER = config('ASSET_CACHE_FOLDER', default=str(PROJECT_ROOT_FOLDER / 'temp' / 'asset_cache'))
+ASSET_CACHE_MAX_BYTES = config('ASSET_CACHE_MAX_BYTES', default=512 * 1024 ** 2, cast=int)
+ASSET_CACHE_RESOURCE_TYPES = tuple(config('ASSET_CACHE_RESOURCE_TYPES', default='script,stylesheet,font', cast=Csv()))
+
+# Proxy pool: health-checked proxies with EWMA latency scoring, sticky per-account affinity and failover
+PROXY_POOL = config('PROXY_POOL', default='', cast=Csv())
+PROXY_POOL_FILE = config('PROXY_POOL_FILE', default=None)
+PROXY_POOL_PROBE_TARGET = config('PROXY_POOL_PROBE_TARGET', default='www.tiktok.com:443')
+PROXY_POOL_LATENCY_BUDGET = config('PROXY_POOL_LATENCY_BUDGET', default=15.0, cast=float)
+PROXY_POOL_MAX_FAILURES = config('PROXY_POOL_MAX_FAILURES', default=3, cast=int)
+PROXY_AFFINITY_PATH = config(
+    'PROXY_AFFINITY_PATH',
+    default=str(PROJECT_ROOT_FOLDER / 'storage_states' / 'proxy_affinity.json'),
+)
+
+# Per-stage timing spans, exported as JSON lines and a Prometheus textfile plus an end-of-run summary
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_JSONL_PATH = config('METRICS_JSONL_PATH', default=str(PROJECT_ROOT_FOLDER / 'temp' / 'metrics.jsonl'))
+METRICS_PROMETHEUS_PATH = config(
+    'METRICS_PROMETHEUS_PATH',
+    default=str(PROJECT_ROOT_FOLDER / 'temp' / 'uploader_metrics.prom'),
+)
+
+# Retries of uploader steps: attempts for page loads and whole file uploads, jittered exponential backoff bounds
+# (seconds) and the total time one file may take including retries (0 = unlimited)
+RETRY_PAGE_ATTEMPTS = config('RETRY_PAGE_ATTEMPTS', default=3, cast=int)
+RETRY_UPLOAD_ATTEMPTS = config('RETRY_UPLOAD_ATTEMPTS', default=2, cast=int)
+RETRY_BASE_DELAY = config('RETRY_BASE_DELAY', default=1.0, cast=float)
+RETRY_MAX_DELAY = config('RETRY_MAX_DELAY', default=15.0, cast=float)
+RETRY_FILE_BUDGET = config('RETRY_FILE_BUDGET', default=300, cast=float)
+# Consecutive failures after which a domain/proxy pair fails fast, and seconds until one trial request is let through
+CIRCUIT_BREAKER_THRESHOLD = config('CIRCUIT_BREAKER_THRESHOLD', default=5, cast=int)
+CIRCUIT_BREAKER_RESET_SECONDS = config('CIRCUIT_BREAKER_RESET_SECONDS', default=60, cast=float)
+
+# Direct HTTP upload transport ('http' upload_transport): chunk size, chunks in flight and resumable state
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+CHUNKED_UPLOAD_PARALLEL = config('CHUNKED_UPLOAD_PARALLEL', default=4, cast=int)
+CHUNKED_UPLOAD_RETRIES = config('CHUNKED_UPLOAD_RETRIES', default=3, cast=int)
+CHUNKED_UPLOAD_STATE_FOLDER = config(
+    'CHUNKED_UPLOAD_STATE_FOLDER',
+    default=str(PROJECT_ROOT_FOLDER / 'temp' / 'chunked_uploads'),
+)
+
+# Logging: queue mode moves console/file I/O to a background thread; LOG_FILE rotates by size or by LOG_ROTATE_WHEN
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FILE = config('LOG_FILE', default='') or None
+LOG_QUEUE = config('LOG_QUEUE', default=True, cast=bool)
+LOG_JSON = config('LOG_JSON', default=False, cast=bool)
+LOG_MAX_BYTES = config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+LOG_BACKUP_COUNT = config('LOG_BACKUP_COUNT', default=5, cast=int)
+LOG_ROTATE_WHEN = config('LOG_ROTATE_WHEN', default='') or None
+# DEBUG records per second allowed from one call site (0 = unlimited) and the share of DEBUG records kept
+LOG_DEBUG_RATE = config('LOG_DEBUG_RATE', default=0, cast=float)
+LOG_DEBUG_SAMPLE = config('LOG_DEBUG_SAMPLE', default=1.0, cast=float)
+
+LOGGING_SETTINGS = {
+    'level': LOG_LEVEL,
+    'log_file': LOG_FILE,
+    'use_queue': LOG_QUEUE,
+    'json_format': LOG_JSON,
+    'max_bytes': LOG_MAX_BYTES,
+    'backup_count': LOG_BACKUP_COUNT,
+    'rotate_when': LOG_ROTATE_WHEN,
+    'debug_rate': LOG_DEBUG_RATE,
+    'debug_sample': LOG_DEBUG_SAMPLE,
 }
@@ -8,6 +8,14 @@ class UploaderConfig:
     headless: bool
     auth_username: str
     auth_password: str
+    account_name: str = 'default'
+    upload_tabs: int = 1
+    block_resources: bool = True
+    upload_transport: str = 'browser'
+    upload_endpoint: str = None
+    launch_profile: str = 'default'
+    recycle_after_uploads: int = 0
+    memory_limit_mb: int = 0
 
     def as_dict(self):
         return vars(self)
@@ -1,16 +1,5 @@
 import argparse
-import asyncio
 
-from common.module_loader import load_uploader_module
-from common.utils import (
-    collect_files,
-    sleep_on_error,
-    sleep_on_success,
-)
-from common.logging_setup import (
-    setup_logging,
-    get_named_logger,
-)
 from config import mainconfig
 
 
@@ -31,73 +20,53 @@ def parse_args() -> argparse.Namespace:
         choices=method_choices,
         help=f"What to upload: accepts [{', '.join(method_choices)}]"
     )
-    return parser.parse_args()
-
-
-async def main() -> None:
-    args = parse_args()
-    setup_logging()
-    logger = get_named_logger('main')
-
-    try:
-        uploader_class, uploader_name = load_uploader_module(args.uploader)
-    except ModuleNotFoundError:
-        logger.error(f"Uploader '{args.uploader}' not found.")
-        await sleep_on_error()
-        return
-
-    uploader = uploader_class()
-    logger.info(f"Uploader initialized: {uploader_name}")
-
-    upload_settings = mainconfig.METHOD_TO_UPLOAD_SETTINGS_BIND.get(args.method)
-
-    if not upload_settings:
-        logger.error(f"No upload settings found for method '{args.method}'.")
-        await sleep_on_error()
-        return
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        help="Spread files across all configured accounts using one shared browser"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep the browser open and upload files as they arrive in the folder"
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="Run as a service: queue new files per account and post them within the rate limits and quiet hours"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Spread files and accounts over N worker processes, each with its own browser"
+    )
+    args = parser.parse_args()
 
-    files_folder = upload_settings.get("folder")
-    extensions = upload_settings.get("supported_extensions")
+    if args.watch and args.pool:
+        parser.error("--watch cannot be combined with --pool")
 
-    if not files_folder:
-        logger.error(f"No folder is bind for method {args.method}.")
-        await sleep_on_error()
-        return
+    if args.schedule and (args.watch or args.pool):
+        parser.error("--schedule already watches the folder and uses every account")
 
-    files = collect_files(files_folder, extensions)
+    if args.workers < 0:
+        parser.error("--workers must be a positive number")
 
-    if not files:
-        logger.error(f"No files found for {args.method}.")
-        await sleep_on_error()
-        return
+    if args.workers and (args.watch or args.schedule):
+        parser.error("--workers uploads the collected files once and cannot be combined with --watch or --schedule")
 
-    method = getattr(uploader, args.method, None)
+    return args
 
-    if not callable(method):
-        logger.error(f"Method '{args.method}' is not implemented in {uploader_name} uploader.")
-        await sleep_on_error()
-        return
 
-    try:
-        logger.info(f"Starting upload of {len(files)} file(s)...")
+def main() -> None:
+    args = parse_args()
 
-        async with uploader:
-            try:
-                if asyncio.iscoroutinefunction(method):
-                    await method(files)
-                else:
-                    method(files)
-            except BaseException as e:
-                logger.exception(f"Error during upload: {e}")
-                await sleep_on_error()
-                return
+    # Imported after parsing so --help and argument errors return without loading asyncio or the uploader stack
+    from uploader_runner import run
 
-        logger.info(f"Successfully uploaded {len(files)} file(s)!")
-        await sleep_on_success()
-    except Exception as e:
-        logger.exception(f"Unexpected error: {e}")
-        await sleep_on_error()
+    run(args)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import unittest
+
+from common.exceptions import PostNotConfirmedException
+from common.scheduler import (
+    JOB_FAILED,
+    UploadQueue,
+)
+from uploaders.base.upload_scheduler import UploadScheduler
+
+
+class _FakeUploader:
+    _uploader_name = 'test'
+
+    def __init__(self, error: Exception = None):
+        self.account_name = 'default'
+        self.metric_labels = {'uploader': self._uploader_name, 'account': self.account_name}
+        self._error = error
+
+    def set_ledger(self, ledger) -> None:
+        pass
+
+    def mark_pending(self, files: list) -> None:
+        pass
+
+    async def upload_video(self, files: list) -> None:
+        if self._error:
+            raise self._error
+
+
+async def _prepare(method: str, files: list, ledger) -> list:
+    return files
+
+
+class UploadSchedulerRunJobTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self._queue = UploadQueue(os.path.join(self._folder.name, 'queue.sqlite3'))
+        self._file = os.path.join(self._folder.name, 'video.mp4')
+        open(self._file, 'wb').close()
+
+    def tearDown(self):
+        self._queue.close()
+        self._folder.cleanup()
+
+    async def _run_claimed_job(self, uploader: _FakeUploader) -> str:
+        scheduler = UploadScheduler([uploader], self._queue, max_attempts=3)
+
+        try:
+            self._queue.enqueue([self._file], 'upload_video', 'test', 'default')
+            job = self._queue.claim_due('test', 'upload_video', 'default', time.time())
+            await scheduler._run_job(uploader, job, _prepare)
+        finally:
+            scheduler._queue_executor.shutdown(wait=True)
+
+        return self._queue._connection.execute('SELECT status FROM jobs WHERE id = ?', (job.id,)).fetchone()[0]
+
+    async def test_unconfirmed_post_is_failed_not_requeued(self):
+        status = await self._run_claimed_job(_FakeUploader(PostNotConfirmedException('no confirmation')))
+        self.assertEqual(status, JOB_FAILED)
+
+    async def test_retryable_error_is_requeued(self):
+        status = await self._run_claimed_job(_FakeUploader(RuntimeError('page crashed')))
+        self.assertNotEqual(status, JOB_FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
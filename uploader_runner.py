@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+from typing import Optional
+
+from decouple import UndefinedValueError
+
+from common.browser_daemon import read_daemon_endpoint
+from common.chromium_provisioner import (
+    resolve_chromium,
+    start_chromium_provisioning,
+)
+from common.exceptions import UploadBatchException
+from common.ledger import UploadLedger
+from common.metrics import get_metrics
+from common.module_loader import load_uploader_module
+from common.utils import (
+    collect_files,
+    create_folder_watcher,
+    sleep_on_error,
+    sleep_on_success,
+)
+from common.logging_setup import (
+    setup_logging,
+    get_named_logger,
+)
+from config import mainconfig
+
+
+async def prepare_files(method: str, files: list, ledger: Optional[UploadLedger]) -> list:
+    if method != mainconfig.VIDEO_UPLOAD_METHOD:
+        return files
+
+    from common.preflight import preflight_videos
+
+    prepared_files = await preflight_videos(files)
+
+    if ledger:
+        for prepared_file, original_file in zip(prepared_files, files):
+            ledger.add_alias(prepared_file, original_file)
+
+    return prepared_files
+
+
+async def run_pool(uploader_class, uploader_name: str, method: str, files_task: asyncio.Task,
+                   ledger: Optional[UploadLedger]) -> None:
+    # Imported here so argument errors and --help never load Playwright
+    from uploaders.base.uploader_pool import UploaderPool
+
+    logger = get_named_logger('main')
+    account_configs = mainconfig.get_uploader_accounts(uploader_name)
+    uploaders = [uploader_class(uploader_config=account_config) for account_config in account_configs]
+    logger.info(
+        f"Pool mode: {len(uploaders)} account(s), "
+        f"up to {mainconfig.MAX_CONCURRENT_CONTEXTS} concurrent context(s)"
+    )
+
+    async with UploaderPool(uploaders, mainconfig.MAX_CONCURRENT_CONTEXTS, ledger=ledger) as pool:
+        await pool.run(method, await files_task)
+
+
+async def run_schedule(uploader_class, uploader_name: str, method: str, files_folder: str, extensions: tuple,
+                       ledger: Optional[UploadLedger]) -> None:
+    from common.scheduler import (
+        QuietHours,
+        UploadQueue,
+    )
+    from uploaders.base.upload_scheduler import UploadScheduler
+
+    account_configs = mainconfig.get_uploader_accounts(uploader_name)
+    queue = UploadQueue(mainconfig.SCHEDULER_QUEUE_PATH)
+
+    try:
+        async with UploadScheduler(
+            [uploader_class(uploader_config=account_config) for account_config in account_configs],
+            queue,
+            max_concurrent_contexts=mainconfig.MAX_CONCURRENT_CONTEXTS,
+            ledger=ledger,
+            posts_per_hour=mainconfig.SCHEDULER_POSTS_PER_HOUR,
+            burst=mainconfig.SCHEDULER_BURST,
+            quiet_hours=QuietHours(mainconfig.SCHEDULER_QUIET_HOURS),
+            max_attempts=mainconfig.SCHEDULER_MAX_ATTEMPTS,
+            retry_delay=mainconfig.SCHEDULER_RETRY_DELAY,
+            idle_detach_seconds=mainconfig.SCHEDULER_IDLE_DETACH_SECONDS,
+        ) as scheduler:
+            await scheduler.serve(method, files_folder, extensions, prepare_files)
+    finally:
+        queue.close()
+
+
+async def run_workers(uploader_module: str, uploader_name: str, method: str, files: list, workers: int) -> None:
+    from common.chromium_provisioner import ensure_chromium
+    from common.work_queue import WorkQueue
+    from uploaders.base.worker_pool import WorkerCoordinator
+
+    # Installed once here instead of by every worker at the same time
+    if not read_daemon_endpoint():
+        await ensure_chromium()
+
+    accounts = [account_config.account_name for account_config in mainconfig.get_uploader_accounts(uploader_name)]
+    queue = WorkQueue(mainconfig.WORKER_QUEUE_PATH)
+
+    try:
+        await WorkerCoordinator(
+            uploader_module,
+            method,
+            accounts,
+            queue,
+            mainconfig.WORKER_QUEUE_PATH,
+            workers,
+            prepare_files,
+            lease_seconds=mainconfig.WORKER_LEASE_SECONDS,
+            max_restarts=mainconfig.WORKER_MAX_RESTARTS,
+            progress_interval=mainconfig.WORKER_PROGRESS_INTERVAL,
+        ).run(files)
+    finally:
+        queue.close()
+
+
+async def run_watch(uploader, uploader_name: str, method_name: str, files_folder: str, extensions: tuple,
+                    ledger: Optional[UploadLedger]) -> None:
+    logger = get_named_logger('main')
+    method = getattr(uploader, method_name)
+    uploader.set_ledger(ledger)
+
+    async with uploader:
+        logger.info(f"Watching '{files_folder}' for new files...")
+
+        async for files in create_folder_watcher(files_folder, extensions).batches():
+            if ledger:
+                files = await ledger.filter_unposted(files, uploader_name, account=uploader.account_name)
+
+            if not files:
+                continue
+
+            logger.info(f"Starting upload of {len(files)} new file(s)...")
+            uploader.mark_pending(files)
+
+            try:
+                await method(await prepare_files(method_name, files, ledger))
+                logger.info(f"Successfully uploaded {len(files)} file(s)!")
+            except Exception as e:
+                logger.exception(f"Error during upload: {e}")
+
+
+async def run_upload(args: argparse.Namespace) -> None:
+    setup_logging(**mainconfig.LOGGING_SETTINGS)
+    logger = get_named_logger('main')
+
+    # A missing Chromium downloads while the uploader, files and preflight are being prepared
+    if mainconfig.CHROMIUM_PROVISION_ON_START and not read_daemon_endpoint() and not resolve_chromium():
+        logger.info("Chromium is not installed, provisioning it in the background")
+        start_chromium_provisioning()
+
+    try:
+        uploader_class, uploader_name = load_uploader_module(args.uploader)
+    except ModuleNotFoundError:
+        logger.error(f"Uploader '{args.uploader}' not found.")
+        await sleep_on_error()
+        return
+
+    try:
+        uploader = uploader_class()
+    except UndefinedValueError as e:
+        logger.error(f"Uploader '{uploader_name}' is not configured: {e}")
+        await sleep_on_error()
+        return
+
+    logger.info(f"Uploader initialized: {uploader_name}")
+
+    upload_settings = mainconfig.METHOD_TO_UPLOAD_SETTINGS_BIND.get(args.method)
+
+    if not upload_settings:
+        logger.error(f"No upload settings found for method '{args.method}'.")
+        await sleep_on_error()
+        return
+
+    files_folder = upload_settings.get("folder")
+    extensions = upload_settings.get("supported_extensions")
+
+    if not files_folder:
+        logger.error(f"No folder is bind for method {args.method}.")
+        await sleep_on_error()
+        return
+
+    ledger = UploadLedger(mainconfig.LEDGER_PATH) if mainconfig.LEDGER_ENABLED else None
+
+    if args.schedule:
+        if not callable(getattr(uploader, args.method, None)):
+            logger.error(f"Method '{args.method}' is not implemented in {uploader_name} uploader.")
+            await sleep_on_error()
+            return
+
+        try:
+            await run_schedule(uploader_class, uploader_name, args.method, files_folder, extensions, ledger)
+        except Exception as e:
+            logger.exception(f"Unexpected error: {e}")
+            await sleep_on_error()
+        return
+
+    if args.watch:
+        if not callable(getattr(uploader, args.method, None)):
+            logger.error(f"Method '{args.method}' is not implemented in {uploader_name} uploader.")
+            await sleep_on_error()
+            return
+
+        try:
+            await run_watch(uploader, uploader_name, args.method, files_folder, extensions, ledger)
+        except Exception as e:
+            logger.exception(f"Unexpected error: {e}")
+            await sleep_on_error()
+        return
+
+    files = collect_files(files_folder, extensions)
+
+    if ledger and files:
+        files = await ledger.filter_unposted(
+            files, uploader_name, account=None if args.pool or args.workers else uploader.account_name,
+        )
+
+        if not files:
+            logger.info(f"All files for {args.method} were already posted.")
+            await sleep_on_success()
+            return
+
+    if not files:
+        logger.error(f"No files found for {args.method}.")
+        await sleep_on_error()
+        return
+
+    method = getattr(uploader, args.method, None)
+
+    if not callable(method):
+        logger.error(f"Method '{args.method}' is not implemented in {uploader_name} uploader.")
+        await sleep_on_error()
+        return
+
+    files_task = None
+
+    try:
+        logger.info(f"Starting upload of {len(files)} file(s)...")
+
+        # Every worker process runs the preflight of the items it leases
+        if args.workers:
+            try:
+                await run_workers(args.uploader, uploader_name, args.method, files, args.workers)
+            except UploadBatchException as e:
+                logger.error(f"Error during upload: {e}")
+                await sleep_on_error()
+                return
+
+            logger.info(f"Successfully uploaded {len(files)} file(s)!")
+            await sleep_on_success()
+            return
+
+        # Preflight runs while the browser starts
+        files_task = asyncio.create_task(prepare_files(args.method, files, ledger))
+
+        if args.pool:
+            try:
+                await run_pool(uploader_class, uploader_name, args.method, files_task, ledger)
+            except UploadBatchException as e:
+                logger.error(f"Error during upload: {e}")
+                await sleep_on_error()
+                return
+
+            logger.info(f"Successfully uploaded {len(files)} file(s)!")
+            await sleep_on_success()
+            return
+
+        uploader.set_ledger(ledger)
+        uploader.mark_pending(files)
+
+        async with uploader:
+            try:
+                files = await files_task
+
+                if asyncio.iscoroutinefunction(method):
+                    await method(files)
+                else:
+                    method(files)
+            except BaseException as e:
+                logger.exception(f"Error during upload: {e}")
+                await sleep_on_error()
+                return
+
+        logger.info(f"Successfully uploaded {len(files)} file(s)!")
+        await sleep_on_success()
+    except Exception as e:
+        logger.exception(f"Unexpected error: {e}")
+        await sleep_on_error()
+    finally:
+        # The browser or pool failed to start before the preflight was awaited: stop it and retrieve its outcome
+        if files_task:
+            files_task.cancel()
+            await asyncio.gather(files_task, return_exceptions=True)
+
+
+def run(args: argparse.Namespace) -> None:
+    try:
+        asyncio.run(run_upload(args))
+    finally:
+        get_metrics().finalize()
@@ -1,32 +1,72 @@
-import os
-import subprocess
-import sys
+import asyncio
+import time
 from abc import (
     ABC,
     abstractmethod,
 )
 from pathlib import Path
+from urllib.parse import urlparse
 from typing import (
     AsyncContextManager,
+    Awaitable,
+    Callable,
     Optional,
     Any,
 )
 
 from playwright.async_api import (
     async_playwright,
+    Browser,
+    Locator,
+    Playwright,
     ProxySettings,
     Page,
-)
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_fixed,
-    retry_if_exception_type,
+    TimeoutError as PlaywrightTimeoutError,
 )
 
-from common.utils import find_chrome_executable
+from common.asset_cache import AssetCache
+from common.browser_daemon import (
+    daemon_uses_context_proxies,
+    read_daemon_endpoint,
+    read_daemon_pid,
+)
+from common.chromium_provisioner import ensure_chromium
+from common.exceptions import (
+    PageLoadException,
+    SelectorNotFoundException,
+)
+from common.ledger import (
+    STATUS_PENDING,
+    UploadLedger,
+)
+from common.session_cache import SessionCache
+from common.session_store import get_session_store
+from common.utils import humanize_pause
 from common.logging_setup import get_named_logger
-from config.mainconfig import PROJECT_ROOT_FOLDER
+from common.memory_watchdog import MemoryWatchdog
+from common.metrics import (
+    span,
+    timed_stage,
+)
+from common.proxy import proxy_settings_to_url
+from common.proxy_pool import (
+    ProxyPool,
+    ProxyState,
+    load_proxy_urls,
+)
+from common.retry_policy import (
+    CircuitBreaker,
+    RetryPolicy,
+    get_circuit_breaker,
+    step_timeout,
+)
+from config import mainconfig
+from uploaders.base.request_router import RequestRouter
+
+UPLOAD_TRANSPORT_BROWSER = 'browser'
+UPLOAD_TRANSPORT_HTTP = 'http'
+# Context proxy for accounts without one
+DIRECT_PROXY = {'server': 'direct://'}
 
 _BROWSER_ARGS = []
 _HEADLESS_BROWSER_ARGS = [
@@ -41,6 +81,64 @@ _HEADLESS_BROWSER_ARGS = [
     "--disable-dev-shm-usage",
     "--disable-blink-features=AutomationControlled",
 ]
+# Memory-lean launch profile: no background services, small caches, fewer renderer processes and a capped V8 heap
+_LEAN_BROWSER_ARGS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--aggressive-cache-discard",
+    "--disk-cache-size=33554432",
+    "--media-cache-size=1048576",
+    "--renderer-process-limit=4",
+    "--js-flags=--max-old-space-size=768",
+]
+LAUNCH_PROFILES = {
+    'default': [],
+    'lean': _LEAN_BROWSER_ARGS,
+}
+
+
+def get_launch_args(headless: bool, launch_profile: str = 'default') -> list[str]:
+    if launch_profile not in LAUNCH_PROFILES:
+        raise ValueError(f"Unknown launch profile: {launch_profile}")
+
+    return [*(_HEADLESS_BROWSER_ARGS if headless else _BROWSER_ARGS), *LAUNCH_PROFILES[launch_profile]]
+
+
+_asset_cache: Optional[AssetCache] = None
+
+
+def get_asset_cache() -> Optional[AssetCache]:
+    # One cache per process, shared by every context (pool accounts, tabs)
+    global _asset_cache
+
+    if mainconfig.ASSET_CACHE_ENABLED and _asset_cache is None:
+        _asset_cache = AssetCache(mainconfig.ASSET_CACHE_FOLDER, mainconfig.ASSET_CACHE_MAX_BYTES)
+
+    return _asset_cache
+
+
+_proxy_pool: Optional[ProxyPool] = None
+
+
+def get_proxy_pool() -> Optional[ProxyPool]:
+    global _proxy_pool
+
+    if _proxy_pool is None:
+        proxy_urls = load_proxy_urls(mainconfig.PROXY_POOL, mainconfig.PROXY_POOL_FILE)
+
+        if proxy_urls:
+            _proxy_pool = ProxyPool(
+                proxy_urls,
+                affinity_path=mainconfig.PROXY_AFFINITY_PATH,
+                probe_target=mainconfig.PROXY_POOL_PROBE_TARGET,
+                latency_budget=mainconfig.PROXY_POOL_LATENCY_BUDGET,
+                max_consecutive_failures=mainconfig.PROXY_POOL_MAX_FAILURES,
+            )
+
+    return _proxy_pool
 
 
 class BaseUploader(AsyncContextManager, ABC):
@@ -49,81 +147,305 @@ class BaseUploader(AsyncContextManager, ABC):
         "https://www.wikipedia.org",
         "https://www.youtube.com"
     ]
+    # Cookies whose presence in the storage state proves a logged-in session
+    SESSION_COOKIE_NAMES: tuple[str, ...] = ()
+    # Request interception: resource types / URL globs to abort, and URL globs that are never blocked
+    BLOCKED_RESOURCE_TYPES: tuple[str, ...] = ()
+    BLOCKED_URL_PATTERNS: tuple[str, ...] = ()
+    ALLOWED_URL_PATTERNS: tuple[str, ...] = ()
+    # Default wait for a selector or a navigation step (ms), capped by the file's retry budget
+    STEP_TIMEOUT = 10_000
 
     def __init__(self, *, uploader_name: str, proxy_settings: ProxySettings = None, headless: bool = True,
-                 storage_state: str = None, save_storage_state_on_exit: bool = True, **kwargs):
-        self._logger = get_named_logger(uploader_name)
+                 storage_state: str = None, save_storage_state_on_exit: bool = True, account_name: str = None,
+                 upload_tabs: int = 1, block_resources: bool = True, upload_transport: str = UPLOAD_TRANSPORT_BROWSER,
+                 upload_endpoint: str = None, launch_profile: str = 'default', recycle_after_uploads: int = 0,
+                 memory_limit_mb: int = 0, **kwargs):
+        self._logger = get_named_logger(f'{uploader_name}.{account_name}' if account_name else uploader_name)
         self._uploader_name = uploader_name
+        self._account_name = account_name
         self._proxy_settings = proxy_settings
         self._headless = headless
         self._storage_state = storage_state
         self._save_storage_state_on_exit = save_storage_state_on_exit
+        self._upload_tabs = max(1, upload_tabs)
+        self._launch_args = get_launch_args(headless, launch_profile)
+        self._memory_watchdog = MemoryWatchdog(recycle_after_uploads, memory_limit_mb * 1024 ** 2)
+        self._login_lock = asyncio.Lock()
+        self._ledger: Optional[UploadLedger] = None
+        self._request_router = RequestRouter(
+            self._logger,
+            blocked_resource_types=self.BLOCKED_RESOURCE_TYPES if block_resources else (),
+            blocked_url_patterns=self.BLOCKED_URL_PATTERNS if block_resources else (),
+            allowed_url_patterns=self.ALLOWED_URL_PATTERNS,
+            asset_cache=get_asset_cache(),
+            cached_resource_types=mainconfig.ASSET_CACHE_RESOURCE_TYPES,
+        )
+        # An account pinned to a proxy keeps it; the pool only serves accounts without one
+        self._proxy_pool = None if proxy_settings else get_proxy_pool()
+
+        if proxy_settings and get_proxy_pool():
+            self._logger.info(f"[{self._uploader_name}] Using the configured proxy instead of the proxy pool")
+
+        self._proxy: Optional[ProxyState] = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._owns_browser = True
+        self._connected_to_daemon = False
+        self._reused_daemon_context = False
+        self._session_cache = SessionCache(
+            storage_state=storage_state,
+            session_cookie_names=self.SESSION_COOKIE_NAMES,
+            ttl=mainconfig.SESSION_FRESHNESS_TTL,
+        )
+        self._media_transport = self._create_media_transport(upload_transport, upload_endpoint)
+        self._page_retry_policy = RetryPolicy(
+            attempts=mainconfig.RETRY_PAGE_ATTEMPTS,
+            base_delay=mainconfig.RETRY_BASE_DELAY,
+            max_delay=mainconfig.RETRY_MAX_DELAY,
+        )
+        self._upload_retry_policy = RetryPolicy(
+            attempts=mainconfig.RETRY_UPLOAD_ATTEMPTS,
+            base_delay=mainconfig.RETRY_BASE_DELAY,
+            max_delay=mainconfig.RETRY_MAX_DELAY,
+        )
 
     async def __aenter__(self) -> "BaseUploader":
         self._playwright = await async_playwright().start()
-        self._browser = await self._playwright.chromium.launch(
-            executable_path=self._download_chrome_with_h264_codec(),
+        self._browser = await self._launch_browser(self._playwright)
+        await self._open_context()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        self._request_router.log_stats()
+
+        if self._proxy_pool:
+            self._proxy_pool.log_stats(self._logger)
+
+        storage_state_saved = await self._save_storage_state_if_required()
+        browser_closed = await self._close_browser()
+        return storage_state_saved and browser_closed
+
+    async def attach(self, browser: Browser) -> "BaseUploader":
+        self._browser = browser
+        self._owns_browser = False
+        await self._open_context()
+        return self
+
+    async def detach(self) -> bool:
+        self._request_router.log_stats()
+        storage_state_saved = await self._save_storage_state_if_required()
+        context_closed = await self._close_browser()
+        self._context = None
+        self._page = None
+        return bool(storage_state_saved and context_closed)
+
+    @property
+    def account_name(self) -> str:
+        return self._account_name or 'default'
+
+    @property
+    def metric_labels(self) -> dict:
+        return {'uploader': self._uploader_name, 'account': self.account_name}
+
+    @property
+    def uses_context_proxy(self) -> bool:
+        return bool(self._proxy_settings or self._proxy_pool)
+
+    def set_ledger(self, ledger: Optional[UploadLedger]) -> None:
+        self._ledger = ledger
+
+    def mark_pending(self, files: list) -> None:
+        self._record_upload(files, STATUS_PENDING)
+
+    def _record_upload(self, files: list, status: str, error: str = None) -> None:
+        if not self._ledger:
+            return
+
+        for file in files:
+            self._ledger.set_status(file, self._uploader_name, self.account_name, status, error)
+
+    @timed_stage('browser_launch')
+    async def _launch_browser(self, playwright: Playwright, proxy_per_context: bool = None) -> Browser:
+        browser = await self._connect_to_daemon(playwright)
+
+        if browser:
+            return browser
+
+        if proxy_per_context is None:
+            proxy_per_context = self.uses_context_proxy
+
+        # Waits for the provisioning started by the runner when Chromium is not installed yet
+        async with span('chromium_resolve', **self.metric_labels):
+            executable_path = await ensure_chromium()
+
+        return await playwright.chromium.launch(
+            executable_path=executable_path,
             headless=self._headless,
-            args=_BROWSER_ARGS if not self._headless else _HEADLESS_BROWSER_ARGS,
+            args=self._launch_args,
             proxy={
                 'server': 'http://per-context'
-            } if self._proxy_settings else None,
+            } if proxy_per_context else None,
         )
-        new_page_kwargs = {}
 
-        if self._storage_state and os.path.exists(self._storage_state):
-            self._logger.info('Creating page using the storage state')
-            new_page_kwargs['storage_state'] = self._storage_state
+    async def _connect_to_daemon(self, playwright: Playwright) -> Optional[Browser]:
+        endpoint = read_daemon_endpoint()
+
+        if not endpoint:
+            return None
+
+        try:
+            browser = await playwright.chromium.connect_over_cdp(endpoint, timeout=5000)
+        except Exception as e:
+            self._logger.warning(f"[{self._uploader_name}] Browser daemon is not reachable, launching locally: {e}")
+            return None
+
+        self._connected_to_daemon = True
+        # Chromium is the daemon's child, not ours; the daemon may also serve other runs
+        self._memory_watchdog.watch(read_daemon_pid(), shared=True)
+        self._logger.info(f"[{self._uploader_name}] Attached to browser daemon at {endpoint}")
+        return browser
+
+    async def _open_context(self, storage_state: dict = None, exclude_proxy: ProxyState = None) -> None:
+        # The daemon's default context goes through its launch proxy, which is only a placeholder when it serves
+        # accounts with their own proxies
+        if self._owns_browser and self._connected_to_daemon and mainconfig.BROWSER_DAEMON_REUSE_CONTEXT \
+                and self._browser.contexts and not daemon_uses_context_proxies():
+            await self._reuse_daemon_context()
+            return
+
+        await self._select_proxy(exclude=exclude_proxy)
+        new_context_kwargs = {}
+
+        if not storage_state and self._storage_state:
+            storage_state = get_session_store().load(self._storage_state)
+
+            if storage_state:
+                self._logger.info('Creating page using the storage state')
+
+        if storage_state:
+            new_context_kwargs['storage_state'] = storage_state
         else:
             self._logger.info('Creating page without the storage state')
 
-        self._page = await self._browser.new_page(
+        self._context = await self._browser.new_context(
             viewport={"width": 1440, "height": 768},
-            proxy=self._proxy_settings if self._proxy_settings else None,
-            **new_page_kwargs
+            # A shared browser may have been launched with the per-context placeholder, which is not a real proxy
+            proxy=self._proxy_settings if self._proxy_settings else DIRECT_PROXY,
+            **new_context_kwargs
         )
+        await self._request_router.install(self._context)
+        self._page = await self._context.new_page()
         await self._patch_navigator_webdriver()
-        return self
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
-        storage_state_saved = await self._save_storage_state_if_required()
-        browser_closed = await self._close_browser()
-        return storage_state_saved and browser_closed
 
-    def _download_chrome_with_h264_codec(self) -> str:
-        executable_path = find_chrome_executable()
-
-        if executable_path:
-            return executable_path
+    async def _select_proxy(self, exclude: ProxyState = None) -> None:
+        if not self._proxy_pool:
+            return
+
+        await self._proxy_pool.ensure_probed()
+        self._proxy = self._proxy_pool.select(self.account_name, exclude=exclude)
+        self._proxy_settings = self._proxy.settings
+
+    async def _recreate_context(self, exclude_proxy: ProxyState = None) -> None:
+        # Cookies and localStorage are carried over in memory, so the new context stays logged in
+        storage_state = await self._context.storage_state()
+        await self._context.close()
+        await self._open_context(storage_state=storage_state, exclude_proxy=exclude_proxy)
+
+    async def _recycle_if_required(self, page: Page = None) -> Optional[Page]:
+        # Called between uploads; returns the page to continue with, which is a fresh one if a tab was recycled
+        reason = self._memory_watchdog.record_upload() if self._memory_watchdog.enabled else None
+
+        if not reason:
+            return page
+
+        self._memory_watchdog.reset()
+
+        async with span('recycle', **self.metric_labels):
+            if page is not None and page is not self._page:
+                self._logger.info(f"[{self._uploader_name}] Recycling upload tab: {reason}")
+                await page.close()
+                page = await self._context.new_page()
+                await self._patch_navigator_webdriver(page)
+            elif self._reused_daemon_context:
+                # The daemon's context outlives this run, only its page is replaced
+                self._logger.info(f"[{self._uploader_name}] Recycling page: {reason}")
+                await self._page.close()
+                self._page = await self._context.new_page()
+                await self._patch_navigator_webdriver()
+            else:
+                self._logger.info(f"[{self._uploader_name}] Recycling browser context: {reason}")
+                await self._save_storage_state_if_required()
+                await self._recreate_context()
+
+        return page
+
+    async def _fail_over_proxy(self, reason: str) -> None:
+        if not self._proxy_pool or not self._proxy or self._reused_daemon_context or len(self._proxy_pool) < 2:
+            return
+
+        self._logger.warning(f"[{self._uploader_name}] Proxy {self._proxy.label} {reason}, failing over")
+        await self._recreate_context(exclude_proxy=self._proxy)
+
+    async def _reuse_daemon_context(self) -> None:
+        self._context = self._browser.contexts[0]
+        self._reused_daemon_context = True
+
+        storage_state = get_session_store().load(self._storage_state) if self._storage_state else None
+
+        if storage_state and not await self._context.cookies():
+            self._logger.info('Restoring cookies into the daemon context from the storage state')
+            await self._context.add_cookies(storage_state['cookies'])
+        else:
+            self._logger.info('Reusing the warm daemon context')
 
-        self._logger.info("Chromium not found, executing download script...")
+        await self._request_router.install(self._context)
+        self._page = await self._context.new_page()
+        await self._patch_navigator_webdriver()
 
-        project_root = os.path.abspath(PROJECT_ROOT_FOLDER)
+    def _create_media_transport(self, upload_transport: str, upload_endpoint: str):
+        if upload_transport == UPLOAD_TRANSPORT_BROWSER:
+            return None
 
-        if sys.platform.startswith('win'):
-            script_path = os.path.join(project_root, 'download_chromium.bat')
-            subprocess.run([script_path], check=True, timeout=1200)
-        elif sys.platform.startswith('linux') or sys.platform.startswith('darwin'):
-            script_path = os.path.join(project_root, 'download_chromium.bash')
-            subprocess.run(['bash', script_path], check=True, timeout=1200)
-        else:
-            raise RuntimeError("Unsupported platform")
+        if upload_transport != UPLOAD_TRANSPORT_HTTP:
+            raise ValueError(f"Unknown upload transport: {upload_transport}")
 
-        self._logger.info("Chromium download and extraction completed successfully.")
+        if not upload_endpoint:
+            raise ValueError(f"The '{UPLOAD_TRANSPORT_HTTP}' upload transport requires an upload endpoint")
 
-        executable_path = find_chrome_executable()
+        # httpx is only needed when media bytes bypass the browser
+        from uploaders.base.chunked_upload import ChunkedUploadTransport
 
-        if not executable_path:
-            self._logger.error("Chromium executable not found after script execution.")
-            raise FileNotFoundError("Chromium executable not found after running the download script.")
+        return ChunkedUploadTransport(
+            upload_endpoint,
+            chunk_size=mainconfig.CHUNKED_UPLOAD_CHUNK_SIZE,
+            parallel_chunks=mainconfig.CHUNKED_UPLOAD_PARALLEL,
+            max_retries=mainconfig.CHUNKED_UPLOAD_RETRIES,
+            state_folder=mainconfig.CHUNKED_UPLOAD_STATE_FOLDER,
+        )
 
-        return executable_path
+    async def _upload_media(self, file: str, page: Page = None) -> str:
+        # The bytes go over HTTP with this context's cookies and user agent; returns the endpoint's media id
+        async with span('http_upload', **self.metric_labels):
+            return await self._media_transport.upload(
+                file,
+                cookies=await self._context.cookies(),
+                user_agent=await (page or self._page).evaluate('navigator.userAgent'),
+                proxy=self._proxy.url if self._proxy else proxy_settings_to_url(self._proxy_settings),
+            )
 
     async def _save_storage_state_if_required(self) -> bool:
         try:
             if self._save_storage_state_on_exit and self._page and self._storage_state:
-                await self._page.context.storage_state(path=self._storage_state)
-                self._logger.info(f"[{self._uploader_name}] Storage state updated")
+                storage_state = await self._page.context.storage_state()
+
+                if await asyncio.to_thread(get_session_store().save, self._storage_state, storage_state):
+                    self._logger.info(f"[{self._uploader_name}] Storage state updated")
+                else:
+                    self._logger.debug(f"[{self._uploader_name}] Storage state unchanged")
+
                 return True
         except Exception as e:
             self._logger.error(f"[{self._uploader_name}] Failed to save storage state: {e}")
@@ -131,6 +453,14 @@ class BaseUploader(AsyncContextManager, ABC):
 
     async def _close_browser(self) -> bool:
         try:
+            if not self._owns_browser:
+                if self._context:
+                    await self._context.close()
+                return True
+
+            if self._reused_daemon_context and self._page:
+                await self._page.close()
+
             if self._browser:
                 await self._browser.close()
             if self._playwright:
@@ -141,7 +471,7 @@ class BaseUploader(AsyncContextManager, ABC):
             self._logger.warning(f"[{self._uploader_name}] Error occurred while stopping playwright: {e}")
             return False
 
-    async def _patch_navigator_webdriver(self) -> None:
+    async def _patch_navigator_webdriver(self, page: Page = None) -> None:
         patch_script = """
         if (navigator.webdriver === false) {
             // Post Chrome 89.0.4339.0 and already good
@@ -152,43 +482,156 @@ class BaseUploader(AsyncContextManager, ABC):
             delete Object.getPrototypeOf(navigator).webdriver
         }
         """
-        await self._page.add_init_script(patch_script)
+        await (page or self._page).add_init_script(patch_script)
 
+    @timed_stage('warm_up')
     async def _warm_up_browser(self) -> None:
+        if self._reused_daemon_context:
+            self._logger.info(f"[{self._uploader_name}] Daemon context is already warm, skipping warm-up.")
+            return
+
         self._logger.info(f"[{self._uploader_name}] Starting browser warm-up sequence...")
 
         for url in self.WARMUP_URLS:
             try:
                 self._logger.debug(f"[{self._uploader_name}] Warming up with: {url}")
-                response = await self._page.goto(url, wait_until="domcontentloaded", timeout=10000)
+                response = await self._page.goto(url, wait_until="domcontentloaded", timeout=self.STEP_TIMEOUT)
 
                 if response and response.ok:
                     self._logger.debug(f"[{self._uploader_name}] Warm-up page loaded successfully: {url}")
                 else:
                     self._logger.warning(f"[{self._uploader_name}] Failed warm-up load: {url}")
 
-                await self._page.wait_for_timeout(1500)
+                await self._page.wait_for_load_state("load", timeout=self.STEP_TIMEOUT)
+                await humanize_pause(1.5)
             except Exception as e:
                 self._logger.warning(f"[{self._uploader_name}] Error during warm-up on {url}: {e}")
 
         self._logger.info(f"[{self._uploader_name}] Browser warm-up complete.")
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_fixed(2),
-        retry=retry_if_exception_type(BaseException),
-        reraise=True
-    )
-    async def _open_page(self, url: str, timeout: int = 30000) -> Page:
+    @timed_stage('open_page')
+    async def _open_page(self, url: str, timeout: int = 30000, page: Page = None) -> Page:
+        return await self._page_retry_policy.run(
+            lambda: self._open_page_once(url, timeout, page),
+            description=f"open {url}",
+            get_breaker=lambda: self._circuit_breaker(url),
+        )
+
+    def _circuit_breaker(self, url: str) -> CircuitBreaker:
+        proxy_label = self._proxy.label if self._proxy else (self._proxy_settings or {}).get('server', 'direct')
+        return get_circuit_breaker(f"{urlparse(url).hostname} via {proxy_label}")
+
+    async def _open_page_once(self, url: str, timeout: int, page: Page = None) -> Page:
+        owns_context_page = page is None or page is self._page
+
+        # Proxy failover swaps the whole context, so only the main page may trigger it
+        if owns_context_page and self._proxy and self._proxy_pool.is_slow(self._proxy):
+            await self._fail_over_proxy(reason="exceeded the latency budget")
+
+        page = self._page if owns_context_page else page
+        navigation_timeout = step_timeout(timeout)
         self._logger.info(f"[{self._uploader_name}] Trying to open page: {url}")
+        started_at = time.monotonic()
+
+        try:
+            # One span per attempt; the enclosing open_page span also covers retries and their waits
+            async with span('page_goto', **self.metric_labels):
+                response = await page.goto(url, timeout=navigation_timeout, wait_until="domcontentloaded")
+        except Exception:
+            if self._proxy:
+                self._proxy_pool.record_failure(self._proxy)
+
+                if owns_context_page:
+                    await self._fail_over_proxy(reason="failed to navigate")
+            raise
 
-        response = await self._page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+        if self._proxy:
+            self._proxy_pool.record_success(self._proxy, time.monotonic() - started_at)
 
         if not response or not response.ok:
-            raise Exception(f"Failed to load page or bad response: {response.status if response else 'No response'}")
+            raise PageLoadException(url, response.status if response else None)
 
         self._logger.info(f"[{self._uploader_name}] Successfully opened: {url}")
-        return self._page
+        return page
+
+    async def _wait_for_selector(self, locator: Locator, state: str = "visible", timeout: int = None) -> None:
+        try:
+            await locator.wait_for(state=state, timeout=step_timeout(timeout or self.STEP_TIMEOUT))
+        except PlaywrightTimeoutError as e:
+            raise SelectorNotFoundException(f"{locator} did not become {state}") from e
+
+    async def _run_in_tabs(self, files: list, upload: Callable[[str, Page], Awaitable[None]]) -> dict:
+        queue = asyncio.Queue()
+        tab_count = min(self._upload_tabs, len(files))
+
+        for file in files:
+            queue.put_nowait(file)
+
+        for _ in range(tab_count):
+            queue.put_nowait(None)
+
+        return await self._run_queue_in_tabs(queue, upload, tab_count)
+
+    async def _run_queue_in_tabs(self, queue: asyncio.Queue, upload: Callable[[str, Page], Awaitable[None]],
+                                 tab_count: int) -> dict:
+        # Each tab uploads files from the queue until it takes a None; producers send one None per tab.
+        # A single tab uploads on the main page.
+        failures = {}
+
+        async def open_tab() -> Page:
+            page = await self._context.new_page()
+            await self._patch_navigator_webdriver(page)
+            return page
+
+        async def close_tab(page: Optional[Page]) -> None:
+            if not page:
+                return
+
+            try:
+                await page.close()
+            except Exception as e:
+                self._logger.debug(f"[{self._uploader_name}] Cannot close upload tab: {e}")
+
+        async def tab_worker(tab_index: int) -> None:
+            page = None
+
+            try:
+                while (file := await queue.get()) is not None:
+                    # A tab that cannot be opened or recycled fails only the file at hand and is reopened for the next
+                    try:
+                        if page is None and tab_count > 1:
+                            page = await open_tab()
+
+                        self._logger.info(f"[{self._uploader_name}] Tab {tab_index}: uploading {file}")
+                        await upload(file, page)
+                    except Exception as e:
+                        self._logger.error(f"[{self._uploader_name}] Tab {tab_index}: failed to upload {file}: {e}")
+                        failures[file] = e
+
+                    try:
+                        page = await self._recycle_if_required(page)
+                    except Exception as e:
+                        self._logger.error(f"[{self._uploader_name}] Tab {tab_index}: recycling failed: {e}")
+
+                        if page is not self._page:
+                            await close_tab(page)
+                            page = None
+            finally:
+                if page is not self._page:
+                    await close_tab(page)
+
+        tabs = [asyncio.create_task(tab_worker(index)) for index in range(tab_count)]
+
+        try:
+            await asyncio.gather(*tabs)
+        finally:
+            # Only reached early on cancellation or an unexpected error; no tab keeps uploading unsupervised
+            for tab in tabs:
+                tab.cancel()
+
+            await asyncio.gather(*tabs, return_exceptions=True)
+
+        return failures
 
     @property
     def path_to_temp_folder(self):
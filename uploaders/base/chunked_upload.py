@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import (
+    asdict,
+    dataclass,
+    field,
+)
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+import httpx
+
+from common.exceptions import (
+    AuthException,
+    UploadTransportException,
+)
+from common.logging_setup import get_named_logger
+from common.retry_policy import RetryPolicy
+from config import mainconfig
+
+_logger = get_named_logger('chunked_upload')
+
+# Piece size of the streaming reads that feed one chunk request
+_READ_SIZE = 1024 * 1024
+
+
+@dataclass
+class ChunkedUploadSession:
+    upload_id: str
+    size: int
+    mtime_ns: int
+    chunk_size: int
+    completed_chunks: set[int] = field(default_factory=set)
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+
+    @property
+    def pending_chunks(self) -> list[int]:
+        return [index for index in range(self.chunk_count) if index not in self.completed_chunks]
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        start = index * self.chunk_size
+        return start, min(self.size, start + self.chunk_size)
+
+
+class ChunkedUploadTransport:
+    # Sends media bytes straight to an HTTP endpoint with the browser's cookies, leaving only the post to the page:
+    #   POST {endpoint}/init                  {file_name, size, chunk_size} -> {upload_id, chunk_size}
+    #   GET  {endpoint}/{upload_id}           -> {received: [chunk indexes]}
+    #   PUT  {endpoint}/{upload_id}/{index}   chunk bytes with Content-Range
+    #   POST {endpoint}/{upload_id}/complete  -> {media_id}
+
+    def __init__(self, endpoint: str, chunk_size: int = 8 * 1024 * 1024, parallel_chunks: int = 4,
+                 max_retries: int = 3, state_folder: str = None, timeout: float = 60):
+        self._endpoint = endpoint.rstrip('/')
+        self._chunk_size = max(_READ_SIZE, chunk_size)
+        self._parallel_chunks = max(1, parallel_chunks)
+        # Same backoff, retryable statuses and per-file time budget as every other step
+        self._retry_policy = RetryPolicy(
+            attempts=max(1, max_retries),
+            base_delay=mainconfig.RETRY_BASE_DELAY,
+            max_delay=mainconfig.RETRY_MAX_DELAY,
+        )
+        self._state_folder = state_folder
+        self._timeout = timeout
+
+    async def upload(self, file: str, cookies: list[dict] = None, user_agent: str = None,
+                     proxy: str = None) -> str:
+        stat = os.stat(file)
+
+        async with httpx.AsyncClient(
+            cookies=self._build_cookies(cookies or []),
+            headers={'User-Agent': user_agent} if user_agent else None,
+            proxy=proxy,
+            timeout=self._timeout,
+            limits=httpx.Limits(max_connections=self._parallel_chunks),
+        ) as client:
+            session = await self._resume_session(client, file, stat)
+
+            if not session:
+                session = await self._init_session(client, file, stat)
+
+            pending_chunks = session.pending_chunks
+            _logger.info(
+                f"Uploading '{os.path.basename(file)}' in {len(pending_chunks)}/{session.chunk_count} chunk(s) "
+                f"of {session.chunk_size // 1024} KB, {self._parallel_chunks} in parallel"
+            )
+            await self._upload_chunks(client, file, session, pending_chunks)
+            response = await self._request(client, 'POST', f'{self._endpoint}/{session.upload_id}/complete')
+            media_id = response.json().get('media_id')
+
+        if not media_id:
+            raise UploadTransportException(f"Upload of '{file}' completed without a media id")
+
+        self._remove_state(file, stat)
+        return media_id
+
+    async def _upload_chunks(self, client: httpx.AsyncClient, file: str, session: ChunkedUploadSession,
+                             chunks: list[int]) -> None:
+        queue = asyncio.Queue()
+
+        for index in chunks:
+            queue.put_nowait(index)
+
+        async def chunk_worker() -> None:
+            while not queue.empty():
+                index = queue.get_nowait()
+                start, end = session.chunk_range(index)
+                await self._request(
+                    client, 'PUT', f'{self._endpoint}/{session.upload_id}/{index}',
+                    content_factory=lambda: self._read_range(file, start, end),
+                    headers={
+                        'Content-Length': str(end - start),
+                        'Content-Range': f'bytes {start}-{max(start, end - 1)}/{session.size}',
+                        'Content-Type': 'application/octet-stream',
+                    },
+                )
+                session.completed_chunks.add(index)
+                self._save_state(file, session)
+
+        workers = [asyncio.create_task(chunk_worker()) for _ in range(min(self._parallel_chunks, len(chunks)))]
+
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # The first failure (e.g. an expired session) stops the sibling PUTs before the client is closed
+            for worker in workers:
+                worker.cancel()
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _init_session(self, client: httpx.AsyncClient, file: str, stat: os.stat_result) -> ChunkedUploadSession:
+        response = await self._request(client, 'POST', f'{self._endpoint}/init', json={
+            'file_name': os.path.basename(file),
+            'size': stat.st_size,
+            'chunk_size': self._chunk_size,
+        })
+        payload = response.json()
+        session = ChunkedUploadSession(
+            upload_id=payload['upload_id'],
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            chunk_size=payload.get('chunk_size') or self._chunk_size,
+        )
+        self._save_state(file, session)
+        return session
+
+    async def _resume_session(self, client: httpx.AsyncClient, file: str,
+                              stat: os.stat_result) -> Optional[ChunkedUploadSession]:
+        session = self._load_state(file, stat)
+
+        if not session:
+            return None
+
+        try:
+            response = await self._request(client, 'GET', f'{self._endpoint}/{session.upload_id}')
+        except httpx.HTTPStatusError as e:
+            _logger.info(f"Cannot resume upload {session.upload_id} ({e.response.status_code}), starting over")
+            self._remove_state(file, stat)
+            return None
+
+        # The server is the source of truth for which chunks arrived
+        session.completed_chunks = set(response.json().get('received', []))
+        _logger.info(f"Resuming upload {session.upload_id}: {len(session.completed_chunks)} chunk(s) already sent")
+        return session
+
+    async def _request(self, client: httpx.AsyncClient, method: str, url: str, content_factory=None,
+                       **kwargs) -> httpx.Response:
+        async def send() -> httpx.Response:
+            # A streamed body cannot be replayed, so every attempt reads the range again
+            if content_factory:
+                kwargs['content'] = content_factory()
+
+            response = await client.request(method, url, **kwargs)
+
+            if response.status_code in (401, 403):
+                raise AuthException(f"Upload endpoint rejected the session: {response.status_code}")
+
+            response.raise_for_status()
+            return response
+
+        return await self._retry_policy.run(send, description=f'{method} {url}')
+
+    @staticmethod
+    async def _read_range(file: str, start: int, end: int) -> AsyncIterator[bytes]:
+        with open(file, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+
+            while remaining > 0:
+                data = await asyncio.to_thread(f.read, min(_READ_SIZE, remaining))
+
+                if not data:
+                    raise UploadTransportException(f"'{file}' changed while it was being uploaded")
+
+                remaining -= len(data)
+                yield data
+
+    @staticmethod
+    def _build_cookies(cookies: list[dict]) -> httpx.Cookies:
+        jar = httpx.Cookies()
+
+        for cookie in cookies:
+            jar.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+        return jar
+
+    def _state_path(self, file: str, stat: os.stat_result) -> Optional[str]:
+        if not self._state_folder:
+            return None
+
+        key = f'{self._endpoint}|{os.path.abspath(file)}|{stat.st_size}|{stat.st_mtime_ns}'
+        return os.path.join(self._state_folder, f'{hashlib.sha256(key.encode()).hexdigest()}.json')
+
+    def _load_state(self, file: str, stat: os.stat_result) -> Optional[ChunkedUploadSession]:
+        state_path = self._state_path(file, stat)
+
+        if not state_path or not os.path.exists(state_path):
+            return None
+
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+
+            payload['completed_chunks'] = set(payload.get('completed_chunks', []))
+            return ChunkedUploadSession(**payload)
+        except (OSError, ValueError, TypeError) as e:
+            _logger.warning(f"Ignoring unreadable upload state '{state_path}': {e}")
+            return None
+
+    def _save_state(self, file: str, session: ChunkedUploadSession) -> None:
+        stat = os.stat(file)
+
+        if stat.st_size != session.size or stat.st_mtime_ns != session.mtime_ns:
+            raise UploadTransportException(f"'{file}' changed while it was being uploaded")
+
+        state_path = self._state_path(file, stat)
+
+        if not state_path:
+            return
+
+        payload = {**asdict(session), 'completed_chunks': sorted(session.completed_chunks)}
+        tmp_path = f'{state_path}.tmp'
+
+        try:
+            os.makedirs(self._state_folder, exist_ok=True)
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+
+            os.replace(tmp_path, state_path)
+        except OSError as e:
+            _logger.warning(f"Cannot save upload state '{state_path}': {e}")
+
+    def _remove_state(self, file: str, stat: os.stat_result) -> None:
+        state_path = self._state_path(file, stat)
+
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
@@ -0,0 +1,137 @@
+import asyncio
+import re
+from collections import Counter
+from fnmatch import translate
+from logging import Logger
+from typing import Optional
+
+from playwright.async_api import (
+    BrowserContext,
+    Error as PlaywrightError,
+    Request,
+    Route,
+)
+
+from common.asset_cache import AssetCache
+
+# Rough transfer sizes per resource type, used to estimate what blocking saved
+_ESTIMATED_RESOURCE_BYTES = {
+    'image': 50_000,
+    'media': 500_000,
+    'font': 40_000,
+    'stylesheet': 30_000,
+    'script': 80_000,
+}
+_DEFAULT_ESTIMATED_BYTES = 2_000
+
+
+def _compile_patterns(patterns: tuple[str, ...]) -> Optional[re.Pattern]:
+    if not patterns:
+        return None
+
+    return re.compile('|'.join(f'(?:{translate(pattern)})' for pattern in patterns))
+
+
+class RequestRouter:
+    def __init__(
+        self,
+        logger: Logger,
+        blocked_resource_types: tuple[str, ...] = (),
+        blocked_url_patterns: tuple[str, ...] = (),
+        allowed_url_patterns: tuple[str, ...] = (),
+        asset_cache: AssetCache = None,
+        cached_resource_types: tuple[str, ...] = (),
+    ):
+        self._logger = logger
+        self._blocked_resource_types = frozenset(blocked_resource_types)
+        self._blocked_urls = _compile_patterns(blocked_url_patterns)
+        self._allowed_urls = _compile_patterns(allowed_url_patterns)
+        self.requests_seen = 0
+        self.requests_blocked = 0
+        self.estimated_bytes_saved = 0
+        self.blocked_by_type = Counter()
+        self._asset_cache = asset_cache
+        self._cached_resource_types = frozenset(cached_resource_types)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cached_bytes_served = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._blocked_resource_types or self._blocked_urls or self._asset_cache)
+
+    async def install(self, context: BrowserContext) -> None:
+        if self.enabled:
+            await context.route('**/*', self._handle)
+
+    def should_block(self, request: Request) -> bool:
+        url = request.url
+
+        if self._allowed_urls and self._allowed_urls.match(url):
+            return False
+
+        if request.resource_type in self._blocked_resource_types:
+            return True
+
+        return bool(self._blocked_urls and self._blocked_urls.match(url))
+
+    async def _handle(self, route: Route, request: Request) -> None:
+        self.requests_seen += 1
+
+        if self.should_block(request):
+            self.requests_blocked += 1
+            self.blocked_by_type[request.resource_type] += 1
+            self.estimated_bytes_saved += _ESTIMATED_RESOURCE_BYTES.get(request.resource_type, _DEFAULT_ESTIMATED_BYTES)
+            await route.abort('blockedbyclient')
+            return
+
+        if self._is_cacheable(request):
+            await self._handle_cacheable(route, request)
+            return
+
+        await route.continue_()
+
+    def _is_cacheable(self, request: Request) -> bool:
+        return bool(self._asset_cache) \
+            and request.method == 'GET' \
+            and request.resource_type in self._cached_resource_types \
+            and 'range' not in request.headers
+
+    async def _handle_cacheable(self, route: Route, request: Request) -> None:
+        cached = await asyncio.to_thread(self._asset_cache.get, request.url)
+
+        if cached:
+            status, headers, body = cached
+            self.cache_hits += 1
+            self.cached_bytes_served += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        self.cache_misses += 1
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except PlaywrightError as e:
+            self._logger.debug(f"Asset fetch failed, passing the request through: {request.url} ({e})")
+            await route.continue_()
+            return
+
+        await route.fulfill(response=response, body=body)
+        await asyncio.to_thread(self._asset_cache.put, request.url, response.status, response.headers, body)
+
+    def log_stats(self) -> None:
+        if not self.requests_seen:
+            return
+
+        if self._asset_cache:
+            self._logger.info(
+                f"Asset cache: {self.cache_hits} hit(s), {self.cache_misses} miss(es), "
+                f"{self.cached_bytes_served / 1024 / 1024:.1f} MB served from disk"
+            )
+
+        by_type = ', '.join(f'{resource_type}={count}' for resource_type, count in self.blocked_by_type.most_common())
+        self._logger.info(
+            f"Blocked {self.requests_blocked}/{self.requests_seen} request(s), "
+            f"~{self.estimated_bytes_saved / 1024 / 1024:.1f} MB saved ({by_type or 'none'})"
+        )
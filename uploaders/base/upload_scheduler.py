@@ -0,0 +1,259 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from common.ledger import UploadLedger
+from common.logging_setup import log_context
+from common.retry_policy import is_post_unconfirmed
+from common.scheduler import (
+    QuietHours,
+    ScheduledJob,
+    TokenBucket,
+    UploadQueue,
+)
+from common.utils import create_folder_watcher
+from config import mainconfig
+from uploaders.base.base_uploader import BaseUploader
+from uploaders.base.uploader_pool import UploaderPool
+
+# Upper bound of one sleep, so wall-clock jumps (DST, suspend) are noticed
+_MAX_SLEEP_SECONDS = 300
+
+
+class UploadScheduler(UploaderPool):
+    # Long-lived service: new files are queued per account and posted, accounts in parallel, whenever the account's
+    # token bucket and the quiet hours allow. The queue and the buckets survive restarts.
+
+    def __init__(self, uploaders: list[BaseUploader], queue: UploadQueue, max_concurrent_contexts: int = 4,
+                 ledger: UploadLedger = None, posts_per_hour: float = 6, burst: int = 1,
+                 quiet_hours: QuietHours = None, max_attempts: int = 3, retry_delay: float = 600,
+                 idle_detach_seconds: float = 120):
+        super().__init__(uploaders, max_concurrent_contexts, ledger=ledger)
+        self._queue = queue
+        self._ledger = ledger
+        self._uploader_name = uploaders[0]._uploader_name
+        self._posts_per_hour = posts_per_hour
+        self._burst = burst
+        self._quiet_hours = quiet_hours or QuietHours([])
+        self._max_attempts = max(1, max_attempts)
+        self._retry_delay = retry_delay
+        self._idle_detach_seconds = idle_detach_seconds
+        self._wake_events = {uploader.account_name: asyncio.Event() for uploader in uploaders}
+        self._waiting_accounts = 0
+        # sqlite waits up to 30 s on a locked database; one thread keeps that off the event loop and the calls in order
+        self._queue_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-queue')
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        try:
+            return await super().__aexit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._queue_executor.shutdown(wait=True)
+
+    async def serve(self, method_name: str, files_folder: str, extensions: tuple,
+                    prepare: Callable[[str, list, Optional[UploadLedger]], Awaitable[list]]) -> None:
+        recovered = await self._call_queue(self._queue.recover_interrupted, self._uploader_name, method_name)
+
+        if recovered:
+            self._logger.info(f"Requeued {recovered} job(s) interrupted by the previous run")
+
+        workers = [
+            asyncio.create_task(self._run_account_worker(uploader, method_name, prepare))
+            for uploader in self._uploaders
+        ]
+        self._logger.info(
+            f"Scheduler started for {len(workers)} account(s): {self._posts_per_hour:g} post(s)/hour, "
+            f"burst {self._burst}, watching '{files_folder}'"
+        )
+
+        try:
+            async for files in create_folder_watcher(files_folder, extensions).batches():
+                await self._enqueue(method_name, files)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _enqueue(self, method_name: str, files: list) -> None:
+        if self._ledger:
+            files = await self._ledger.filter_unposted(files, self._uploader_name)
+
+        if not files:
+            return
+
+        # A photo batch becomes one slideshow post, every video is a post of its own
+        jobs = [files] if method_name == mainconfig.PHOTO_UPLOAD_METHOD else [[file] for file in files]
+        queued_counts = await self._call_queue(self._queue.queued_counts, self._uploader_name, method_name)
+        uploaders = {uploader.account_name: uploader for uploader in self._uploaders}
+
+        for job_files in jobs:
+            # The account with the shortest backlog gets the job; ties go to the first configured account
+            account = min(uploaders, key=lambda name: queued_counts.get(name, 0))
+
+            if not await self._call_queue(self._queue.enqueue, job_files, method_name, self._uploader_name, account):
+                continue
+
+            queued_counts[account] = queued_counts.get(account, 0) + 1
+            uploaders[account].mark_pending(job_files)
+            self._wake_events[account].set()
+            self._logger.info(f"[{account}] Queued {', '.join(os.path.basename(file) for file in job_files)}")
+
+    async def _run_account_worker(self, uploader: BaseUploader, method_name: str, prepare) -> None:
+        account = uploader.account_name
+        bucket = None
+        wake_event = self._wake_events[account]
+        attached = False
+
+        try:
+            while True:
+                wake_event.clear()
+                job = None
+
+                try:
+                    if bucket is None:
+                        bucket = await self._call_queue(
+                            self._queue.load_bucket, self._uploader_name, account, self._posts_per_hour, self._burst,
+                        )
+
+                    delay = await self._seconds_until_next_post(method_name, account, bucket)
+
+                    # Give the context slot back while idle or when another account is waiting for it
+                    if attached and (delay is None or delay > self._idle_detach_seconds or self._waiting_accounts):
+                        attached = False
+                        await self._detach(uploader)
+
+                    if delay is None or delay > 0:
+                        await self._sleep(wake_event, delay)
+                        continue
+
+                    if not attached:
+                        await self._attach(uploader)
+                        attached = True
+
+                    job = await self._call_queue(
+                        self._queue.claim_due, self._uploader_name, method_name, account, time.time(),
+                    )
+
+                    if not job:
+                        continue
+
+                    bucket.take(time.time())
+                    await self._call_queue(self._queue.save_bucket, self._uploader_name, account, bucket)
+                    # From here the job may get posted, so an error must not put it back in the queue
+                    job, claimed_job = None, job
+                    await self._run_job(uploader, claimed_job, prepare)
+                except Exception as e:
+                    # Anything unexpected (a locked queue database, a broken context) must not end the account's
+                    # worker: start over from a fresh context after a pause
+                    retry_in = min(self._retry_delay, _MAX_SLEEP_SECONDS)
+                    self._logger.exception(f"[{account}] Worker error, resuming in {retry_in:.0f} s: {e}")
+
+                    if attached:
+                        attached = False
+                        await self._detach_quietly(uploader)
+
+                    if job:
+                        await self._requeue_quietly(job, time.time() + retry_in, str(e))
+
+                    await asyncio.sleep(retry_in)
+        finally:
+            if attached:
+                await asyncio.shield(self._detach(uploader))
+
+    async def _seconds_until_next_post(self, method_name: str, account: str, bucket: TokenBucket) -> Optional[float]:
+        due_at = await self._call_queue(self._queue.next_due_at, self._uploader_name, method_name, account)
+
+        if due_at is None:
+            return None
+
+        now = time.time()
+        return max(due_at - now, self._quiet_hours.seconds_until_open(now), bucket.seconds_until_token(now))
+
+    async def _run_job(self, uploader: BaseUploader, job: ScheduledJob, prepare) -> None:
+        account = uploader.account_name
+
+        with log_context(**uploader.metric_labels):
+            missing = [file for file in job.files if not os.path.exists(file)]
+
+            if missing:
+                self._logger.warning(f"[{account}] Dropping job {job.id}, file(s) no longer exist: {missing}")
+                await self._call_queue(self._queue.fail, job, f"Missing file(s): {missing}")
+                return
+
+            try:
+                if self._ledger:
+                    await self._ledger.resolve_hashes(job.files)
+
+                await getattr(uploader, job.method)(await prepare(job.method, job.files, self._ledger))
+            except Exception as e:
+                if is_post_unconfirmed(e):
+                    self._logger.error(f"[{account}] Job {job.id} may have been posted, not retrying it: {e}")
+                    await self._call_queue(self._queue.fail, job, str(e))
+                    return
+
+                if job.attempts >= self._max_attempts:
+                    self._logger.exception(f"[{account}] Job {job.id} failed after {job.attempts} attempt(s): {e}")
+                    await self._call_queue(self._queue.fail, job, str(e))
+                    return
+
+                delay = self._retry_delay * 2 ** (job.attempts - 1)
+                self._logger.warning(f"[{account}] Job {job.id} failed ({e}), retrying in {delay:.0f} s")
+                await self._call_queue(self._queue.retry_later, job, time.time() + delay, str(e))
+                return
+
+            await self._call_queue(self._queue.complete, job)
+            self._logger.info(f"[{account}] Job {job.id} posted")
+
+    async def _attach(self, uploader: BaseUploader) -> None:
+        self._waiting_accounts += 1
+
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting_accounts -= 1
+
+        try:
+            await uploader.attach(self._browser)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _detach(self, uploader: BaseUploader) -> None:
+        try:
+            await uploader.detach()
+        finally:
+            self._semaphore.release()
+
+    async def _detach_quietly(self, uploader: BaseUploader) -> None:
+        try:
+            await self._detach(uploader)
+        except Exception as e:
+            self._logger.warning(f"[{uploader.account_name}] Error occurred while closing the context: {e}")
+
+    async def _requeue_quietly(self, job: ScheduledJob, not_before: float, error: str) -> None:
+        # A claimed job would otherwise stay 'running' until the next restart
+        try:
+            await self._call_queue(self._queue.retry_later, job, not_before, error)
+        except Exception as e:
+            self._logger.warning(f"Cannot requeue job {job.id}: {e}")
+
+    async def _call_queue(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._queue_executor, functools.partial(method, *args),
+        )
+
+    @staticmethod
+    async def _sleep(wake_event: asyncio.Event, delay: Optional[float]) -> None:
+        timeout = _MAX_SLEEP_SECONDS if delay is None else min(delay, _MAX_SLEEP_SECONDS)
+
+        try:
+            await asyncio.wait_for(wake_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,111 @@
+import asyncio
+from typing import (
+    AsyncContextManager,
+    Optional,
+)
+
+from playwright.async_api import async_playwright
+
+from common.exceptions import UploadBatchException
+from common.ledger import UploadLedger
+from common.logging_setup import (
+    get_named_logger,
+    log_context,
+)
+from uploaders.base.base_uploader import BaseUploader
+
+
+class UploaderPool(AsyncContextManager):
+    # One shared Chromium with a BrowserContext per account, bounded by a semaphore
+
+    def __init__(self, uploaders: list[BaseUploader], max_concurrent_contexts: int = 4,
+                 ledger: UploadLedger = None):
+        if not uploaders:
+            raise ValueError("No uploaders provided.")
+
+        self._logger = get_named_logger('pool')
+        self._uploaders = uploaders
+
+        for uploader in uploaders:
+            uploader.set_ledger(ledger)
+
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent_contexts))
+        self._playwright = None
+        self._browser = None
+
+    async def __aenter__(self) -> "UploaderPool":
+        self._playwright = await async_playwright().start()
+        self._browser = await self._uploaders[0]._launch_browser(
+            self._playwright,
+            proxy_per_context=any(uploader.uses_context_proxy for uploader in self._uploaders),
+        )
+
+        # Every account measures the same browser, so only one of them recycles when it is over the memory limit
+        browser_pid = self._uploaders[0]._memory_watchdog.browser_pid
+
+        for uploader in self._uploaders:
+            uploader._memory_watchdog.watch(browser_pid, shared=True)
+
+        self._logger.info(f"Shared browser launched for {len(self._uploaders)} account(s)")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        proxy_pool = self._uploaders[0]._proxy_pool
+
+        if proxy_pool:
+            proxy_pool.log_stats(self._logger)
+
+        try:
+            if self._browser:
+                await self._browser.close()
+            if self._playwright:
+                await self._playwright.stop()
+        except Exception as e:
+            self._logger.warning(f"Error occurred while stopping shared browser: {e}")
+        return None
+
+    async def run(self, method_name: str, files: list) -> None:
+        assignments = [
+            (uploader, shard) for uploader, shard in zip(self._uploaders, self._shard_files(files)) if shard
+        ]
+        results = await asyncio.gather(
+            *(self._run_account(uploader, method_name, shard) for uploader, shard in assignments),
+            return_exceptions=True,
+        )
+        failures = {}
+
+        for (uploader, _), result in zip(assignments, results):
+            # Upload errors come back as (account, error); anything raised outside of them arrives bare
+            account, error = (uploader.account_name, result) if isinstance(result, BaseException) else result
+
+            if error is not None:
+                failures[account] = error
+
+        if failures:
+            raise UploadBatchException(failures)
+
+    def _shard_files(self, files: list) -> list[list]:
+        shards = [[] for _ in self._uploaders]
+
+        for index, file in enumerate(files):
+            shards[index % len(shards)].append(file)
+
+        return shards
+
+    async def _run_account(self, uploader: BaseUploader, method_name: str, files: list):
+        account = uploader.account_name
+        uploader.mark_pending(files)
+
+        async with self._semaphore:
+            with log_context(**uploader.metric_labels):
+                self._logger.info(f"[{account}] Uploading {len(files)} file(s)")
+
+                try:
+                    await uploader.attach(self._browser)
+                    await getattr(uploader, method_name)(files)
+                    return account, None
+                except Exception as e:
+                    self._logger.exception(f"[{account}] Upload failed: {e}")
+                    return account, e
+                finally:
+                    await uploader.detach()
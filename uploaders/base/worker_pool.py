@@ -0,0 +1,432 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from common.exceptions import UploadBatchException
+from common.ledger import UploadLedger
+from common.logging_setup import (
+    get_named_logger,
+    log_context,
+    setup_logging,
+)
+from common.metrics import (
+    configure_metrics,
+    get_metrics,
+)
+from common.module_loader import load_uploader_module
+from common.retry_policy import is_post_unconfirmed
+from common.slideshow import batch_images
+from common.work_queue import (
+    ITEM_DONE,
+    ITEM_FAILED,
+    ITEM_LEASED,
+    ITEM_QUEUED,
+    WorkItem,
+    WorkQueue,
+)
+from config import mainconfig
+from uploaders.base.base_uploader import BaseUploader
+from uploaders.base.uploader_pool import UploaderPool
+
+Prepare = Callable[[str, list, Optional[UploadLedger]], Awaitable[list]]
+
+# How often the coordinator checks the worker processes and the leases
+_MONITOR_INTERVAL = 1.0
+_JOIN_TIMEOUT = 30
+
+
+def _worker_path(path: Optional[str], worker_id: int) -> Optional[str]:
+    # 'temp/metrics.jsonl' -> 'temp/metrics.worker2.jsonl'
+    if not path:
+        return None
+
+    root, extension = os.path.splitext(path)
+    return f'{root}.worker{worker_id}{extension}'
+
+
+def shard_accounts(accounts: list[str], workers: int) -> list[list[str]]:
+    # Every account belongs to exactly one worker: two processes driving the same account would each warm it up,
+    # log in and write its storage state. More workers than accounts leaves the extra ones unused.
+    workers = max(1, min(workers, len(accounts)))
+    return [accounts[index::workers] for index in range(workers)]
+
+
+class ShardWorker(UploaderPool):
+    # Runs inside a worker process: one browser, one lane per account of the shard leasing items until none are left
+
+    def __init__(self, uploaders: list[BaseUploader], queue: WorkQueue, worker_id: int,
+                 max_concurrent_contexts: int = 4, ledger: UploadLedger = None, lease_seconds: float = 120,
+                 max_attempts: int = 2):
+        super().__init__(uploaders, max_concurrent_contexts, ledger=ledger)
+        self._logger = get_named_logger(f'worker{worker_id}')
+        self._queue = queue
+        self._worker_id = worker_id
+        self._ledger = ledger
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max(1, max_attempts)
+        # sqlite waits up to 30 s on a locked database; one thread keeps that off the event loop and the calls in order
+        self._queue_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='work-queue')
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        try:
+            return await super().__aexit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._queue_executor.shutdown(wait=True)
+
+    async def serve(self, method_name: str, prepare: Prepare) -> bool:
+        # Returns whether every lane ran to the end
+        results = await asyncio.gather(
+            *(self._run_lane(uploader, method_name, prepare) for uploader in self._uploaders),
+            return_exceptions=True,
+        )
+
+        for uploader, result in zip(self._uploaders, results):
+            if isinstance(result, Exception):
+                self._logger.error(f"[{uploader.account_name}] Lane stopped: {result}")
+
+        return not any(isinstance(result, Exception) for result in results)
+
+    async def _run_lane(self, uploader: BaseUploader, method_name: str, prepare: Prepare) -> None:
+        item = await self._lease(uploader, method_name)
+
+        if not item:
+            return
+
+        started = False
+
+        async with self._semaphore:
+            try:
+                await uploader.attach(self._browser)
+
+                while item:
+                    started = True
+                    await self._run_item(uploader, item, prepare)
+                    started = False
+                    item = await self._lease(uploader, method_name)
+            finally:
+                if item and started:
+                    # Stopped while uploading: the post may be out already, so it is not queued again
+                    await self._call_queue(
+                        self._queue.fail, item, "Worker lane stopped during the upload, it may have been posted", 0,
+                    )
+                elif item:
+                    # An item leased when the lane broke is given back right away instead of waiting for the lease
+                    await self._call_queue(self._queue.fail, item, "Worker lane stopped", self._max_attempts + 1)
+
+                await uploader.detach()
+
+    async def _lease(self, uploader: BaseUploader, method_name: str) -> Optional[WorkItem]:
+        return await self._call_queue(
+            self._queue.lease, self._worker_id, method_name, uploader.account_name, self._lease_seconds,
+        )
+
+    async def _run_item(self, uploader: BaseUploader, item: WorkItem, prepare: Prepare) -> None:
+        account = uploader.account_name
+
+        with log_context(**uploader.metric_labels):
+            missing = [file for file in item.files if not os.path.exists(file)]
+
+            if missing:
+                self._logger.warning(f"[{account}] Dropping item {item.id}, file(s) no longer exist: {missing}")
+                await self._call_queue(self._queue.fail, item, f"Missing file(s): {missing}", 0)
+                return
+
+            try:
+                if self._ledger:
+                    await self._ledger.resolve_hashes(item.files)
+
+                uploader.mark_pending(item.files)
+                await getattr(uploader, item.method)(await prepare(item.method, item.files, self._ledger))
+            except Exception as e:
+                # After the Post click a retry could publish the item twice
+                max_attempts = 0 if is_post_unconfirmed(e) else self._max_attempts
+
+                if await self._call_queue(self._queue.fail, item, str(e), max_attempts):
+                    self._logger.warning(f"[{account}] Item {item.id} failed ({e}), queued again")
+                else:
+                    self._logger.exception(f"[{account}] Item {item.id} failed after {item.attempts} attempt(s): {e}")
+                return
+
+            await self._call_queue(self._queue.complete, item)
+            self._logger.info(f"[{account}] Item {item.id} posted")
+
+    async def _call_queue(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._queue_executor, functools.partial(method, *args),
+        )
+
+
+async def _heartbeat(queue_path: str, worker_id: int) -> None:
+    # Its own connection and thread: a lane waiting on a locked database must not delay the beats
+    queue = WorkQueue(queue_path)
+
+    try:
+        while True:
+            await asyncio.to_thread(queue.heartbeat, worker_id, mainconfig.WORKER_LEASE_SECONDS)
+            await asyncio.sleep(mainconfig.WORKER_HEARTBEAT_SECONDS)
+    finally:
+        queue.close()
+
+
+async def _serve_worker(worker_id: int, uploader_module: str, method_name: str, accounts: list[str],
+                        queue_path: str, prepare: Prepare) -> bool:
+    queue = WorkQueue(queue_path)
+    # Beats from before the browser launch, so a slow start is not mistaken for a hung worker
+    heartbeat = asyncio.create_task(_heartbeat(queue_path, worker_id))
+    ledger = UploadLedger(mainconfig.LEDGER_PATH) if mainconfig.LEDGER_ENABLED else None
+
+    try:
+        uploader_class, uploader_name = load_uploader_module(uploader_module)
+        uploaders = [
+            uploader for uploader in (
+                uploader_class(uploader_config=account_config)
+                for account_config in mainconfig.get_uploader_accounts(uploader_name)
+            )
+            if uploader.account_name in accounts
+        ]
+
+        async with ShardWorker(
+            uploaders,
+            queue,
+            worker_id,
+            max_concurrent_contexts=mainconfig.MAX_CONCURRENT_CONTEXTS,
+            ledger=ledger,
+            lease_seconds=mainconfig.WORKER_LEASE_SECONDS,
+            max_attempts=mainconfig.WORKER_MAX_ATTEMPTS,
+        ) as worker:
+            return await worker.serve(method_name, prepare)
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        queue.close()
+
+
+def run_worker(worker_id: int, uploader_module: str, method_name: str, accounts: list[str], queue_path: str,
+               prepare: Prepare) -> None:
+    # Entry point of a spawned worker process: its own logging, metrics files, event loop and browser
+    setup_logging(**{
+        **mainconfig.LOGGING_SETTINGS,
+        'log_file': _worker_path(mainconfig.LOG_FILE, worker_id),
+    })
+    configure_metrics(
+        _worker_path(mainconfig.METRICS_JSONL_PATH, worker_id),
+        _worker_path(mainconfig.METRICS_PROMETHEUS_PATH, worker_id),
+        worker=str(worker_id),
+    )
+    logger = get_named_logger(f'worker{worker_id}')
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()}) for account(s): {', '.join(accounts)}")
+
+    try:
+        completed = asyncio.run(_serve_worker(worker_id, uploader_module, method_name, accounts, queue_path, prepare))
+    except Exception as e:
+        logger.exception(f"Worker {worker_id} crashed: {e}")
+        completed = False
+    finally:
+        get_metrics().finalize(logger)
+
+    sys.exit(0 if completed else 1)
+
+
+class WorkerCoordinator:
+    # Shards the accounts over worker processes, feeds their shared work queue, replaces dead or hung workers and
+    # reports the aggregate progress
+
+    def __init__(self, uploader_module: str, method_name: str, accounts: list[str], queue: WorkQueue,
+                 queue_path: str, workers: int, prepare: Prepare, lease_seconds: float = 120, max_restarts: int = 2,
+                 progress_interval: float = 10):
+        if not accounts:
+            raise ValueError("No accounts provided.")
+
+        self._logger = get_named_logger('coordinator')
+        self._uploader_module = uploader_module
+        self._method_name = method_name
+        self._accounts = accounts
+        self._queue = queue
+        self._queue_path = queue_path
+        self._workers = max(1, workers)
+        self._prepare = prepare
+        self._lease_seconds = lease_seconds
+        self._max_restarts = max_restarts
+        self._progress_interval = progress_interval
+        self._run_id = uuid.uuid4().hex
+        # Spawn everywhere: no forked copy of the parent's event loop, threads or sqlite connections
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: dict[int, multiprocessing.process.BaseProcess] = {}
+        self._started_at: dict[int, float] = {}
+        self._restarts: dict[int, int] = {}
+        self._shards: list[list[str]] = []
+
+    async def run(self, files: list) -> None:
+        total = self._enqueue(files)
+
+        if not total:
+            self._logger.info("Nothing to upload")
+            return
+
+        self._shards = shard_accounts(self._accounts, min(self._workers, total))
+
+        if len(self._shards) < min(self._workers, total):
+            self._logger.info(
+                f"Using {len(self._shards)} worker process(es) instead of {self._workers}: an account is never "
+                "shared between workers"
+            )
+        self._logger.info(
+            f"Starting {len(self._shards)} worker process(es) for {total} item(s) over "
+            f"{len(self._accounts)} account(s)"
+        )
+
+        try:
+            for worker_id in range(len(self._shards)):
+                self._start_worker(worker_id)
+
+            await self._monitor()
+        finally:
+            self._stop_workers()
+
+        failed = self._queue.fail_pending(self._run_id, "No worker left to upload it")
+
+        if failed:
+            self._logger.error(f"{failed} item(s) were not uploaded: every worker of their account gave up")
+
+        self._log_progress(self._queue.progress(self._run_id))
+
+        for worker_id, count in sorted(self._queue.done_per_worker(self._run_id).items(), key=lambda item: item[0]):
+            self._logger.info(f"Worker {worker_id}: {count} item(s) posted")
+
+        failures = self._queue.failures(self._run_id)
+
+        if failures:
+            raise UploadBatchException(failures)
+
+    def _enqueue(self, files: list) -> int:
+        adopted = self._queue.adopt_unfinished(self._run_id, self._method_name, self._accounts)
+
+        if adopted:
+            self._logger.info(f"Adopted {adopted} item(s) left unfinished by a previous run")
+
+        # A photo batch becomes one slideshow post, every video is a post of its own
+        if self._method_name == mainconfig.PHOTO_UPLOAD_METHOD:
+            items = batch_images(
+                files,
+                batch_size=mainconfig.PHOTO_BATCH_SIZE,
+                order=mainconfig.PHOTO_BATCH_ORDER,
+                group_by_date=mainconfig.PHOTO_BATCH_GROUP_BY_DATE,
+            )
+        else:
+            items = [[file] for file in files]
+
+        for index, item_files in enumerate(items):
+            self._queue.add(self._run_id, item_files, self._method_name, self._accounts[index % len(self._accounts)])
+
+        return sum(self._queue.progress(self._run_id).values())
+
+    def _start_worker(self, worker_id: int) -> None:
+        # Leftovers of a previous process with the same number are queued again and its last beat is forgotten
+        self._queue.release_worker(worker_id)
+        process = self._context.Process(
+            target=run_worker,
+            args=(
+                worker_id, self._uploader_module, self._method_name, self._shards[worker_id], self._queue_path,
+                self._prepare,
+            ),
+            name=f'upload-worker-{worker_id}',
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._started_at[worker_id] = time.time()
+
+    async def _monitor(self) -> None:
+        last_progress = None
+        last_report = 0.0
+
+        while self._processes:
+            # Hung workers are killed and their items released first; only then are the remaining expired leases
+            # (of workers this run does not track) reclaimed, so no item is leased twice while its worker still runs
+            for worker_id, process in list(self._processes.items()):
+                if process.is_alive() and not self._kill_if_hung(worker_id, process):
+                    continue
+
+                self._on_worker_exit(worker_id, process)
+
+            reclaimed = self._queue.reclaim_expired(exclude_workers=list(self._processes))
+
+            if reclaimed:
+                self._logger.warning(f"Reclaimed {reclaimed} item(s) with an expired lease")
+
+            progress = self._queue.progress(self._run_id)
+
+            if progress != last_progress and time.monotonic() - last_report >= self._progress_interval:
+                self._log_progress(progress)
+                last_progress = progress
+                last_report = time.monotonic()
+
+            await asyncio.sleep(_MONITOR_INTERVAL)
+
+    def _kill_if_hung(self, worker_id: int, process: multiprocessing.process.BaseProcess) -> bool:
+        # Returns whether the worker was killed; it is dead once this returns
+        last_beat = self._queue.last_heartbeat(worker_id) or self._started_at[worker_id]
+
+        if time.time() - last_beat <= self._lease_seconds:
+            return False
+
+        self._logger.error(f"Worker {worker_id} missed its heartbeats for {time.time() - last_beat:.0f} s, killing it")
+        process.kill()
+        process.join()
+        return True
+
+    def _on_worker_exit(self, worker_id: int, process: multiprocessing.process.BaseProcess) -> None:
+        process.join()
+        del self._processes[worker_id]
+        released = self._queue.release_worker(worker_id)
+
+        if process.exitcode or released:
+            self._logger.warning(
+                f"Worker {worker_id} exited with code {process.exitcode}, {released} item(s) queued again"
+            )
+
+        if not self._queue.has_queued(self._run_id, self._shards[worker_id]):
+            return
+
+        restarts = self._restarts.get(worker_id, 0)
+
+        if restarts >= self._max_restarts:
+            self._logger.error(f"Worker {worker_id} was restarted {restarts} time(s), not restarting it again")
+            return
+
+        self._restarts[worker_id] = restarts + 1
+        self._logger.info(f"Restarting worker {worker_id} for its remaining items")
+        self._start_worker(worker_id)
+
+    def _stop_workers(self) -> None:
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        for worker_id, process in self._processes.items():
+            process.join(_JOIN_TIMEOUT)
+
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+            self._queue.release_worker(worker_id)
+
+        self._processes.clear()
+
+    def _log_progress(self, progress: dict[str, int]) -> None:
+        total = sum(progress.values())
+        self._logger.info(
+            f"Progress: {progress.get(ITEM_DONE, 0)}/{total} posted, {progress.get(ITEM_FAILED, 0)} failed, "
+            f"{progress.get(ITEM_LEASED, 0)} in progress, {progress.get(ITEM_QUEUED, 0)} queued, "
+            f"{len(self._processes)} worker(s) alive"
+        )
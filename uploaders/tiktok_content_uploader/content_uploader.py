@@ -1,10 +1,42 @@
-import os
+import asyncio
 import random
-from asyncio import sleep
+import re
+from contextlib import aclosing
+from typing import Optional
 
-from common.exceptions import AuthException
-from common.utils import create_slideshow
-from common.utils import generate_filename
+from playwright.async_api import (
+    Locator,
+    Page,
+    Response,
+    TimeoutError as PlaywrightTimeoutError,
+)
+
+from common.exceptions import (
+    AuthException,
+    PostNotConfirmedException,
+    SelectorNotFoundException,
+    UploadBatchException,
+)
+from common.ledger import (
+    STATUS_FAILED,
+    STATUS_POSTED,
+    STATUS_UPLOADING,
+)
+from common.logging_setup import log_context
+from common.metrics import (
+    span,
+    timed_stage,
+)
+from common.retry_policy import (
+    retry_budget,
+    step_timeout,
+)
+from common.slideshow import (
+    batch_images,
+    render_cached_slideshow,
+    render_slideshow_batches,
+)
+from common.utils import humanize_pause
 from config import mainconfig
 from config.uploader_config import UploaderConfig
 from uploaders.base.base_uploader import BaseUploader
@@ -15,33 +47,159 @@ class ContentUploader(BaseUploader):
     DOMAIN_URL = 'https://www.tiktok.com?lang=en'
     PROFILE_URL = 'https://www.tiktok.com/profile?lang=en'
     UPLOAD_PAGE_URL = 'https://www.tiktok.com/tiktokstudio/upload?from=webapp&lang=en'
+    # Post step for media already sent by the HTTP transport (upload_transport='http')
+    MEDIA_POST_PAGE_URL = UPLOAD_PAGE_URL + '&media_id={media_id}'
+    SESSION_COOKIE_NAMES = ('sessionid', 'sessionid_ss', 'sid_tt')
+    # A submitted login leaves the /login pages
+    LOGIN_URL_PART = '/login'
+    # A post is confirmed by the publish API response ({"status_code": 0}) or the success message; leaving the upload
+    # page (for the content manager) is the fallback
+    POST_API_URL_PART = '/tiktok/web/project/post'
+    POST_SUCCESS_TEXT = re.compile(r'(video|post) (has been|is being|was) (uploaded|published|posted)', re.IGNORECASE)
+    UPLOAD_PAGE_URL_PART = '/tiktokstudio/upload'
+    NAVIGATION_TIMEOUT = 15_000
+    BLOCKED_RESOURCE_TYPES = ('image', 'media', 'font')
+    BLOCKED_URL_PATTERNS = (
+        '*google-analytics.com/*',
+        '*googletagmanager.com/*',
+        '*doubleclick.net/*',
+        '*analytics.tiktok.com/*',
+        '*mon.tiktokv.com/*',
+        '*mon-va.byteoversea.com/*',
+        '*mcs.tiktokw.us/*',
+        '*mcs-va.tiktokv.com/*',
+        '*/web/report*',
+    )
+    # Captcha and verification widgets must render their images
+    ALLOWED_URL_PATTERNS = (
+        '*captcha*',
+        '*verify*',
+    )
 
-    def __init__(self):
-        self.uploader_config: UploaderConfig = mainconfig.UPLOADER_PARAMETERS[UPLOADER_NAME]
+    def __init__(self, uploader_config: UploaderConfig = None):
+        self.uploader_config: UploaderConfig = uploader_config or mainconfig.get_uploader_config(UPLOADER_NAME)
         super().__init__(uploader_name=UPLOADER_NAME, **self.uploader_config.as_dict())
 
     async def upload_photo(self, files: list, *args, **kwargs) -> None:
-        await self._upload_slideshow(files)
+        batches = batch_images(
+            files,
+            batch_size=mainconfig.PHOTO_BATCH_SIZE,
+            order=mainconfig.PHOTO_BATCH_ORDER,
+            group_by_date=mainconfig.PHOTO_BATCH_GROUP_BY_DATE,
+        )
+
+        if len(batches) <= 1:
+            await self._upload_slideshow(batches[0] if batches else files)
+            return
+
+        await self._upload_slideshow_batches(batches)
 
     async def upload_video(self, files: list, *args, **kwargs) -> None:
-        await self._warm_up_browser()
-        await self._login()
+        await self._prepare_session()
+
+        if self._upload_tabs > 1 and len(files) > 1:
+            failures = await self._run_in_tabs(files, self._upload_tracked)
+
+            if failures:
+                raise UploadBatchException(failures)
+            return
 
         for file in files:
-            await self._perform_video_upload(file)
+            await self._upload_tracked(file)
+            await self._recycle_if_required()
 
     async def _upload_slideshow(self, files: list) -> None:
         slideshow = await self._generate_slideshow(files)
+        await self._prepare_session()
+        await self._upload_tracked(slideshow, sources=files)
+
+    async def _upload_slideshow_batches(self, batches: list[list]) -> None:
+        # Slideshows are uploaded as soon as they are rendered while the next batches keep rendering.
+        # Batches are keyed by their first image for both render and upload failures; two batches may share one
+        # cached slideshow file.
+        self._logger.info(f'Rendering {len(batches)} slideshow(s)')
+        queue = asyncio.Queue()
+        rendered = {}
+        failures = {}
+        tab_count = min(self._upload_tabs, len(batches))
+
+        async def feed_rendered_slideshows() -> None:
+            try:
+                async with aclosing(render_slideshow_batches(
+                    batches,
+                    concurrency=mainconfig.PHOTO_BATCH_RENDER_CONCURRENCY,
+                )) as renders:
+                    async for batch, slideshow, error in renders:
+                        if error:
+                            failures[batch[0]] = error
+                            continue
+
+                        rendered[batch[0]] = (slideshow, batch)
+                        queue.put_nowait(batch[0])
+            finally:
+                for _ in range(tab_count):
+                    queue.put_nowait(None)
+
+        async def upload_rendered(key: str, page: Page) -> None:
+            slideshow, batch = rendered[key]
+            await self._upload_tracked(slideshow, page, sources=batch)
+
+        feeder = asyncio.create_task(feed_rendered_slideshows())
 
         try:
-            await self._warm_up_browser()
-            await self._login()
-            await self._perform_video_upload(slideshow)
-        except BaseException as e:
-            raise e
+            await self._prepare_session()
+            failures.update(await self._run_queue_in_tabs(queue, upload_rendered, tab_count))
+            await feeder
         finally:
-            self._delete_temp_file(file_path=slideshow)
+            if not feeder.done():
+                feeder.cancel()
+                await asyncio.gather(feeder, return_exceptions=True)
 
+        if failures:
+            raise UploadBatchException(failures)
+
+    async def _prepare_session(self) -> None:
+        if self._session_cache.is_fresh():
+            self._logger.info('Session is fresh, skipping warm-up and login check')
+            return
+
+        await self._warm_up_browser()
+        await self._login()
+
+    async def _upload_tracked(self, file: str, page: Page = None, sources: list = None) -> None:
+        sources = sources or [file]
+        self._record_upload(sources, STATUS_UPLOADING)
+
+        with log_context(file=file, **self.metric_labels), retry_budget(mainconfig.RETRY_FILE_BUDGET):
+            try:
+                await self._upload_with_auth_recheck(file, page)
+            except Exception as e:
+                self._record_upload(sources, STATUS_FAILED, error=str(e))
+                raise
+
+        self._record_upload(sources, STATUS_POSTED)
+
+    async def _upload_with_auth_recheck(self, file: str, page: Page = None) -> None:
+        try:
+            await self._upload_with_retries(file, page)
+        except AuthException as e:
+            self._logger.warning(f'Upload hit an auth wall ({e}), re-checking the session')
+
+            async with self._login_lock:
+                self._session_cache.invalidate()
+                await self._login()
+
+            await self._upload_with_retries(file, page)
+
+    async def _upload_with_retries(self, file: str, page: Page = None) -> None:
+        # Only the steps up to the post click are retried: once it is clicked the post may be out
+        page, post_confirmation_button = await self._upload_retry_policy.run(
+            lambda: self._prepare_post(file, page),
+            description=f'upload "{file}"',
+        )
+        await self._publish(file, page, post_confirmation_button)
+
+    @timed_stage('login_check')
     async def _is_logged_in(self) -> bool:
         if not self.uploader_config.auth_username \
                 or not self.uploader_config.auth_password:
@@ -54,11 +212,13 @@ class ContentUploader(BaseUploader):
             edit_profile_button = self._page.locator(
                 selector='//button[@data-e2e="edit-profile-entrance"]',
             )
-            await edit_profile_button.wait_for(state="visible", timeout=10_000)
+            await self._wait_for_selector(edit_profile_button)
+            self._session_cache.mark_verified()
             return True
-        except BaseException:
+        except SelectorNotFoundException:
             return False
 
+    @timed_stage('login')
     async def _login(self) -> None:
         if await self._is_logged_in():
             self._logger.info('Already logged in!')
@@ -68,35 +228,46 @@ class ContentUploader(BaseUploader):
         profile_button = self._page.locator(
             selector='//button[@aria-label="Profile"]',
         )
-        await profile_button.wait_for(state="visible", timeout=10_000)
+        await self._wait_for_selector(profile_button)
         await profile_button.click()
         show_email_and_passw_auth_button = self._page.locator(
             selector='//div[@id="login-modal"]//div[@data-e2e="channel-item" and .//*[contains(text(), "mail")]]',
         )
-        await show_email_and_passw_auth_button.wait_for(state="visible", timeout=10_000)
+        await self._wait_for_selector(show_email_and_passw_auth_button)
         await show_email_and_passw_auth_button.click()
         login_with_email_and_password_button = self._page.locator(
             selector='//a[contains(@href, "/login/phone-or-email/email")]',
         )
-        await login_with_email_and_password_button.wait_for(state="visible", timeout=10_000)
+        await self._wait_for_selector(login_with_email_and_password_button)
         await login_with_email_and_password_button.click()
         await self._page.type(
             selector='//input[@name="username"]',
             text=self.uploader_config.auth_username,
-            timeout=10_000,
+            timeout=step_timeout(self.STEP_TIMEOUT),
             delay=random.randint(100, 500),
         )
         await self._page.type(
             selector='//input[@type="password"]',
             text=self.uploader_config.auth_password,
-            timeout=random.randint(100, 500),
+            timeout=step_timeout(self.STEP_TIMEOUT),
+            delay=random.randint(100, 500),
         )
         submit_button = self._page.locator(
             selector='//button[@type="submit" and @data-e2e="login-button"]',
         )
-        await submit_button.wait_for(state="visible", timeout=10_000)
+        await self._wait_for_selector(submit_button)
+
         await submit_button.click()
-        await sleep(5)
+
+        try:
+            await self._page.wait_for_url(
+                lambda url: self.LOGIN_URL_PART not in url,
+                timeout=step_timeout(self.NAVIGATION_TIMEOUT),
+            )
+        except PlaywrightTimeoutError:
+            raise AuthException(f'Login did not leave the login page: {self._page.url}')
+
+        await humanize_pause(5)
 
         if not await self._is_logged_in():
             raise AuthException('Cannot log in!')
@@ -104,45 +275,122 @@ class ContentUploader(BaseUploader):
         await self._save_storage_state_if_required()
         self._logger.info('Login is successful!')
 
-    async def _perform_video_upload(self, file: str) -> None:
-        await self._open_page(self.UPLOAD_PAGE_URL)
-        await sleep(3)
-        file_input = await self._page.query_selector(
-            selector='//input[@type="file"]',
-        )
-        await file_input.set_input_files(file)
-        await self._page.evaluate('''element => {
-            const event = new Event('change', { bubbles: true });
-            element.dispatchEvent(event);
-        }''', file_input)
-        post_confirmation_button = self._page.locator(
+    @timed_stage('video_upload')
+    async def _prepare_post(self, file: str, page: Page = None) -> tuple[Page, Locator]:
+        if self._media_transport:
+            media_id = await self._upload_media(file, page)
+            page = await self._open_upload_page(self.MEDIA_POST_PAGE_URL.format(media_id=media_id), page)
+        else:
+            page = await self._open_upload_page(self.UPLOAD_PAGE_URL, page)
+            await self._attach_file(file, page)
+
+        post_confirmation_button = page.locator(
             selector='//button[@data-e2e="post_video_button"]',
         )
-        await post_confirmation_button.wait_for(state="visible", timeout=10_000)
-        await post_confirmation_button.click()
+        await self._wait_for_selector(post_confirmation_button)
+        return page, post_confirmation_button
 
-    async def _generate_slideshow(self, files: list) -> str:
-        slideshow_file_path = self._create_temp_file_path()
-        return create_slideshow(
-            image_files=files,
-            output_file=slideshow_file_path,
-        )
+    async def _publish(self, file: str, page: Page, post_confirmation_button: Locator) -> None:
+        async with span('post', **self.metric_labels):
+            # Budget and click errors happen before anything is sent and keep their own type (retryable later)
+            confirmation_timeout = step_timeout(self.NAVIGATION_TIMEOUT)
+            # Listening starts before the click, so a fast publish response is not missed
+            publish_response = asyncio.ensure_future(page.wait_for_event(
+                'response',
+                predicate=lambda response: self.POST_API_URL_PART in response.url
+                and response.request.method == 'POST',
+                timeout=confirmation_timeout,
+            ))
 
-    def _create_temp_file_path(self) -> str:
-        slideshow_file_name = generate_filename(
-            prefix='slideshow',
-            ext='mp4',
-        )
-        return os.path.join(self.path_to_temp_folder, slideshow_file_name)
+            try:
+                await post_confirmation_button.click(timeout=step_timeout(self.STEP_TIMEOUT))
+            except BaseException:
+                publish_response.cancel()
+                await asyncio.gather(publish_response, return_exceptions=True)
+                raise
+
+            # From here on the post may be out, so any failure is reported as unconfirmed and never retried
+            try:
+                await self._wait_for_post_confirmation(file, page, publish_response, confirmation_timeout)
+            except PostNotConfirmedException:
+                raise
+            except Exception as e:
+                raise PostNotConfirmedException(f'Post of "{file}" was not confirmed: {e}') from e
+
+    async def _wait_for_post_confirmation(self, file: str, page: Page, publish_response: asyncio.Future,
+                                          timeout: float) -> None:
+        signals = {
+            publish_response: 'publish response',
+            asyncio.ensure_future(
+                page.get_by_text(self.POST_SUCCESS_TEXT).first.wait_for(state='visible', timeout=timeout)
+            ): 'success message',
+            asyncio.ensure_future(
+                page.wait_for_url(lambda url: self.UPLOAD_PAGE_URL_PART not in url, timeout=timeout)
+            ): 'navigation',
+        }
+        pending = set(signals)
+        errors = []
 
-    def _delete_temp_file(self, file_path: str) -> bool:
         try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-                return True
-            else:
-                self._logger.error(f'Cannot delete file "{file_path}". File not found')
-                return False
-        except BaseException as e:
-            self._logger.error(f'Cannot delete file "{file_path}" due to an error: {e}')
-            return False
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for signal in done:
+                    if signal.exception():
+                        errors.append(f'{signals[signal]}: {signal.exception()}')
+                        continue
+
+                    if signal is publish_response:
+                        rejection = await self._publish_rejection(signal.result())
+
+                        if rejection:
+                            raise PostNotConfirmedException(f'Post of "{file}" was rejected: {rejection}')
+
+                    self._logger.debug(f'Post of "{file}" confirmed by the {signals[signal]}')
+                    return
+        finally:
+            for signal in signals:
+                signal.cancel()
+
+            await asyncio.gather(*signals, return_exceptions=True)
+
+        raise PostNotConfirmedException(f'Post of "{file}" was not confirmed: {"; ".join(errors)}')
+
+    @staticmethod
+    async def _publish_rejection(response: Response) -> Optional[str]:
+        if not response.ok:
+            return f'HTTP {response.status}'
+
+        try:
+            payload = await response.json()
+        except Exception:
+            return None
+
+        status_code = payload.get('status_code') if isinstance(payload, dict) else None
+
+        if status_code in (None, 0):
+            return None
+
+        return f'status_code {status_code} {payload.get("status_msg") or ""}'.strip()
+
+    async def _open_upload_page(self, url: str, page: Page = None) -> Page:
+        page = await self._open_page(url, page=page)
+
+        if '/login' in page.url:
+            raise AuthException(f'Redirected to login page: {page.url}')
+
+        return page
+
+    async def _attach_file(self, file: str, page: Page) -> None:
+        file_input = page.locator(
+            selector='//input[@type="file"]',
+        ).first
+        await self._wait_for_selector(file_input, state="attached")
+        await humanize_pause(3)
+
+        async with span('set_input_files', **self.metric_labels):
+            await file_input.set_input_files(file)
+            await file_input.dispatch_event('change')
+
+    async def _generate_slideshow(self, files: list) -> str:
+        return await render_cached_slideshow(image_files=files)